@@ -0,0 +1,131 @@
+# circuit_breaker.py - швидка відмова при недоступності зовнішніх сервісів
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from metrics import CIRCUIT_REJECTED_TOTAL, classify_error
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Запит не виконувався: сервіс вважається недоступним"""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} тимчасово недоступний, повтор через {retry_in:.0f} с")
+        self.name = name
+        self.retry_in = retry_in
+
+
+def is_outage(error):
+    """Чи свідчить помилка про недоступність сервісу, а не про помилку в самому запиті"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    # HttpError googleapiclient має resp.status, винятки google.api_core - code
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    if status is None:
+        status = getattr(error, 'code', None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return classify_error(error) in ('timeout', 'network', 'rate_limit')
+
+
+class CircuitBreaker:
+    """Запобіжник для залежності (Google Sheets, Speech-to-Text, Telegram).
+
+    closed - запити йдуть як завжди; після failure_threshold збоїв
+    поспіль запобіжник переходить в open і reset_timeout секунд
+    одразу відмовляє (CircuitOpenError), не чекаючи таймаутів.
+    Потім half_open: пропускається один пробний запит - успіх
+    закриває запобіжник, збій знову відкриває.
+
+    Збоєм вважається лише недоступність сервісу (is_outage); відповідь
+    з помилкою в самому запиті означає, що сервіс працює.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, is_failure=is_outage):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._state = CLOSED
+        self._probing = False
+
+    @property
+    def state(self):
+        if self._state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            logger.info(f"Запобіжник {self.name}: пробний запит")
+        return self._state
+
+    @property
+    def is_open(self):
+        return self.state == OPEN
+
+    def retry_in(self):
+        """Секунд до пробного запиту (0 - запити вже пропускаються)"""
+        if self.state != OPEN:
+            return 0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def before_call(self):
+        """Пропускає запит або одразу кидає CircuitOpenError; True - це пробний запит"""
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probing):
+            CIRCUIT_REJECTED_TOTAL.inc(dependency=self.name)
+            raise CircuitOpenError(self.name, self.retry_in())
+        if state == HALF_OPEN:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        if self._state != CLOSED:
+            logger.info(f"Запобіжник {self.name}: сервіс знову доступний")
+        self._state = CLOSED
+        self.failures = 0
+        self.last_error = None
+
+    def record_failure(self, error):
+        if not self.is_failure(error):
+            self.record_success()
+            return
+        self.failures += 1
+        self.last_error = str(error) or type(error).__name__
+        if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self._state != OPEN:
+                logger.warning(f"Запобіжник {self.name} відкрито на {self.reset_timeout} с після {self.failures} збоїв: {error}")
+            self._state = OPEN
+            self.opened_at = time.monotonic()
+
+    @asynccontextmanager
+    async def guard(self):
+        """Виконує блок під захистом запобіжника"""
+        probe = self.before_call()
+        try:
+            yield
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        else:
+            self.record_success()
+        finally:
+            if probe:
+                self._probing = False
+
+    def status(self):
+        """Стан для health check"""
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_in": round(self.retry_in(), 1),
+            "last_error": self.last_error
+        }
@@ -1,9 +1,16 @@
 import os
 import json
+import hashlib
 
 # Telegram Bot
 TOKEN = os.getenv('TOKEN', 'ваш_telegram_bot_token')
 
+# Webhook замість long polling (оновлення приходять на aiohttp-сервер run.py)
+USE_WEBHOOK = os.getenv('USE_WEBHOOK', 'false').lower() == 'true'
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+# Секрет для заголовка X-Telegram-Bot-Api-Secret-Token; за замовчуванням стабільно виводиться з токена
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN') or hashlib.sha256(f"webhook:{TOKEN}".encode()).hexdigest()
+
 # Google Sheets
 SPREADSHEET_ID = os.getenv('SPREADSHEET_ID', 'ваш_google_sheets_id')
 RANGE_NAME = os.getenv('RANGE_NAME', "'Аркуш1'!A:E")
@@ -24,6 +31,12 @@ if SERVICE_ACCOUNT_JSON:
 # Speech Recognition
 SPEECH_LANGUAGE = os.getenv('SPEECH_LANGUAGE', 'uk-UA')
 MAX_VOICE_DURATION = int(os.getenv('MAX_VOICE_DURATION', '30'))  # Зменшено з 60
+SPEECH_ENGINE = os.getenv('SPEECH_ENGINE', 'google').lower()  # google або vosk (локально, без мережі)
+VOSK_MODEL_PATH = os.getenv('VOSK_MODEL_PATH', 'vosk-model-small-uk')  # Каталог моделі Vosk
+VOSK_USE_GRAMMAR = os.getenv('VOSK_USE_GRAMMAR', 'true').lower() == 'true'  # Обмежити словник категоріями та числами
+SPEECH_HINT_BOOST = float(os.getenv('SPEECH_HINT_BOOST', '10'))  # Вага підказок (категорії, числівники) для Google
+SPEECH_STREAMING = os.getenv('SPEECH_STREAMING', 'false').lower() == 'true'  # Розпізнавання під час завантаження
+VOICE_TRANSCRIPT_CACHE_SIZE = int(os.getenv('VOICE_TRANSCRIPT_CACHE_SIZE', '200'))  # Кеш розпізнаних голосових
 
 # Logging
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -31,6 +44,7 @@ LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 # Health Check & Anti-Sleep
 HEALTH_CHECK_PORT = int(os.getenv('PORT', '10000'))  # Зберігаємо вашу логіку з PORT
 RENDER_URL = os.getenv('RENDER_URL', 'https://findotbot.onrender.com')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', RENDER_URL)  # Публічна адреса сервісу для webhook
 SELF_PING_INTERVAL = int(os.getenv('SELF_PING_INTERVAL', '600'))  # 10 хвилин
 ENABLE_SELF_PING = os.getenv('ENABLE_SELF_PING', 'true').lower() == 'true'
 
@@ -38,9 +52,25 @@ ENABLE_SELF_PING = os.getenv('ENABLE_SELF_PING', 'true').lower() == 'true'
 TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', '3'))  # Зменшено з 8
 TELEGRAM_TIMEOUT = int(os.getenv('TELEGRAM_TIMEOUT', '10'))     # Зменшено з 20  
 TELEGRAM_READ_TIMEOUT = int(os.getenv('TELEGRAM_READ_TIMEOUT', '15'))  # Зменшено з 30
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '8'))  # Оновлення різних користувачів паралельно (плюс слоти для черги голосових)
 
 # Додаткові налаштування оптимізації
 FFMPEG_TIMEOUT = int(os.getenv('FFMPEG_TIMEOUT', '30'))
 GOOGLE_API_TIMEOUT = int(os.getenv('GOOGLE_API_TIMEOUT', '10'))
+SHEETS_MAX_WORKERS = int(os.getenv('SHEETS_MAX_WORKERS', '2'))  # Потоки для запитів до Google Sheets
+SHEETS_READS_PER_MINUTE = int(os.getenv('SHEETS_READS_PER_MINUTE', '60'))  # Квота читань Google Sheets на хвилину
+SHEETS_WRITES_PER_MINUTE = int(os.getenv('SHEETS_WRITES_PER_MINUTE', '60'))  # Квота записів Google Sheets на хвилину
+SHEETS_BURST = int(os.getenv('SHEETS_BURST', '10'))  # Скільки запитів одного класу можна відправити поспіль
+SHEETS_RATE_LIMIT_RETRIES = int(os.getenv('SHEETS_RATE_LIMIT_RETRIES', '5'))  # Повтори після відповіді 429
+LEDGER_DB_FILE = os.getenv('LEDGER_DB_FILE', os.path.join('data', 'expenses.db'))  # Локальний журнал витрат (SQLite), поза кодом проекту
+EXPENSE_CACHE_REFRESH_INTERVAL = int(os.getenv('EXPENSE_CACHE_REFRESH_INTERVAL', '30'))  # Дочитування рядків, дописаних у таблицю вручну
+EXPENSE_CACHE_TTL = int(os.getenv('EXPENSE_CACHE_TTL', '600'))  # Повна звірка журналу з таблицею (10 хвилин)
+STATS_STALE_AFTER = int(os.getenv('STATS_STALE_AFTER', '60'))  # Після скількох секунд без звірки статистика позначається віком і оновлюється у фоні
+SHEETS_FLUSH_INTERVAL = float(os.getenv('SHEETS_FLUSH_INTERVAL', '2'))  # Вікно збору змін в один запит
+SHEETS_MAX_RETRY_DELAY = int(os.getenv('SHEETS_MAX_RETRY_DELAY', '300'))  # Максимальна пауза між повторами
+BULK_MAX_LINES = int(os.getenv('BULK_MAX_LINES', '50'))  # Максимум рядків у пакетному записі
 MAX_CONCURRENT_VOICE_PROCESSING = int(os.getenv('MAX_CONCURRENT_VOICE', '2'))
+VOICE_QUEUE_SIZE = int(os.getenv('VOICE_QUEUE_SIZE', '5'))  # Скільки голосових можуть чекати в черзі
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))  # Збоїв поспіль до відкриття запобіжника
+CIRCUIT_RESET_TIMEOUT = int(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))  # Секунд до пробного запиту після відкриття
 MEMORY_CLEANUP_INTERVAL = int(os.getenv('MEMORY_CLEANUP_INTERVAL', '300'))  # 5 хвилин
\ No newline at end of file
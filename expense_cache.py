@@ -0,0 +1,119 @@
+# expense_cache.py - витрати в пам'яті поверх локального журналу SQLite
+import datetime
+import logging
+import time
+
+from expense_store import ExpenseStore, to_timestamp
+from metrics import CACHE_REQUESTS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class ExpenseCache:
+    """Колонкове сховище витрат (ExpenseStore) для звітів.
+
+    Джерело даних - локальний журнал ExpenseLedger: сховище
+    будується з нього при старті, а зміни бота записуються в журнал
+    і одразу застосовуються до сховища, тож статистика рахується
+    без звернень до Google Sheets. Номери рядків таблиці зберігає
+    лише журнал; SheetsReplicator знімає зі сховища позначку
+    «ще не відправлено» після запису в таблицю.
+    """
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.store = ExpenseStore()
+        self.loaded_at = None
+
+    def load(self):
+        """Будує сховище з журналу заново"""
+        store = ExpenseStore(first_id=self.store.next_id)
+        for row in self.ledger.records():
+            store.append(
+                row['ts'], row['category'], row['amount'], row['user'], row['comment'],
+                not row['sheet_row'], row['id']
+            )
+        self.store = store
+        self.loaded_at = time.monotonic()
+        logger.info(f"Кеш витрат завантажено з журналу: {len(store)} записів")
+
+    async def get_store(self):
+        """Повертає сховище витрат (завантажує з журналу при першому зверненні)"""
+        if self.loaded_at is None:
+            CACHE_REQUESTS_TOTAL.inc(cache='expenses', result='miss')
+            self.load()
+        else:
+            CACHE_REQUESTS_TOTAL.inc(cache='expenses', result='hit')
+        return self.store
+
+    # === ІНДЕКС ЗАПИСІВ ===
+
+    def has_record(self, record_id):
+        return self.store.position_of_id(record_id) is not None
+
+    def comment_of(self, record_id):
+        position = self.store.position_of_id(record_id)
+        if position is None:
+            return None
+        return self.store.comments[position]
+
+    def find_record(self, date_str, category, amount, user):
+        """Шукає запис за вмістом (коли ідентифікатор невідомий)"""
+        try:
+            timestamp = to_timestamp(datetime.datetime.strptime(date_str, DATE_FORMAT))
+        except ValueError:
+            return None
+        return self.store.find(timestamp, category, float(amount), user)
+
+    def is_pending(self, record_id):
+        position = self.store.position_of_id(record_id)
+        return position is not None and bool(self.store.pending[position])
+
+    # === ЛОКАЛЬНІ ЗМІНИ ВІД САМОГО БОТА ===
+
+    def add(self, date_str, category, amount, user, comment):
+        """Записує нову витрату в журнал і сховище, повертає її ідентифікатор"""
+        return self.add_many([(date_str, category, amount, user, comment)])[0]
+
+    def add_many(self, items):
+        """Записує кілька витрат [(date_str, category, amount, user, comment), ...] однією транзакцією"""
+        expenses = [
+            (to_timestamp(datetime.datetime.strptime(date_str, DATE_FORMAT)), category, float(amount), user, comment)
+            for date_str, category, amount, user, comment in items
+        ]
+        record_ids = self.ledger.add_many(expenses)
+        for record_id, (timestamp, category, amount, user, comment) in zip(record_ids, expenses):
+            self.store.append(timestamp, category, amount, user, comment, True, record_id)
+        return record_ids
+
+    def remove(self, record_id):
+        """Видаляє запис; рядок таблиці прибере реплікатор"""
+        self.ledger.delete(record_id)
+        position = self.store.position_of_id(record_id)
+        if position is not None:
+            self.store.remove(position)
+
+    def set_comment(self, record_id, comment):
+        """Оновлює коментар запису (наприклад, позначку [IGNORED])"""
+        self.ledger.set_comment(record_id, comment)
+        position = self.store.position_of_id(record_id)
+        if position is not None:
+            self.store.set_comment(position, comment)
+
+    # === ЗМІНИ ВІД РЕПЛІКАТОРА ===
+
+    def mark_synced(self, record_ids):
+        """Позначає записи, що потрапили в таблицю"""
+        for record_id in record_ids:
+            position = self.store.position_of_id(record_id)
+            if position is not None:
+                self.store.pending[position] = False
+
+    def add_synced(self, record_id, expense):
+        """Додає рядок, дописаний у таблицю вручну"""
+        self.store.append(
+            expense['ts'], expense['category'], expense['amount'], expense['user'],
+            expense['comment'], False, record_id
+        )
@@ -0,0 +1,128 @@
+# expense_parser.py - розбір текстових записів витрат (окремо від Telegram, щоб легко тестувати)
+import re
+
+# Маркери списку на початку рядка пакетного запису: "- ", "• ", "1. ", "2) "
+BULK_LINE_PREFIX = re.compile(r'^\s*(?:[-–•*]|\d+[.)])\s+')
+
+
+def normalize_category(category):
+    """Нормалізує категорію до стандартного формату"""
+    if not category:
+        return category
+    
+    # Очищуємо зайві пробіли
+    category = category.strip()
+    
+    # Конвертуємо до Title Case (Перша Літера Кожного Слова Велика)
+    # Це зробить: "продукти" → "Продукти", "ПРОДУКТИ" → "Продукти"
+    normalized = category.title()
+    
+    # Виправляємо деякі особливості української мови
+    # Замінюємо типові помилки Title Case для українських слів
+    corrections = {
+        "На": "на",      # "Обіди На Роботі" → "Обіди на Роботі"
+        "До": "до",      # "Дорога До Дому" → "Дорога до Дому"  
+        "В": "в",        # "Їжа В Кафе" → "Їжа в Кафе"
+        "З": "з",        # "Подарунки З Магазину" → "Подарунки з Магазину"
+        "І": "і",        # "Хліб І Молоко" → "Хліб і Молоко"
+        "Та": "та",      # "Фрукти Та Овочі" → "Фрукти та Овочі"
+        "Для": "для",    # "Подарунки Для Дітей" → "Подарунки для Дітей"
+        "По": "по",      # "Витрати По Дому" → "Витрати по Дому"
+    }
+    
+    # Застосовуємо виправлення
+    for wrong, correct in corrections.items():
+        normalized = normalized.replace(f" {wrong} ", f" {correct} ")
+    
+    return normalized
+
+
+def parse_expense_text(text):
+    """Розбирає текст витрати з підтримкою багатослівних категорій (до 3 слів)"""
+    text = text.strip()
+    
+    # Шукаємо перше число в тексті (це буде сума)
+    amount_pattern = r'\b(\d+(?:[.,]\d+)?)\b'
+    amount_match = re.search(amount_pattern, text)
+    
+    if not amount_match:
+        return None, None, None
+    
+    # Позиція де знайшли суму
+    amount_start = amount_match.start()
+    amount_str = amount_match.group(1).replace(',', '.')
+    
+    try:
+        amount = float(amount_str)
+    except ValueError:
+        return None, None, None
+    
+    # Все до суми - це потенційна категорія
+    category_text = text[:amount_start].strip()
+    
+    # Все після суми - це коментар
+    comment_start = amount_match.end()
+    comment = text[comment_start:].strip()
+    
+    # Обробляємо категорію - не більше 3 слів
+    if not category_text:
+        return None, None, None
+    
+    category_words = category_text.split()
+    
+    # Обмежуємо до 3 слів максимум
+    if len(category_words) > 3:
+        category = ' '.join(category_words[:3])
+        # Решту слів додаємо до коментаря
+        remaining_words = ' '.join(category_words[3:])
+        if comment:
+            comment = remaining_words + ' ' + comment
+        else:
+            comment = remaining_words
+    else:
+        category = category_text
+    
+    # НОРМАЛІЗУЄМО КАТЕГОРІЮ
+    category = normalize_category(category)
+    
+    # Валідація суми
+    if amount <= 0:
+        return None, None, None
+    
+    return category, amount, comment
+
+
+def split_bulk_lines(text):
+    """Розбиває повідомлення на рядки витрат, прибираючи маркери списку"""
+    lines = []
+    for line in text.splitlines():
+        line = BULK_LINE_PREFIX.sub('', line).strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def bulk_expense_lines(text):
+    """Рядки пакетного запису або None, якщо це звичайна витрата.
+
+    Пакетом вважається повідомлення, де щонайменше два рядки є
+    витратами; «Кава 50» з коментарем на другому рядку лишається
+    однією витратою.
+    """
+    lines = split_bulk_lines(text)
+    expenses = 0
+    for line in lines:
+        if parse_expense_text(line)[0] is not None:
+            expenses += 1
+            if expenses >= 2:
+                return lines
+    return None
+
+
+def parse_bulk_lines(lines):
+    """Розбирає рядки пакета: [(рядок, (категорія, сума, коментар) або None), ...]"""
+    results = []
+    for line in lines:
+        category, amount, comment = parse_expense_text(line)
+        results.append((line, None if category is None else (category, amount, comment)))
+    return results
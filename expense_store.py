@@ -0,0 +1,357 @@
+# expense_store.py - компактне колонкове сховище витрат
+import bisect
+import calendar
+import datetime
+from array import array
+from itertools import compress
+
+IGNORED_MARK = '[IGNORED]'
+SECONDS_PER_DAY = 86400
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def to_timestamp(date):
+    """Перетворює naive datetime таблиці на секунди (без урахування DST)"""
+    return calendar.timegm(date.timetuple())
+
+
+def from_timestamp(timestamp):
+    """Зворотне перетворення секунд у naive datetime"""
+    return _EPOCH + datetime.timedelta(seconds=timestamp)
+
+
+class PeriodSummary:
+    """Підсумки витрат для вибірки записів"""
+
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+        self.categories = {}
+        self.users = {}
+        self.user_counts = {}
+        self.user_categories = {}
+
+    def __bool__(self):
+        return self.count > 0
+
+
+class AggregateIndex:
+    """Денні агрегати витрат: день -> (користувач, категорія) -> [сума, кількість].
+
+    Оновлюється інкрементально при кожній зміні сховища, тому підсумки
+    за день/тиждень/місяць/рік - це сума кількох денних кошиків, а не
+    прохід по всьому журналу. Ігноровані записи в індекс не потрапляють.
+    """
+
+    def __init__(self):
+        self.days = {}
+        self.first_day = None
+        self.last_day = None
+
+    def add(self, timestamp, user_code, category_code, amount, sign=1):
+        day = timestamp // SECONDS_PER_DAY
+        bucket = self.days.setdefault(day, {})
+        key = (user_code, category_code)
+        cell = bucket.get(key)
+        if cell is None:
+            cell = bucket[key] = [0.0, 0]
+        cell[0] += sign * amount
+        cell[1] += sign
+        if cell[1] <= 0:
+            del bucket[key]
+            if not bucket:
+                del self.days[day]
+
+        if self.first_day is None or day < self.first_day:
+            self.first_day = day
+        if self.last_day is None or day > self.last_day:
+            self.last_day = day
+
+    def collect(self, start=None, end=None, user_code=None):
+        """Сумує кошики днів у проміжку [start, end) (межі вирівняні по добі)"""
+        totals = {}
+        if not self.days:
+            return totals
+
+        first = self.first_day if start is None else max(start // SECONDS_PER_DAY, self.first_day)
+        last = self.last_day if end is None else min(end // SECONDS_PER_DAY - 1, self.last_day)
+        if last - first + 1 > len(self.days):
+            days = (day for day in self.days if first <= day <= last)
+        else:
+            days = range(first, last + 1)
+
+        for day in days:
+            bucket = self.days.get(day)
+            if not bucket:
+                continue
+            for key, (amount, count) in bucket.items():
+                if user_code is not None and key[0] != user_code:
+                    continue
+                cell = totals.get(key)
+                if cell is None:
+                    totals[key] = [amount, count]
+                else:
+                    cell[0] += amount
+                    cell[1] += count
+        return totals
+
+
+class ExpenseStore:
+    """Колонкове сховище витрат.
+
+    Кожна колонка - окремий масив: час у секундах (array('q')),
+    суми (array('d')), коди категорій і користувачів (array('i')),
+    ознаки ігнорування та «ще не в таблиці» (array('b')) і стабільний
+    ідентифікатор запису (array('q')).
+    Назви категорій і користувачів зберігаються один раз у довідниках,
+    тож мільйон записів займає десятки мегабайт замість сотень.
+
+    Записи впорядковані за часом, тому будь-який період знаходиться
+    бінарним пошуком за O(log n), а останні записи - з кінця масивів.
+
+    Номери рядків таблиці веде локальний журнал, тож видалення рядків
+    не зачіпає сховища. Запис за ідентифікатором знаходиться через
+    словник id -> час і бінарний пошук, без проходу по масивах.
+    """
+
+    def __init__(self, first_id=1):
+        self.timestamps = array('q')
+        self.amounts = array('d')
+        self.category_codes = array('i')
+        self.user_codes = array('i')
+        self.ignored = array('b')
+        self.pending = array('b')
+        self.ids = array('q')
+        self.comments = []
+        self.next_id = first_id
+        self._timestamp_of_id = {}  # ідентифікатор -> час запису
+
+        self.categories = []  # код -> назва
+        self.users = []
+        self._category_index = {}  # назва -> код
+        self._user_index = {}
+
+        self.aggregates = AggregateIndex()
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @staticmethod
+    def _intern(value, names, index):
+        code = index.get(value)
+        if code is None:
+            code = len(names)
+            names.append(value)
+            index[value] = code
+        return code
+
+    def category_code(self, category):
+        return self._category_index.get(category)
+
+    def user_code(self, user):
+        return self._user_index.get(user)
+
+    # === ЗМІНА ДАНИХ ===
+
+    def append(self, timestamp, category, amount, user, comment, pending, record_id=None):
+        """Додає запис зі збереженням порядку за часом, повертає його ідентифікатор"""
+        if record_id is None:
+            record_id = self.next_id
+        self.next_id = max(self.next_id, record_id + 1)
+
+        category_code = self._intern(category, self.categories, self._category_index)
+        user_code = self._intern(user, self.users, self._user_index)
+        is_ignored = IGNORED_MARK in comment
+
+        timestamps = self.timestamps
+        if not timestamps or timestamps[-1] <= timestamp:
+            position = len(timestamps)
+        else:
+            position = bisect.bisect_right(timestamps, timestamp)
+
+        timestamps.insert(position, timestamp)
+        self.amounts.insert(position, amount)
+        self.category_codes.insert(position, category_code)
+        self.user_codes.insert(position, user_code)
+        self.ignored.insert(position, is_ignored)
+        self.pending.insert(position, pending)
+        self.ids.insert(position, record_id)
+        self.comments.insert(position, comment)
+        self._timestamp_of_id[record_id] = timestamp
+
+        if not is_ignored:
+            self.aggregates.add(timestamp, user_code, category_code, amount)
+        return record_id
+
+    def _index_record(self, position, sign):
+        self.aggregates.add(
+            self.timestamps[position],
+            self.user_codes[position],
+            self.category_codes[position],
+            self.amounts[position],
+            sign
+        )
+
+    def remove(self, position):
+        """Видаляє запис за позицією"""
+        if not self.ignored[position]:
+            self._index_record(position, -1)
+
+        del self.timestamps[position]
+        del self.amounts[position]
+        del self.category_codes[position]
+        del self.user_codes[position]
+        del self.ignored[position]
+        del self.pending[position]
+        del self._timestamp_of_id[self.ids[position]]
+        del self.ids[position]
+        del self.comments[position]
+
+    def set_comment(self, position, comment):
+        was_ignored = bool(self.ignored[position])
+        is_ignored = IGNORED_MARK in comment
+        self.comments[position] = comment
+        self.ignored[position] = is_ignored
+
+        if was_ignored != is_ignored:
+            self._index_record(position, 1 if was_ignored else -1)
+
+    def position_of_id(self, record_id):
+        """Позиція запису за ідентифікатором або None"""
+        timestamp = self._timestamp_of_id.get(record_id)
+        if timestamp is None:
+            return None
+        # Серед записів тієї самої секунди - зазвичай один-два
+        lo, hi = self.period_slice(timestamp, timestamp + 1)
+        ids = self.ids
+        for i in range(lo, hi):
+            if ids[i] == record_id:
+                return i
+        return None
+
+    def find(self, timestamp, category, amount, user):
+        """Ідентифікатор запису з указаними полями (найновіший) або None"""
+        lo, hi = self.period_slice(timestamp, timestamp + 1)
+        category_code = self.category_code(category)
+        user_code = self.user_code(user)
+        for i in range(hi - 1, lo - 1, -1):
+            if (self.category_codes[i] == category_code and
+                    self.user_codes[i] == user_code and
+                    self.amounts[i] == amount):
+                return self.ids[i]
+        return None
+
+    def record(self, position):
+        """Повертає запис у вигляді словника (для відображення)"""
+        return {
+            'id': self.ids[position],
+            'date': from_timestamp(self.timestamps[position]),
+            'category': self.categories[self.category_codes[position]],
+            'amount': self.amounts[position],
+            'user': self.users[self.user_codes[position]],
+            'comment': self.comments[position],
+            'is_ignored': bool(self.ignored[position]),
+            'is_pending': bool(self.pending[position])
+        }
+
+    # === ВИБІРКИ ТА АГРЕГАЦІЯ ===
+
+    def period_slice(self, start=None, end=None):
+        """Межі [lo, hi) позицій записів у проміжку часу [start, end)"""
+        timestamps = self.timestamps
+        lo = 0 if start is None else bisect.bisect_left(timestamps, start)
+        hi = len(timestamps) if end is None else bisect.bisect_left(timestamps, end, lo)
+        return lo, hi
+
+    def select(self, start=None, end=None, user=None, include_ignored=False):
+        """Позиції записів у проміжку [start, end) для користувача"""
+        lo, hi = self.period_slice(start, end)
+        positions = range(lo, hi)
+
+        if user is not None:
+            code = self.user_code(user)
+            if code is None:
+                return []
+            positions = compress(positions, map(code.__eq__, self.user_codes[lo:hi]))
+
+        if not include_ignored:
+            ignored = self.ignored
+            positions = (i for i in positions if not ignored[i])
+
+        return list(positions)
+
+    def summarize_range(self, start=None, end=None, user=None):
+        """Підсумки неігнорованих витрат за [start, end).
+
+        Для меж, вирівняних по добі, відповідь збирається з денних
+        агрегатів; інакше - по зрізу, знайденому бінарним пошуком.
+        """
+        aligned = all(bound is None or bound % SECONDS_PER_DAY == 0 for bound in (start, end))
+        if not aligned:
+            return self.summarize(self.select(start, end, user))
+
+        user_code = None
+        if user is not None:
+            user_code = self.user_code(user)
+            if user_code is None:
+                return PeriodSummary()
+
+        summary = PeriodSummary()
+        for (user_code, category_code), (amount, count) in self.aggregates.collect(start, end, user_code).items():
+            user_name = self.users[user_code]
+            category = self.categories[category_code]
+            summary.total += amount
+            summary.count += count
+            summary.categories[category] = summary.categories.get(category, 0.0) + amount
+            summary.users[user_name] = summary.users.get(user_name, 0.0) + amount
+            summary.user_counts[user_name] = summary.user_counts.get(user_name, 0) + count
+            summary.user_categories.setdefault(user_name, {})[category] = amount
+        return summary
+
+    def summarize(self, positions):
+        """Рахує суми за категоріями та користувачами одним проходом"""
+        summary = PeriodSummary()
+        category_sums = [0.0] * len(self.categories)
+        user_sums = [0.0] * len(self.users)
+        user_counts = [0] * len(self.users)
+        user_categories = {}
+
+        amounts = self.amounts
+        category_codes = self.category_codes
+        user_codes = self.user_codes
+        for i in positions:
+            amount = amounts[i]
+            category = category_codes[i]
+            user = user_codes[i]
+            category_sums[category] += amount
+            user_sums[user] += amount
+            user_counts[user] += 1
+            key = (user, category)
+            user_categories[key] = user_categories.get(key, 0.0) + amount
+
+        summary.count = sum(user_counts)
+        summary.total = sum(user_sums)
+        summary.categories = {self.categories[code]: amount
+                              for code, amount in enumerate(category_sums) if amount}
+        summary.users = {self.users[code]: amount
+                         for code, amount in enumerate(user_sums) if user_counts[code]}
+        summary.user_counts = {self.users[code]: count
+                               for code, count in enumerate(user_counts) if count}
+        for (user, category), amount in user_categories.items():
+            summary.user_categories.setdefault(self.users[user], {})[self.categories[category]] = amount
+        return summary
+
+    def recent(self, user, limit=5):
+        """Останні записи користувача (включно з ігнорованими), від нових до старих"""
+        code = self.user_code(user)
+        if code is None:
+            return []
+        user_codes = self.user_codes
+        result = []
+        for i in range(len(user_codes) - 1, -1, -1):
+            if user_codes[i] == code:
+                result.append(self.record(i))
+                if len(result) >= limit:
+                    break
+        return result
@@ -1,14 +1,14 @@
 import logging
 import datetime
+import calendar
 import os
-import tempfile
-import subprocess
+import shutil
 import asyncio
-import re
 import platform
 import signal
 import sys
 import time
+import hashlib
 from datetime import timedelta
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
@@ -18,9 +18,41 @@ from telegram.request import HTTPXRequest
 from telegram.error import TimedOut, NetworkError
 from telegram.error import Conflict
 
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from google.cloud import speech
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from sheets_gateway import SheetsGateway
+from sheets_scheduler import SheetsScheduler
+from expense_cache import ExpenseCache
+from ledger_db import ExpenseLedger
+from expense_store import ExpenseStore, to_timestamp
+from sheets_replicator import SheetsReplicator
+from speech_recognizer import (
+    create_recognizer,
+    TranscriptCache,
+    UnsupportedAudioError,
+    ENCODING_OGG_OPUS,
+    ENCODING_LINEAR16,
+    NUMBER_WORDS
+)
+from update_processing import PerChatUpdateProcessor
+from expense_parser import bulk_expense_lines, normalize_category, parse_bulk_lines, parse_expense_text
+from startup_timing import PROCESS_STARTED, startup_timer
+from metrics import (
+    CACHE_REQUESTS_TOTAL, ERRORS_TOTAL, FFMPEG_SECONDS, HANDLER_SECONDS, SPEECH_SECONDS,
+    TELEGRAM_REQUEST_SECONDS, GaugeFunction, classify_error, registry
+)
+from voice_processing import (
+    VoiceScheduler,
+    VoiceQueueFull,
+    transcode_to_pcm,
+    AudioConversionError,
+    AudioConversionTimeout,
+    SPEECH_SAMPLE_RATE,
+    OPUS_SAMPLE_RATE,
+    is_ogg_opus,
+    iter_download,
+    digest_chunks
+)
 
 # Імпорт конфігурації
 from config import (
@@ -32,7 +64,34 @@ from config import (
     LOG_LEVEL,
     MAX_VOICE_DURATION,
     FFMPEG_TIMEOUT,
-    GOOGLE_API_TIMEOUT
+    GOOGLE_API_TIMEOUT,
+    SHEETS_MAX_WORKERS,
+    SHEETS_READS_PER_MINUTE,
+    SHEETS_WRITES_PER_MINUTE,
+    SHEETS_BURST,
+    SHEETS_RATE_LIMIT_RETRIES,
+    EXPENSE_CACHE_REFRESH_INTERVAL,
+    EXPENSE_CACHE_TTL,
+    SHEETS_FLUSH_INTERVAL,
+    SHEETS_MAX_RETRY_DELAY,
+    LEDGER_DB_FILE,
+    STATS_STALE_AFTER,
+    BULK_MAX_LINES,
+    MAX_CONCURRENT_VOICE_PROCESSING,
+    VOICE_QUEUE_SIZE,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    SPEECH_STREAMING,
+    VOICE_TRANSCRIPT_CACHE_SIZE,
+    SPEECH_ENGINE,
+    VOSK_MODEL_PATH,
+    VOSK_USE_GRAMMAR,
+    SPEECH_HINT_BOOST,
+    USE_WEBHOOK,
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET_TOKEN,
+    MAX_CONCURRENT_UPDATES
 )
 
 # Налаштування логування
@@ -65,26 +124,6 @@ def cleanup_old_actions():
 # Глобальна змінна для сімейного бюджету
 family_budget_amount = 0
 
-# Клас для моніторингу з'єднань
-class ConnectionMonitor:
-    def __init__(self):
-        self.start_time = time.time()
-        self.request_count = 0
-        self.error_count = 0
-    
-    def log_request(self):
-        self.request_count += 1
-        if self.request_count % 100 == 0:
-            uptime = time.time() - self.start_time
-            logger.info(f"📊 Статистика: {self.request_count} запитів, "
-                       f"{self.error_count} помилок, uptime: {uptime/3600:.1f}h")
-    
-    def log_error(self):
-        self.error_count += 1
-
-# Створюємо глобальний монітор
-monitor = ConnectionMonitor()
-
 # === ФУНКЦІЇ ДЛЯ СТВОРЕННЯ REPLY КНОПОК ===
 
 def create_persistent_keyboard():
@@ -172,20 +211,31 @@ def create_management_menu():
 
 # === БЕЗПЕЧНІ ФУНКЦІЇ ===
 
+# Запобіжники зовнішніх сервісів: поки сервіс недоступний, запити відмовляють одразу
+telegram_breaker = CircuitBreaker('telegram', CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+sheets_breaker = CircuitBreaker('sheets', CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+speech_breaker = CircuitBreaker('speech', CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+
 # Функція для безпечного виконання операцій бота
 async def safe_bot_operation(operation, max_retries=3):
     """Безпечне виконання операцій бота з покращеною retry логікою"""
+    # Поки Telegram недоступний, не чекаємо таймаутів кожної спроби
+    async with telegram_breaker.guard():
+        return await _retry_bot_operation(operation, max_retries)
+
+async def _retry_bot_operation(operation, max_retries):
+    operation_name = getattr(operation, '__name__', 'operation')
     for attempt in range(max_retries):
         try:
-            monitor.log_request()
-            return await operation()
+            with TELEGRAM_REQUEST_SECONDS.time(operation=operation_name):
+                return await operation()
             
         except Exception as e:
-            monitor.log_error()
-            error_msg = str(e).lower()
+            category = classify_error(e)
+            ERRORS_TOTAL.inc(source='telegram', category=category)
             
             # Обробка конфліктів
-            if "conflict" in error_msg or "terminated by other getupdates" in error_msg:
+            if category == 'conflict':
                 logger.warning(f"🔄 Конфлікт на спробі {attempt + 1}: {e}")
                 
                 if attempt < max_retries - 1:
@@ -197,7 +247,7 @@ async def safe_bot_operation(operation, max_retries=3):
                     raise
             
             # Обробка timeout помилок
-            elif "timeout" in error_msg or "timed out" in error_msg:
+            elif category == 'timeout':
                 logger.warning(f"⏰ Timeout на спробі {attempt + 1}: {e}")
                 
                 if attempt < max_retries - 1:
@@ -207,7 +257,7 @@ async def safe_bot_operation(operation, max_retries=3):
                     raise
             
             # Обробка мережевих помилок (включаючи httpx.ReadError)
-            elif any(keyword in error_msg for keyword in ["network", "connection", "unreachable", "failed to connect", "readerror", "readtimeout"]):
+            elif category == 'network':
                 logger.warning(f"🌐 Мережева помилка на спробі {attempt + 1}: {e}")
                 
                 if attempt < max_retries - 1:
@@ -219,7 +269,7 @@ async def safe_bot_operation(operation, max_retries=3):
                     raise
             
             # Обробка rate limit помилок
-            elif "rate limit" in error_msg or "too many requests" in error_msg:
+            elif category == 'rate_limit':
                 logger.warning(f"🚦 Rate limit на спробі {attempt + 1}: {e}")
                 
                 if attempt < max_retries - 1:
@@ -246,6 +296,8 @@ async def safe_send_message(update, context, text, **kwargs):
     
     try:
         return await safe_bot_operation(send_operation)
+    except CircuitOpenError as e:
+        logger.warning(f"Повідомлення не відправлено: {e}")
     except Exception as e:
         logger.error(f"Не вдалося відправити повідомлення: {e}")
         # Fallback - спробувати простий текст
@@ -257,6 +309,9 @@ async def safe_send_message(update, context, text, **kwargs):
 # Безпечна відправка повідомлень для callback
 async def safe_send_callback_message(query, text, **kwargs):
     """Безпечна відправка повідомлень через callback query"""
+    if telegram_breaker.is_open:
+        logger.warning("Callback повідомлення не відправлено: Telegram недоступний")
+        return None
     try:
         if 'reply_markup' in kwargs:
             return await query.edit_message_text(text, **kwargs)
@@ -278,38 +333,99 @@ def get_ffmpeg_path():
         logger.info(f"Використовую локальний FFmpeg: {local_ffmpeg}")
         return local_ffmpeg
     
-    # Спробуємо системний FFmpeg
-    try:
-        result = subprocess.run(["ffmpeg", "-version"], capture_output=True, check=True, text=True, timeout=10)
-        logger.info("Використовую системний FFmpeg")
-        return "ffmpeg"
-    except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
-        logger.warning("FFmpeg не знайдено або timeout")
-        return None
+    # Спробуємо системний FFmpeg (пошук у PATH без запуску процесу)
+    system_ffmpeg = shutil.which("ffmpeg")
+    if system_ffmpeg:
+        logger.info(f"Використовую системний FFmpeg: {system_ffmpeg}")
+        return system_ffmpeg
+    
+    logger.warning("FFmpeg не знайдено")
+    return None
 
 # Глобальна змінна для шляху FFmpeg
 FFMPEG_PATH = get_ffmpeg_path()
 
-# Підключення до Google Sheets API
-try:
-    creds = Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE,
-        scopes=['https://www.googleapis.com/auth/spreadsheets']
-    )
-    service = build('sheets', 'v4', credentials=creds)
-    sheet = service.spreadsheets()
-    logger.info("Google Sheets API підключено успішно")
-except Exception as e:
-    logger.error(f"Помилка підключення до Google Sheets API: {e}")
-    raise
-
-# Підключення до Google Speech-to-Text API
-try:
-    speech_client = speech.SpeechClient.from_service_account_file(SERVICE_ACCOUNT_FILE)
-    logger.info("Google Speech-to-Text API підключено успішно")
-except Exception as e:
-    logger.error(f"Помилка підключення до Google Speech-to-Text API: {e}")
-    raise
+# Google Sheets API (клієнт створюється під час запуску, паралельно з іншими етапами)
+# Запити йдуть через спільну чергу з квотами: записи поперед читань
+sheets = SheetsGateway(
+    SERVICE_ACCOUNT_FILE,
+    SPREADSHEET_ID,
+    max_workers=SHEETS_MAX_WORKERS,
+    timeout=GOOGLE_API_TIMEOUT,
+    breaker=sheets_breaker,
+    scheduler=SheetsScheduler(
+        reads_per_minute=SHEETS_READS_PER_MINUTE,
+        writes_per_minute=SHEETS_WRITES_PER_MINUTE,
+        burst=SHEETS_BURST,
+        concurrency=SHEETS_MAX_WORKERS
+    ),
+    rate_limit_retries=SHEETS_RATE_LIMIT_RETRIES
+)
+
+# Локальний журнал витрат - основне сховище; таблиця - його репліка
+ledger = ExpenseLedger(LEDGER_DB_FILE)
+
+# Витрати в пам'яті для звітів, спільні для всіх обробників
+expense_cache = ExpenseCache(ledger)
+
+# Фонова синхронізація журналу з Google Sheets
+replicator = SheetsReplicator(
+    sheets,
+    ledger,
+    expense_cache,
+    RANGE_NAME,
+    flush_interval=SHEETS_FLUSH_INTERVAL,
+    refresh_interval=EXPENSE_CACHE_REFRESH_INTERVAL,
+    full_refresh_interval=EXPENSE_CACHE_TTL,
+    max_retry_delay=SHEETS_MAX_RETRY_DELAY
+)
+
+# Обмеження одночасної обробки голосових повідомлень
+voice_scheduler = VoiceScheduler(
+    max_concurrent=MAX_CONCURRENT_VOICE_PROCESSING,
+    max_queue=VOICE_QUEUE_SIZE
+)
+
+# Рушій розпізнавання мовлення: Google Speech-to-Text або локальний Vosk
+# (клієнт чи модель створюються при першому голосовому)
+speech_recognizer = create_recognizer(
+    SPEECH_ENGINE,
+    service_account_file=SERVICE_ACCOUNT_FILE,
+    language_code=SPEECH_LANGUAGE,
+    vosk_model_path=VOSK_MODEL_PATH,
+    vosk_use_grammar=VOSK_USE_GRAMMAR,
+    hint_boost=SPEECH_HINT_BOOST
+)
+logger.info(f"Рушій розпізнавання мовлення: {SPEECH_ENGINE}")
+
+# Уже розпізнані голосові (пересилання, повторні надсилання)
+transcript_cache = TranscriptCache(VOICE_TRANSCRIPT_CACHE_SIZE)
+
+# Стан черг для /metrics
+registry.register(GaugeFunction(
+    'findotbot_voice_queue',
+    'Голосові повідомлення в обробці (active) та в очікуванні (waiting)',
+    ('state',),
+    lambda: {('active',): voice_scheduler.active, ('waiting',): voice_scheduler.waiting}
+))
+registry.register(GaugeFunction(
+    'findotbot_pending_writes',
+    'Записи, ще не відправлені в Google Sheets',
+    collect=lambda: {(): len(replicator)}
+))
+registry.register(GaugeFunction(
+    'findotbot_circuit_state',
+    'Стан запобіжника: 0 - closed, 1 - half_open, 2 - open',
+    ('dependency',),
+    lambda: {
+        (breaker.name,): {'closed': 0, 'half_open': 1, 'open': 2}[breaker.state]
+        for breaker in (telegram_breaker, sheets_breaker, speech_breaker)
+    }
+))
+
+# Поточний Application (через нього webhook-обробник run.py передає оновлення)
+application = None
+webhook_active = False
 
 async def create_application():
     """Створює Application з покращеними налаштуваннями"""
@@ -331,6 +447,12 @@ async def create_application():
         Application.builder()
         .token(TOKEN)
         .request(request)
+        # Різні користувачі обробляються паралельно, повідомлення одного - по черзі.
+        # Голосові чекають у VoiceScheduler, займаючи спільний слот, тому для них
+        # додаються окремі слоти - повна черга голосових не зупиняє решту чатів
+        .concurrent_updates(PerChatUpdateProcessor(
+            MAX_CONCURRENT_UPDATES + MAX_CONCURRENT_VOICE_PROCESSING + VOICE_QUEUE_SIZE
+        ))
         .build()
     )
     
@@ -348,51 +470,18 @@ def signal_handler(signum, frame):
 
 # === ФУНКЦІЇ РОБОТИ З GOOGLE SHEETS ===
 
-def get_all_expenses():
-    """Отримує всі записи витрат з Google Sheets"""
+async def get_expense_store():
+    """Повертає сховище витрат, побудоване з локального журналу (без звернень до Google Sheets)"""
     try:
-        result = sheet.values().get(
-            spreadsheetId=SPREADSHEET_ID,
-            range=RANGE_NAME
-        ).execute()
-        
-        values = result.get('values', [])
-        if not values:
-            return []
-        
-        # Пропускаємо заголовок та фільтруємо валідні записи
-        expenses = []
-        for row in values[1:]:
-            if len(row) >= 3:
-                try:
-                    date_str = row[0]
-                    category = row[1]
-                    amount = float(row[2])
-                    user = row[3] if len(row) > 3 else "Unknown"
-                    comment = row[4] if len(row) > 4 else ""
-                    
-                    # Парсимо дату
-                    date_obj = datetime.datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                    
-                    expenses.append({
-                        'date': date_obj,
-                        'category': category,
-                        'amount': amount,
-                        'user': user,
-                        'comment': comment
-                    })
-                except (ValueError, IndexError) as e:
-                    logger.warning(f"Пропускаю невалідний запис: {row}, помилка: {e}")
-                    continue
-        
-        return expenses
+        return await expense_cache.get_store()
     except Exception as e:
         logger.error(f"Помилка отримання витрат: {e}")
-        return []
+        return ExpenseStore()
 
-def filter_expenses_by_period(expenses, period_type, user_filter=None, include_ignored=False):
-    """Фільтрує витрати за періодом"""
+def get_period_bounds(period_type):
+    """Повертає межі періоду [start, end) у секундах (None - без межі)"""
     now = datetime.datetime.now()
+    end_date = None
     
     if period_type == "day":
         start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -413,43 +502,25 @@ def filter_expenses_by_period(expenses, period_type, user_filter=None, include_i
     elif period_type == "year":
         start_date = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
     else:
-        return expenses
-    
-    # Фільтруємо по періоду
-    if period_type == "prev_month":
-        filtered = [exp for exp in expenses if start_date <= exp['date'] < end_date]
-    else:
-        filtered = [exp for exp in expenses if exp['date'] >= start_date]
-    
-    # Фільтр по користувачу
-    if user_filter:
-        filtered = [exp for exp in filtered if exp['user'] == user_filter]
-    
-    # Виключаємо ігноровані записи (якщо не запитали їх включити)
-    if not include_ignored:
-        filtered = [exp for exp in filtered if not ('[IGNORED]' in exp.get('comment', ''))]
+        return None, None
     
-    return filtered
+    return to_timestamp(start_date), (to_timestamp(end_date) if end_date else None)
 
-def generate_stats_message(expenses, period_name, user_filter=None):
+def summarize_period(store, period_type, user_filter=None, include_ignored=False):
+    """Підсумовує витрати за періодом (ігноровані записи за замовчуванням виключаються)"""
+    start, end = get_period_bounds(period_type)
+    if include_ignored:
+        return store.summarize(store.select(start, end, user_filter, include_ignored=True))
+    return store.summarize_range(start, end, user_filter)
+
+def generate_stats_message(summary, period_name, user_filter=None):
     """Генерує повідомлення зі статистикою"""
-    if not expenses:
+    if not summary:
         return f"Немає витрат за {period_name.lower()}."
     
-    # Загальна сума
-    total = sum(exp['amount'] for exp in expenses)
-    
-    # Статистика по категоріях
-    categories = {}
-    for exp in expenses:
-        category = exp['category']
-        categories[category] = categories.get(category, 0) + exp['amount']
-    
-    # Статистика по користувачах
-    users = {}
-    for exp in expenses:
-        user = exp['user']
-        users[user] = users.get(user, 0) + exp['amount']
+    total = summary.total
+    categories = summary.categories
+    users = summary.users
     
     # Формуємо повідомлення
     message = f"📊 Статистика за {period_name}"
@@ -458,8 +529,8 @@ def generate_stats_message(expenses, period_name, user_filter=None):
     message += ":\n\n"
     
     message += f"💰 Загальна сума: {total:.2f} грн\n"
-    message += f"📝 Кількість записів: {len(expenses)}\n"
-    message += f"📅 Середня витрата: {total/len(expenses):.2f} грн\n\n"
+    message += f"📝 Кількість записів: {summary.count}\n"
+    message += f"📅 Середня витрата: {total/summary.count:.2f} грн\n\n"
     
     # По категоріях
     message += "📂 По категоріях:\n"
@@ -476,6 +547,230 @@ def generate_stats_message(expenses, period_name, user_filter=None):
     
     return message
 
+# === ФОРМУВАННЯ ЗВІТІВ ===
+
+def medal(position):
+    """Емодзі місця в рейтингу"""
+    return "🥇" if position == 1 else "🥈" if position == 2 else "🥉" if position == 3 else f"{position}."
+
+def build_recent_message(store, user_name, limit=5):
+    """Повідомлення з останніми записами користувача"""
+    recent_expenses = store.recent(user_name, limit)
+    if not recent_expenses:
+        return None
+    
+    message = "📝 Ваші останні записи:\n\n"
+    for i, exp in enumerate(recent_expenses, 1):
+        ignored_mark = "🔕 " if exp['is_ignored'] else ""
+        pending_mark = "⏳ " if exp['is_pending'] else ""
+        message += f"{i}. {pending_mark}{ignored_mark}{exp['category']}: {exp['amount']:.2f} грн"
+        if exp['comment'] and not exp['is_ignored']:
+            message += f" ({exp['comment']})"
+        message += f"\n   📅 {exp['date'].strftime('%d.%m %H:%M')}\n\n"
+    return message
+
+def build_family_budget_message(store):
+    """Сімейний бюджет за поточний місяць"""
+    week = summarize_period(store, "week")
+    month = summarize_period(store, "month")
+    
+    if not month:
+        return "Немає витрат за поточний місяць."
+    
+    message = "💼 Сімейний бюджет:\n\n"
+    message += f"📅 За тиждень: {week.total:.2f} грн\n"
+    message += f"📅 За місяць: {month.total:.2f} грн\n"
+    
+    if week.total > 0:
+        projected_month = (week.total / 7) * 30
+        message += f"📈 Прогноз на місяць: {projected_month:.2f} грн\n"
+    
+    message += "\n👥 Розподіл по сім'ї:\n"
+    for user, amount in sorted(month.users.items(), key=lambda x: x[1], reverse=True):
+        percentage = (amount / month.total) * 100
+        message += f"• {user}: {amount:.2f} грн ({percentage:.1f}%)\n"
+    
+    message += "\n📂 Основні категорії:\n"
+    for category, amount in sorted(month.categories.items(), key=lambda x: x[1], reverse=True)[:5]:
+        percentage = (amount / month.total) * 100
+        message += f"• {category}: {amount:.2f} грн ({percentage:.1f}%)\n"
+    
+    return message
+
+def build_family_budget_prev_month_message(store):
+    """Сімейний бюджет за попередній місяць"""
+    prev_month = summarize_period(store, "prev_month")
+    
+    if not prev_month:
+        return "Немає витрат за попередній місяць."
+    
+    message = f"💼 Сімейний бюджет за попередній місяць:\n\n"
+    message += f"💰 Загальна сума: {prev_month.total:.2f} грн\n"
+    message += f"📝 Кількість записів: {prev_month.count}\n\n"
+    
+    # По користувачах
+    message += "👥 По користувачах:\n"
+    for user, amount in sorted(prev_month.users.items(), key=lambda x: x[1], reverse=True):
+        percentage = (amount / prev_month.total) * 100
+        message += f"• {user}: {amount:.2f} грн ({percentage:.1f}%)\n"
+    
+    # Топ категорії
+    message += "\n🏆 Топ категорії:\n"
+    top_categories = sorted(prev_month.categories.items(), key=lambda x: x[1], reverse=True)[:5]
+    for category, amount in top_categories:
+        percentage = (amount / prev_month.total) * 100
+        message += f"• {category}: {amount:.2f} грн ({percentage:.1f}%)\n"
+    
+    return message
+
+def build_compare_message(store):
+    """Порівняння витрат користувачів за поточний місяць"""
+    month = summarize_period(store, "month")
+    
+    if not month:
+        return "Немає витрат за поточний місяць."
+    
+    message = "👫 Порівняння витрат за місяць:\n\n"
+    message += f"💰 Загальний бюджет сім'ї: {month.total:.2f} грн\n\n"
+    
+    sorted_users = sorted(month.users.items(), key=lambda x: x[1], reverse=True)
+    
+    for i, (user, user_total) in enumerate(sorted_users, 1):
+        percentage = (user_total / month.total) * 100
+        avg_expense = user_total / month.user_counts[user]
+        
+        message += f"{i}. 👤 {user}:\n"
+        message += f"   💰 {user_total:.2f} грн ({percentage:.1f}%)\n"
+        message += f"   📝 {month.user_counts[user]} записів\n"
+        message += f"   📊 Середня витрата: {avg_expense:.2f} грн\n"
+        
+        top_categories = sorted(month.user_categories[user].items(), key=lambda x: x[1], reverse=True)[:3]
+        message += "   🏆 Топ категорії: "
+        message += ", ".join([f"{cat} ({amt:.0f}₴)" for cat, amt in top_categories])
+        message += "\n\n"
+    
+    return message
+
+def build_compare_prev_month_message(store):
+    """Порівняння витрат користувачів за попередній місяць"""
+    prev_month = summarize_period(store, "prev_month")
+    
+    if not prev_month:
+        return "Немає витрат за попередній місяць для порівняння."
+    
+    message = "👫 Порівняння витрат за попередній місяць:\n\n"
+    
+    for user, amount in sorted(prev_month.users.items(), key=lambda x: x[1], reverse=True):
+        percentage = (amount / prev_month.total) * 100
+        message += f"👤 {user}:\n"
+        message += f"   💰 Сума: {amount:.2f} грн ({percentage:.1f}%)\n"
+        
+        top_categories = sorted(prev_month.user_categories[user].items(), key=lambda x: x[1], reverse=True)[:3]
+        message += "   🏆 Топ категорії: "
+        message += ", ".join([f"{cat} ({amt:.0f}₴)" for cat, amt in top_categories])
+        message += "\n\n"
+    
+    return message
+
+def build_who_spent_more_message(store, period="month"):
+    """Рейтинг витрат користувачів за період"""
+    summary = summarize_period(store, period)
+    
+    if not summary:
+        period_names = {"day": "сьогодні", "week": "тиждень", "month": "поточний місяць", "year": "рік"}
+        return f"Немає витрат за {period_names.get(period, period)}."
+    
+    if len(summary.users) < 2:
+        return "Потрібно мінімум 2 користувачі для порівняння."
+    
+    sorted_users = sorted(summary.users.items(), key=lambda x: x[1], reverse=True)
+    
+    period_names = {"day": "сьогодні", "week": "цього тижня", "month": "цього місяця", "year": "цього року"}
+    period_name = period_names.get(period, period)
+    
+    message = f"🏆 Рейтинг витрат {period_name}:\n\n"
+    
+    for i, (user, amount) in enumerate(sorted_users, 1):
+        percentage = (amount / summary.total) * 100
+        emoji = "🥇" if i == 1 else "🥈" if i == 2 else "🥉"
+        message += f"{emoji} {user}: {amount:.2f} грн ({percentage:.1f}%)\n"
+    
+    difference = sorted_users[0][1] - sorted_users[1][1]
+    message += f"\n💸 Різниця: {difference:.2f} грн"
+    
+    if difference > 0:
+        message += f"\n💡 {sorted_users[0][0]} витратив більше на {difference:.2f} грн"
+    
+    return message
+
+def build_who_spent_more_prev_month_message(store):
+    """Рейтинг витрат користувачів за попередній місяць"""
+    prev_month = summarize_period(store, "prev_month")
+    
+    if not prev_month:
+        return "Немає витрат за попередній місяць для рейтингу."
+    
+    message = "🏆 Рейтинг витрат за попередній місяць:\n\n"
+    
+    for position, (user, amount) in enumerate(sorted(prev_month.users.items(), key=lambda x: x[1], reverse=True), 1):
+        percentage = (amount / prev_month.total) * 100
+        message += f"{medal(position)} {user}: {amount:.2f} грн ({percentage:.1f}%)\n"
+    
+    message += f"\n💰 Загальна сума: {prev_month.total:.2f} грн"
+    message += f"\n📝 Всього записів: {prev_month.count}"
+    
+    return message
+
+def build_top_categories_message(store):
+    """Топ категорій за поточний місяць"""
+    month = summarize_period(store, "month")
+    
+    if not month:
+        return "Немає витрат за поточний місяць."
+    
+    message = "🏆 Топ категорій за місяць:\n\n"
+    for i, (category, amount) in enumerate(sorted(month.categories.items(), key=lambda x: x[1], reverse=True), 1):
+        percentage = (amount / month.total) * 100
+        message += f"{medal(i)} {category}: {amount:.2f} грн ({percentage:.1f}%)\n"
+    
+    return message
+
+def build_budget_status_message(store):
+    """Статус виконання сімейного бюджету"""
+    if family_budget_amount == 0:
+        return ("❌ Бюджет не встановлено.\n"
+                "Використайте /budget СУМА для встановлення бюджету.")
+    
+    spent = summarize_period(store, "month").total
+    
+    remaining = family_budget_amount - spent
+    percentage = (spent / family_budget_amount) * 100
+    
+    message = f"💰 Статус сімейного бюджету:\n\n"
+    message += f"📊 Бюджет на місяць: {family_budget_amount:.2f} грн\n"
+    message += f"💸 Витрачено: {spent:.2f} грн ({percentage:.1f}%)\n"
+    
+    if remaining > 0:
+        message += f"✅ Залишилось: {remaining:.2f} грн\n"
+        
+        now = datetime.datetime.now()
+        days_in_month = calendar.monthrange(now.year, now.month)[1]
+        days_passed = now.day
+        days_remaining = days_in_month - days_passed
+        
+        if days_remaining > 0:
+            daily_budget = remaining / days_remaining
+            message += f"📅 Можна витрачати {daily_budget:.2f} грн на день\n"
+    else:
+        message += f"⚠️ Перевищення бюджету: {abs(remaining):.2f} грн\n"
+    
+    progress_length = 10
+    filled_length = int(progress_length * percentage / 100)
+    bar = "█" * filled_length + "░" * (progress_length - filled_length)
+    message += f"\n📊 Прогрес: {bar} {percentage:.1f}%"
+    
+    return message
+
 # === НОВА ФУНКЦІЯ ДЛЯ ОБРОБКИ КНОПКИ МЕНЮ ===
 
 async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -494,6 +789,8 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
     """Обробник натискань на inline кнопки"""
     query = update.callback_query
     await query.answer()
+    # Повідомлення показуватиме вже інше - фонове оновлення статистики його не чіпає
+    stats_views.pop(callback_message_key(query), None)
     
     data = query.data
     
@@ -620,40 +917,113 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
 
 async def execute_command_from_callback(query, command, context):
     """Виконує команду з callback кнопки"""
-    if command == "mystats":
-        await my_stats_callback(query, context)
-    elif command == "mystats_prev":
-        await my_stats_prev_month_callback(query, context)
-    elif command == "recent":
-        await show_recent_expenses_callback(query, context)
-    elif command == "family":
-        await family_budget_callback(query, context)
-    elif command == "family_prev":
-        await family_budget_prev_month_callback(query, context)
-    elif command == "compare":
-        await compare_users_callback(query, context)
-    elif command == "compare_prev":
-        await compare_users_prev_month_callback(query, context)
-    elif command == "whospent":
-        await who_spent_more_callback(query, context)
-    elif command == "whospent_prev":
-        await who_spent_more_prev_month_callback(query, context)
-    elif command == "today":
-        await stats_today_callback(query, context)
-    elif command == "week":
-        await stats_week_callback(query, context)
-    elif command == "month":
-        await stats_month_callback(query, context)
-    elif command == "prev_month":
-        await stats_prev_month_callback(query, context)
-    elif command == "top":
-        await top_categories_callback(query, context)
-    elif command == "budget_status":
-        await budget_status_callback(query, context)
-    elif command == "undo":
-        await undo_last_action_callback(query, context)
-    elif command == "ignore":
-        await mark_as_ignored_callback(query, context)
+    commands = {
+        "mystats": my_stats_callback,
+        "mystats_prev": my_stats_prev_month_callback,
+        "recent": show_recent_expenses_callback,
+        "family": family_budget_callback,
+        "family_prev": family_budget_prev_month_callback,
+        "compare": compare_users_callback,
+        "compare_prev": compare_users_prev_month_callback,
+        "whospent": who_spent_more_callback,
+        "whospent_prev": who_spent_more_prev_month_callback,
+        "today": stats_today_callback,
+        "week": stats_week_callback,
+        "month": stats_month_callback,
+        "prev_month": stats_prev_month_callback,
+        "top": top_categories_callback,
+        "budget_status": budget_status_callback,
+        "undo": undo_last_action_callback,
+        "ignore": mark_as_ignored_callback,
+    }
+    handler = commands.get(command)
+    if handler is None:
+        # callback_data надсилає клієнт: невідомі команди не створюють нових міток метрик
+        logger.warning(f"Невідома команда кнопки: {command[:50]}")
+        return
+    # Кожна кнопка - окрема мітка, інакше всі команди меню зливаються в handle_callback_query
+    with HANDLER_SECONDS.time(handler=f"cb_{command}"):
+        await handler(query, context)
+
+# === СТАТИСТИКА: ВІДПОВІДЬ ЗІ ЗНІМКА ТА ФОНОВЕ ОНОВЛЕННЯ ===
+
+# Фонові оновлення статистики (посилання, щоб задачі не зібрав збирач сміття)
+stats_refresh_tasks = set()
+# Повідомлення, що чекають фонового оновлення: ключ повідомлення -> позначка показу
+stats_views = {}
+
+def callback_message_key(query):
+    message = query.message
+    if message is None:
+        return query.inline_message_id
+    return (message.chat_id, message.message_id)
+
+def format_sync_age(seconds):
+    """Позначка віку даних під статистикою"""
+    if seconds is None:
+        return "🕒 Дані ще не звірено з таблицею, оновлюю..."
+    if seconds < 120:
+        age = f"{int(seconds)} с"
+    elif seconds < 7200:
+        age = f"{int(seconds // 60)} хв"
+    else:
+        age = f"{int(seconds // 3600)} год"
+    return f"🕒 Дані таблиці станом на {age} тому, оновлюю..."
+
+async def send_stats_callback(query, build_message, reply_markup):
+    """Відповідає статистикою одразу з локального сховища.
+
+    Якщо журнал давно не звірявся з таблицею, повідомлення отримує
+    позначку віку, а зміни з таблиці дочитуються у фоні; після цього
+    повідомлення редагується на місці - зі свіжими цифрами без позначки
+    або з попередженням, якщо таблицю прочитати не вдалося.
+    """
+    store = await get_expense_store()
+    message = build_message(store)
+    synced_ago = replicator.synced_ago()
+    if synced_ago is not None and synced_ago <= STATS_STALE_AFTER:
+        CACHE_REQUESTS_TOTAL.inc(cache='stats', result='hit')
+        await safe_send_callback_message(query, message, reply_markup=reply_markup)
+        return
+
+    CACHE_REQUESTS_TOTAL.inc(cache='stats', result='miss')
+    if sheets_breaker.is_open:
+        # Таблиця недоступна - показуємо збережене без спроби оновлення
+        await safe_send_callback_message(
+            query,
+            f"{message}\n\n⚠️ Google Sheets тимчасово недоступна, показано збережені дані.",
+            reply_markup=reply_markup
+        )
+        return
+    await safe_send_callback_message(query, f"{message}\n\n{format_sync_age(synced_ago)}", reply_markup=reply_markup)
+    view = object()
+    stats_views[callback_message_key(query)] = view
+    task = asyncio.create_task(revalidate_stats(query, view, build_message, reply_markup))
+    stats_refresh_tasks.add(task)
+    task.add_done_callback(stats_refresh_tasks.discard)
+
+async def revalidate_stats(query, view, build_message, reply_markup):
+    """Дочитує зміни з таблиці та прибирає позначку «оновлюю...» з показаної статистики"""
+    key = callback_message_key(query)
+    error = None
+    try:
+        # Одночасні оновлення з кількох повідомлень чекають одне читання таблиці
+        await replicator.refresh()
+    except Exception as e:
+        logger.warning(f"Не вдалося оновити статистику з таблиці: {e}")
+        error = e
+    finally:
+        current = stats_views.get(key)
+        if current is view:
+            del stats_views[key]
+
+    # Користувач уже перейшов в інше меню чи відкрив іншу статистику
+    if current is not view:
+        return
+    message = build_message(await get_expense_store())
+    if error is not None:
+        message += "\n\n⚠️ Не вдалося оновити дані з таблиці, показано збережені дані."
+    await safe_send_callback_message(query, message, reply_markup=reply_markup)
 
 # === CALLBACK ФУНКЦІЇ ===
 
@@ -662,32 +1032,32 @@ async def my_stats_callback(query, context):
     user = query.from_user
     user_name = user.username or user.first_name or "Unknown"
     
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "month", user_name)
-    message = generate_stats_message(filtered_expenses, "поточний місяць", user_name)
-    
     keyboard = [
         [InlineKeyboardButton("← Назад", callback_data="menu_my_stats")],
         [InlineKeyboardButton("✖️ Закрити", callback_data="close_menu")]
     ]
     back_button = InlineKeyboardMarkup(keyboard)
-    await safe_send_callback_message(query, message, reply_markup=back_button)
+    await send_stats_callback(
+        query,
+        lambda store: generate_stats_message(summarize_period(store, "month", user_name), "поточний місяць", user_name),
+        back_button
+    )
 
 async def my_stats_prev_month_callback(query, context):
     """Особиста статистика за попередній місяць через callback"""
     user = query.from_user
     user_name = user.username or user.first_name or "Unknown"
     
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "prev_month", user_name)
-    message = generate_stats_message(filtered_expenses, "попередній місяць", user_name)
-    
     keyboard = [
         [InlineKeyboardButton("← Назад", callback_data="menu_my_stats")],
         [InlineKeyboardButton("✖️ Закрити", callback_data="close_menu")]
     ]
     back_button = InlineKeyboardMarkup(keyboard)
-    await safe_send_callback_message(query, message, reply_markup=back_button)
+    await send_stats_callback(
+        query,
+        lambda store: generate_stats_message(summarize_period(store, "prev_month", user_name), "попередній місяць", user_name),
+        back_button
+    )
 
 async def show_recent_expenses_callback(query, context):
     """Показує останні записи через callback"""
@@ -695,44 +1065,11 @@ async def show_recent_expenses_callback(query, context):
     user_name = user.username or user.first_name or "Unknown"
     
     try:
-        result = sheet.values().get(
-            spreadsheetId=SPREADSHEET_ID,
-            range=RANGE_NAME
-        ).execute()
-        
-        values = result.get('values', [])
-        if not values:
+        store = await expense_cache.get_store()
+        if not len(store):
             message = "❌ Немає записів."
         else:
-            user_expenses = []
-            for i, row in enumerate(values[1:], 2):
-                if len(row) >= 4 and row[3] == user_name:
-                    try:
-                        date_obj = datetime.datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S")
-                        user_expenses.append({
-                            'row': i,
-                            'date': date_obj,
-                            'category': row[1],
-                            'amount': float(row[2]),
-                            'comment': row[4] if len(row) > 4 else "",
-                            'is_ignored': len(row) > 4 and '[IGNORED]' in row[4]
-                        })
-                    except (ValueError, IndexError):
-                        continue
-            
-            if not user_expenses:
-                message = "❌ У вас немає записів."
-            else:
-                user_expenses.sort(key=lambda x: x['date'], reverse=True)
-                recent_expenses = user_expenses[:5]
-                
-                message = "📝 Ваші останні записи:\n\n"
-                for i, exp in enumerate(recent_expenses, 1):
-                    ignored_mark = "🔕 " if exp['is_ignored'] else ""
-                    message += f"{i}. {ignored_mark}{exp['category']}: {exp['amount']:.2f} грн"
-                    if exp['comment'] and not exp['is_ignored']:
-                        message += f" ({exp['comment']})"
-                    message += f"\n   📅 {exp['date'].strftime('%d.%m %H:%M')}\n\n"
+            message = build_recent_message(store, user_name) or "❌ У вас немає записів."
         
         keyboard = [
             [InlineKeyboardButton("← Назад", callback_data="menu_my_stats")],
@@ -752,447 +1089,121 @@ async def show_recent_expenses_callback(query, context):
 
 async def family_budget_callback(query, context):
     """Сімейний бюджет через callback"""
-    expenses = get_all_expenses()
-    
-    week_expenses = filter_expenses_by_period(expenses, "week")
-    week_total = sum(exp['amount'] for exp in week_expenses)
-    
-    month_expenses = filter_expenses_by_period(expenses, "month")
-    month_total = sum(exp['amount'] for exp in month_expenses)
-    
-    if not month_expenses:
-        message = "Немає витрат за поточний місяць."
-    else:
-        users_month = {}
-        for exp in month_expenses:
-            user = exp['user']
-            users_month[user] = users_month.get(user, 0) + exp['amount']
-        
-        categories_month = {}
-        for exp in month_expenses:
-            category = exp['category']
-            categories_month[category] = categories_month.get(category, 0) + exp['amount']
-        
-        message = "💼 Сімейний бюджет:\n\n"
-        message += f"📅 За тиждень: {week_total:.2f} грн\n"
-        message += f"📅 За місяць: {month_total:.2f} грн\n"
-        
-        if week_total > 0:
-            projected_month = (week_total / 7) * 30
-            message += f"📈 Прогноз на місяць: {projected_month:.2f} грн\n"
-        
-        message += "\n👥 Розподіл по сім'ї:\n"
-        for user, amount in sorted(users_month.items(), key=lambda x: x[1], reverse=True):
-            percentage = (amount / month_total) * 100
-            message += f"• {user}: {amount:.2f} грн ({percentage:.1f}%)\n"
-        
-        message += "\n📂 Основні категорії:\n"
-        for category, amount in sorted(categories_month.items(), key=lambda x: x[1], reverse=True)[:5]:
-            percentage = (amount / month_total) * 100
-            message += f"• {category}: {amount:.2f} грн ({percentage:.1f}%)\n"
-    
     back_button = InlineKeyboardMarkup([
         [InlineKeyboardButton("← Назад", callback_data="menu_family_stats")],
         [InlineKeyboardButton("✖️ Закрити", callback_data="close_menu")]
     ])
-    await safe_send_callback_message(query, message, reply_markup=back_button)
+    await send_stats_callback(query, build_family_budget_message, back_button)
 
 async def family_budget_prev_month_callback(query, context):
     """Сімейний бюджет за попередній місяць через callback"""
-    expenses = get_all_expenses()
-    
-    prev_month_expenses = filter_expenses_by_period(expenses, "prev_month")
-    prev_month_total = sum(exp['amount'] for exp in prev_month_expenses)
-    
-    if not prev_month_expenses:
-        message = "Немає витрат за попередній місяць."
-    else:
-        users_prev_month = {}
-        for exp in prev_month_expenses:
-            user = exp['user']
-            users_prev_month[user] = users_prev_month.get(user, 0) + exp['amount']
-        
-        categories_prev_month = {}
-        for exp in prev_month_expenses:
-            category = exp['category']
-            categories_prev_month[category] = categories_prev_month.get(category, 0) + exp['amount']
-        
-        message = f"💼 Сімейний бюджет за попередній місяць:\n\n"
-        message += f"💰 Загальна сума: {prev_month_total:.2f} грн\n"
-        message += f"📝 Кількість записів: {len(prev_month_expenses)}\n\n"
-        
-        # По користувачах
-        message += "👥 По користувачах:\n"
-        for user, amount in sorted(users_prev_month.items(), key=lambda x: x[1], reverse=True):
-            percentage = (amount / prev_month_total) * 100
-            message += f"• {user}: {amount:.2f} грн ({percentage:.1f}%)\n"
-        
-        # Топ категорії
-        message += "\n🏆 Топ категорії:\n"
-        top_categories = sorted(categories_prev_month.items(), key=lambda x: x[1], reverse=True)[:5]
-        for category, amount in top_categories:
-            percentage = (amount / prev_month_total) * 100
-            message += f"• {category}: {amount:.2f} грн ({percentage:.1f}%)\n"
-    
     back_button = InlineKeyboardMarkup([
         [InlineKeyboardButton("← Назад", callback_data="menu_family_stats")],
         [InlineKeyboardButton("✖️ Закрити", callback_data="close_menu")]
     ])
-    await safe_send_callback_message(query, message, reply_markup=back_button)
+    await send_stats_callback(query, build_family_budget_prev_month_message, back_button)
 
 async def compare_users_callback(query, context):
     """Порівняння користувачів через callback"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "month")
-    
-    if not filtered_expenses:
-        message = "Немає витрат за поточний місяць."
-    else:
-        users_stats = {}
-        total_amount = 0
-        
-        for exp in filtered_expenses:
-            user = exp['user']
-            if user not in users_stats:
-                users_stats[user] = {'total': 0, 'count': 0, 'categories': {}}
-            
-            users_stats[user]['total'] += exp['amount']
-            users_stats[user]['count'] += 1
-            total_amount += exp['amount']
-            
-            category = exp['category']
-            if category not in users_stats[user]['categories']:
-                users_stats[user]['categories'][category] = 0
-            users_stats[user]['categories'][category] += exp['amount']
-        
-        message = "👫 Порівняння витрат за місяць:\n\n"
-        message += f"💰 Загальний бюджет сім'ї: {total_amount:.2f} грн\n\n"
-        
-        sorted_users = sorted(users_stats.items(), key=lambda x: x[1]['total'], reverse=True)
-        
-        for i, (user, stats) in enumerate(sorted_users, 1):
-            percentage = (stats['total'] / total_amount) * 100
-            avg_expense = stats['total'] / stats['count']
-            
-            message += f"{i}. 👤 {user}:\n"
-            message += f"   💰 {stats['total']:.2f} грн ({percentage:.1f}%)\n"
-            message += f"   📝 {stats['count']} записів\n"
-            message += f"   📊 Середня витрата: {avg_expense:.2f} грн\n"
-            
-            top_categories = sorted(stats['categories'].items(), key=lambda x: x[1], reverse=True)[:3]
-            message += "   🏆 Топ категорії: "
-            message += ", ".join([f"{cat} ({amt:.0f}₴)" for cat, amt in top_categories])
-            message += "\n\n"
-    
     back_button = InlineKeyboardMarkup([
         [InlineKeyboardButton("← Назад", callback_data="menu_family_stats")],
         [InlineKeyboardButton("✖️ Закрити", callback_data="close_menu")]
     ])
-    await safe_send_callback_message(query, message, reply_markup=back_button)
+    await send_stats_callback(query, build_compare_message, back_button)
 
 async def compare_users_prev_month_callback(query, context):
     """Порівняння користувачів за попередній місяць через callback"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "prev_month")
-    
-    if not filtered_expenses:
-        message = "Немає витрат за попередній місяць для порівняння."
-    else:
-        users = {}
-        for exp in filtered_expenses:
-            user = exp['user']
-            users[user] = users.get(user, 0) + exp['amount']
-        
-        total = sum(users.values())
-        
-        message = "👫 Порівняння витрат за попередній місяць:\n\n"
-        
-        for user, amount in sorted(users.items(), key=lambda x: x[1], reverse=True):
-            percentage = (amount / total) * 100
-            message += f"👤 {user}:\n"
-            message += f"   💰 Сума: {amount:.2f} грн ({percentage:.1f}%)\n"
-            
-            # Детальна статистика по кожному користувачу
-            user_expenses = [exp for exp in filtered_expenses if exp['user'] == user]
-            user_categories = {}
-            for exp in user_expenses:
-                category = exp['category']
-                user_categories[category] = user_categories.get(category, 0) + exp['amount']
-            
-            top_categories = sorted(user_categories.items(), key=lambda x: x[1], reverse=True)[:3]
-            message += "   🏆 Топ категорії: "
-            message += ", ".join([f"{cat} ({amt:.0f}₴)" for cat, amt in top_categories])
-            message += "\n\n"
-    
     back_button = InlineKeyboardMarkup([
         [InlineKeyboardButton("← Назад", callback_data="menu_family_stats")],
         [InlineKeyboardButton("✖️ Закрити", callback_data="close_menu")]
     ])
-    await safe_send_callback_message(query, message, reply_markup=back_button)
+    await send_stats_callback(query, build_compare_prev_month_message, back_button)
 
     # === РЕШТА CALLBACK ФУНКЦІЙ ===
 
 async def who_spent_more_callback(query, context):
     """Хто більше витратив через callback"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "month")
-    
-    if not filtered_expenses:
-        message = "Немає витрат за поточний місяць."
-    else:
-        users = {}
-        for exp in filtered_expenses:
-            user = exp['user']
-            users[user] = users.get(user, 0) + exp['amount']
-        
-        if len(users) < 2:
-            message = "Потрібно мінімум 2 користувачі для порівняння."
-        else:
-            sorted_users = sorted(users.items(), key=lambda x: x[1], reverse=True)
-            total = sum(users.values())
-            
-            message = f"🏆 Рейтинг витрат цього місяця:\n\n"
-            
-            for i, (user, amount) in enumerate(sorted_users, 1):
-                percentage = (amount / total) * 100
-                emoji = "🥇" if i == 1 else "🥈" if i == 2 else "🥉"
-                message += f"{emoji} {user}: {amount:.2f} грн ({percentage:.1f}%)\n"
-            
-            if len(sorted_users) >= 2:
-                difference = sorted_users[0][1] - sorted_users[1][1]
-                message += f"\n💸 Різниця: {difference:.2f} грн"
-                
-                if difference > 0:
-                    message += f"\n💡 {sorted_users[0][0]} витратив більше на {difference:.2f} грн"
-    
     back_button = InlineKeyboardMarkup([
         [InlineKeyboardButton("← Назад", callback_data="menu_family_stats")],
         [InlineKeyboardButton("✖️ Закрити", callback_data="close_menu")]
     ])
-    await safe_send_callback_message(query, message, reply_markup=back_button)
+    await send_stats_callback(query, build_who_spent_more_message, back_button)
 
 async def who_spent_more_prev_month_callback(query, context):
     """Хто більше витратив за попередній місяць через callback"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "prev_month")
-    
-    if not filtered_expenses:
-        message = "Немає витрат за попередній місяць для рейтингу."
-    else:
-        users = {}
-        for exp in filtered_expenses:
-            user = exp['user']
-            users[user] = users.get(user, 0) + exp['amount']
-        
-        total = sum(users.values())
-        
-        message = "🏆 Рейтинг витрат за попередній місяць:\n\n"
-        
-        for position, (user, amount) in enumerate(sorted(users.items(), key=lambda x: x[1], reverse=True), 1):
-            percentage = (amount / total) * 100
-            
-            if position == 1:
-                emoji = "🥇"
-            elif position == 2:
-                emoji = "🥈"
-            elif position == 3:
-                emoji = "🥉"
-            else:
-                emoji = f"{position}."
-                
-            message += f"{emoji} {user}: {amount:.2f} грн ({percentage:.1f}%)\n"
-        
-        message += f"\n💰 Загальна сума: {total:.2f} грн"
-        message += f"\n📝 Всього записів: {len(filtered_expenses)}"
-    
     back_button = InlineKeyboardMarkup([
         [InlineKeyboardButton("← Назад", callback_data="menu_family_stats")],
         [InlineKeyboardButton("✖️ Закрити", callback_data="close_menu")]
     ])
-    await safe_send_callback_message(query, message, reply_markup=back_button)
+    await send_stats_callback(query, build_who_spent_more_prev_month_message, back_button)
 
 async def stats_today_callback(query, context):
     """Статистика за сьогодні через callback"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "day")
-    message = generate_stats_message(filtered_expenses, "сьогодні")
-    
     back_button = InlineKeyboardMarkup([
         [InlineKeyboardButton("← Назад", callback_data="menu_periods")],
         [InlineKeyboardButton("✖️ Закрити", callback_data="close_menu")]
     ])
-    await safe_send_callback_message(query, message, reply_markup=back_button)
+    await send_stats_callback(
+        query,
+        lambda store: generate_stats_message(summarize_period(store, "day"), "сьогодні"),
+        back_button
+    )
 
 async def stats_week_callback(query, context):
     """Статистика за тиждень через callback"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "week")
-    message = generate_stats_message(filtered_expenses, "поточний тиждень")
-    
     back_button = InlineKeyboardMarkup([
         [InlineKeyboardButton("← Назад", callback_data="menu_periods")],
         [InlineKeyboardButton("✖️ Закрити", callback_data="close_menu")]
     ])
-    await safe_send_callback_message(query, message, reply_markup=back_button)
+    await send_stats_callback(
+        query,
+        lambda store: generate_stats_message(summarize_period(store, "week"), "поточний тиждень"),
+        back_button
+    )
 
 async def stats_month_callback(query, context):
     """Статистика за місяць через callback"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "month")
-    message = generate_stats_message(filtered_expenses, "поточний місяць")
-    
     back_button = InlineKeyboardMarkup([
         [InlineKeyboardButton("← Назад", callback_data="menu_periods")],
         [InlineKeyboardButton("✖️ Закрити", callback_data="close_menu")]
     ])
-    await safe_send_callback_message(query, message, reply_markup=back_button)
+    await send_stats_callback(
+        query,
+        lambda store: generate_stats_message(summarize_period(store, "month"), "поточний місяць"),
+        back_button
+    )
 
 async def stats_prev_month_callback(query, context):
     """Статистика за попередній місяць через callback"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "prev_month")
-    message = generate_stats_message(filtered_expenses, "попередній місяць")
-    
     back_button = InlineKeyboardMarkup([
         [InlineKeyboardButton("← Назад", callback_data="menu_periods")],
         [InlineKeyboardButton("✖️ Закрити", callback_data="close_menu")]
     ])
-    await safe_send_callback_message(query, message, reply_markup=back_button)
+    await send_stats_callback(
+        query,
+        lambda store: generate_stats_message(summarize_period(store, "prev_month"), "попередній місяць"),
+        back_button
+    )
 
 async def top_categories_callback(query, context):
     """Топ категорій через callback"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "month")
-    
-    if not filtered_expenses:
-        message = "Немає витрат за поточний місяць."
-    else:
-        categories = {}
-        for exp in filtered_expenses:
-            category = exp['category']
-            categories[category] = categories.get(category, 0) + exp['amount']
-        
-        total = sum(categories.values())
-        
-        message = "🏆 Топ категорій за місяць:\n\n"
-        for i, (category, amount) in enumerate(sorted(categories.items(), key=lambda x: x[1], reverse=True), 1):
-            percentage = (amount / total) * 100
-            emoji = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
-            message += f"{emoji} {category}: {amount:.2f} грн ({percentage:.1f}%)\n"
-    
     back_button = InlineKeyboardMarkup([
         [InlineKeyboardButton("← Назад", callback_data="menu_periods")],
         [InlineKeyboardButton("✖️ Закрити", callback_data="close_menu")]
     ])
-    await safe_send_callback_message(query, message, reply_markup=back_button)
+    await send_stats_callback(query, build_top_categories_message, back_button)
 
 async def budget_status_callback(query, context):
     """Статус бюджету через callback"""
-    global family_budget_amount
-    
-    if family_budget_amount == 0:
-        message = ("❌ Бюджет не встановлено.\n"
-                  "Використайте /budget СУМА для встановлення бюджету.")
-    else:
-        expenses = get_all_expenses()
-        month_expenses = filter_expenses_by_period(expenses, "month")
-        spent = sum(exp['amount'] for exp in month_expenses)
-        
-        remaining = family_budget_amount - spent
-        percentage = (spent / family_budget_amount) * 100
-        
-        message = f"💰 Статус сімейного бюджету:\n\n"
-        message += f"📊 Бюджет на місяць: {family_budget_amount:.2f} грн\n"
-        message += f"💸 Витрачено: {spent:.2f} грн ({percentage:.1f}%)\n"
-        
-        if remaining > 0:
-            message += f"✅ Залишилось: {remaining:.2f} грн\n"
-            
-            import calendar
-            now = datetime.datetime.now()
-            days_in_month = calendar.monthrange(now.year, now.month)[1]
-            days_passed = now.day
-            days_remaining = days_in_month - days_passed
-            
-            if days_remaining > 0:
-                daily_budget = remaining / days_remaining
-                message += f"📅 Можна витрачати {daily_budget:.2f} грн на день\n"
-        else:
-            message += f"⚠️ Перевищення бюджету: {abs(remaining):.2f} грн\n"
-        
-        progress_length = 10
-        filled_length = int(progress_length * percentage / 100)
-        bar = "█" * filled_length + "░" * (progress_length - filled_length)
-        message += f"\n📊 Прогрес: {bar} {percentage:.1f}%"
-    
     back_button = InlineKeyboardMarkup([
         [InlineKeyboardButton("← Назад", callback_data="menu_budget")],
         [InlineKeyboardButton("✖️ Закрити", callback_data="close_menu")]
     ])
-    await safe_send_callback_message(query, message, reply_markup=back_button)
+    await send_stats_callback(query, build_budget_status_message, back_button)
 
 async def undo_last_action_callback(query, context):
     """Скасування останньої дії через callback"""
-    user = query.from_user
-    
-    if user.id not in user_last_actions:
-        message = "❌ Немає дій для скасування."
-    else:
-        last_action = user_last_actions[user.id]
-        
-        if datetime.datetime.now() - last_action['timestamp'] > timedelta(minutes=10):
-            message = "❌ Час для скасування минув (максимум 10 хвилин)."
-        else:
-            try:
-                result = sheet.values().get(
-                    spreadsheetId=SPREADSHEET_ID,
-                    range=RANGE_NAME
-                ).execute()
-                
-                values = result.get('values', [])
-                if not values:
-                    message = "❌ Таблиця порожня."
-                else:
-                    user_name = user.username or user.first_name or "Unknown"
-                    row_to_delete = None
-                    
-                    for i, row in enumerate(values):
-                        if len(row) >= 4:
-                            if (row[0] == last_action['date'] and 
-                                row[1] == last_action['category'] and 
-                                float(row[2]) == last_action['amount'] and
-                                row[3] == user_name):
-                                row_to_delete = i + 1
-                                break
-                    
-                    if row_to_delete is None:
-                        message = "❌ Запис не знайдено для скасування."
-                    else:
-                        requests = [{
-                            'deleteDimension': {
-                                'range': {
-                                    'sheetId': 0,
-                                    'dimension': 'ROWS',
-                                    'startIndex': row_to_delete - 1,
-                                    'endIndex': row_to_delete
-                                }
-                            }
-                        }]
-                        
-                        sheet.batchUpdate(
-                            spreadsheetId=SPREADSHEET_ID,
-                            body={'requests': requests}
-                        ).execute()
-                        
-                        del user_last_actions[user.id]
-                        
-                        message = (f"✅ Запис скасовано:\n"
-                                 f"📂 Категорія: {last_action['category']}\n"
-                                 f"💰 Сума: {last_action['amount']:.2f} грн")
-                        
-            except Exception as e:
-                logger.error(f"Помилка скасування: {e}")
-                message = "❌ Помилка при скасуванні запису."
+    message = await undo_user_action(query.from_user)
     
     back_button = InlineKeyboardMarkup([
         [InlineKeyboardButton("← Назад", callback_data="menu_management")],
@@ -1202,62 +1213,7 @@ async def undo_last_action_callback(query, context):
 
 async def mark_as_ignored_callback(query, context):
     """Позначення як ігнорований через callback"""
-    user = query.from_user
-    
-    if user.id not in user_last_actions:
-        message = "❌ Немає дій для позначення."
-    else:
-        last_action = user_last_actions[user.id]
-        
-        if datetime.datetime.now() - last_action['timestamp'] > timedelta(minutes=10):
-            message = "❌ Час для позначення минув (максимум 10 хвилин)."
-        else:
-            try:
-                result = sheet.values().get(
-                    spreadsheetId=SPREADSHEET_ID,
-                    range=RANGE_NAME
-                ).execute()
-                
-                values = result.get('values', [])
-                if not values:
-                    message = "❌ Таблиця порожня."
-                else:
-                    user_name = user.username or user.first_name or "Unknown"
-                    row_to_update = None
-                    
-                    for i, row in enumerate(values):
-                        if len(row) >= 4:
-                            if (row[0] == last_action['date'] and 
-                                row[1] == last_action['category'] and 
-                                float(row[2]) == last_action['amount'] and
-                                row[3] == user_name):
-                                row_to_update = i + 1
-                                break
-                    
-                    if row_to_update is None:
-                        message = "❌ Запис не знайдено для позначення."
-                    else:
-                        current_comment = last_action.get('comment', '')
-                        new_comment = f"[IGNORED] {current_comment}".strip()
-                        
-                        range_to_update = f"'Аркуш1'!E{row_to_update}"
-                        sheet.values().update(
-                            spreadsheetId=SPREADSHEET_ID,
-                            range=range_to_update,
-                            valueInputOption='USER_ENTERED',
-                            body={'values': [[new_comment]]}
-                        ).execute()
-                        
-                        del user_last_actions[user.id]
-                        
-                        message = (f"🔕 Запис позначено як ігнорований:\n"
-                                 f"📂 Категорія: {last_action['category']}\n"
-                                 f"💰 Сума: {last_action['amount']:.2f} грн\n"
-                                 f"💡 Він не буде враховуватись у статистиці")
-                        
-            except Exception as e:
-                logger.error(f"Помилка позначення: {e}")
-                message = "❌ Помилка при позначенні запису."
+    message = await ignore_user_action(query.from_user)
     
     back_button = InlineKeyboardMarkup([
         [InlineKeyboardButton("← Назад", callback_data="menu_management")],
@@ -1267,17 +1223,24 @@ async def mark_as_ignored_callback(query, context):
 
 async def show_help(query):
     """Показує повну довідку"""
-    ffmpeg_status = "✅ Доступно" if FFMPEG_PATH else "❌ Не встановлено"
+    if FFMPEG_PATH:
+        ffmpeg_status = "✅ Доступно"
+    elif speech_recognizer.accepts_opus:
+        ffmpeg_status = "✅ Доступно (лише OGG/Opus)"
+    else:
+        ffmpeg_status = "❌ Не встановлено FFmpeg"
     
     help_message = (
         "🤖 Привіт! Я допоможу вести сімейний бюджет.\n\n"
         "📝 Для запису надішли повідомлення у форматі:\n"
         "Категорія Сума Коментар\n"
-        "Приклад: Їжа 250 Обід у ресторані\n\n"
+        "Приклад: Їжа 250 Обід у ресторані\n"
+        "Кілька витрат - кожна з нового рядка в одному повідомленні\n\n"
         f"🎤 Голосові повідомлення: {ffmpeg_status}\n\n"
         "📊 Особиста статистика:\n"
         "/mystats - твоя статистика за місяць\n"
-        "/recent - твої останні 5 записів\n\n"
+        "/recent - твої останні 5 записів\n"
+        "/pending - записи, що ще не потрапили в таблицю\n\n"
         "👫 Сімейна статистика:\n"
         "/family - загальний сімейний бюджет\n"
         "/compare - порівняння витрат між вами\n"
@@ -1331,97 +1294,17 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await show_main_menu(update, context)
         return
     
+    # Кілька витрат у рядках - пакетний запис (наприклад, переслані чеки за день)
+    lines = bulk_expense_lines(text)
+    if lines:
+        await process_and_save_bulk(lines, user, update, context)
+        return
+    
     # Інакше обробляємо як запис витрати
     await process_and_save(text, user, update, context)
 
 # === ФУНКЦІЇ ОБРОБКИ ТЕКСТІВ ТА ЗБЕРЕЖЕННЯ ===
 
-
-def normalize_category(category):
-    """Нормалізує категорію до стандартного формату"""
-    if not category:
-        return category
-    
-    # Очищуємо зайві пробіли
-    category = category.strip()
-    
-    # Конвертуємо до Title Case (Перша Літера Кожного Слова Велика)
-    # Це зробить: "продукти" → "Продукти", "ПРОДУКТИ" → "Продукти"
-    normalized = category.title()
-    
-    # Виправляємо деякі особливості української мови
-    # Замінюємо типові помилки Title Case для українських слів
-    corrections = {
-        "На": "на",      # "Обіди На Роботі" → "Обіди на Роботі"
-        "До": "до",      # "Дорога До Дому" → "Дорога до Дому"  
-        "В": "в",        # "Їжа В Кафе" → "Їжа в Кафе"
-        "З": "з",        # "Подарунки З Магазину" → "Подарунки з Магазину"
-        "І": "і",        # "Хліб І Молоко" → "Хліб і Молоко"
-        "Та": "та",      # "Фрукти Та Овочі" → "Фрукти та Овочі"
-        "Для": "для",    # "Подарунки Для Дітей" → "Подарунки для Дітей"
-        "По": "по",      # "Витрати По Дому" → "Витрати по Дому"
-    }
-    
-    # Застосовуємо виправлення
-    for wrong, correct in corrections.items():
-        normalized = normalized.replace(f" {wrong} ", f" {correct} ")
-    
-    return normalized
-
-def parse_expense_text(text):
-    """Розбирає текст витрати з підтримкою багатослівних категорій (до 3 слів)"""
-    text = text.strip()
-    
-    # Шукаємо перше число в тексті (це буде сума)
-    amount_pattern = r'\b(\d+(?:[.,]\d+)?)\b'
-    amount_match = re.search(amount_pattern, text)
-    
-    if not amount_match:
-        return None, None, None
-    
-    # Позиція де знайшли суму
-    amount_start = amount_match.start()
-    amount_str = amount_match.group(1).replace(',', '.')
-    
-    try:
-        amount = float(amount_str)
-    except ValueError:
-        return None, None, None
-    
-    # Все до суми - це потенційна категорія
-    category_text = text[:amount_start].strip()
-    
-    # Все після суми - це коментар
-    comment_start = amount_match.end()
-    comment = text[comment_start:].strip()
-    
-    # Обробляємо категорію - не більше 3 слів
-    if not category_text:
-        return None, None, None
-    
-    category_words = category_text.split()
-    
-    # Обмежуємо до 3 слів максимум
-    if len(category_words) > 3:
-        category = ' '.join(category_words[:3])
-        # Решту слів додаємо до коментаря
-        remaining_words = ' '.join(category_words[3:])
-        if comment:
-            comment = remaining_words + ' ' + comment
-        else:
-            comment = remaining_words
-    else:
-        category = category_text
-    
-    # НОРМАЛІЗУЄМО КАТЕГОРІЮ
-    category = normalize_category(category)
-    
-    # Валідація суми
-    if amount <= 0:
-        return None, None, None
-    
-    return category, amount, comment
-
 async def process_and_save(text, user, update, context):
     """Обробляє та зберігає витрату"""
     category, amount, comment = parse_expense_text(text)
@@ -1445,19 +1328,13 @@ async def process_and_save(text, user, update, context):
     
     user_name = user.username or user.first_name or "Unknown"
 
-    values = [[date_str, category, amount, user_name, comment]]
+    values = [date_str, category, amount, user_name, comment]
 
     try:
-        logger.info(f"Спроба запису до таблиці {SPREADSHEET_ID}")
-        
-        result = sheet.values().append(
-            spreadsheetId=SPREADSHEET_ID,
-            range=RANGE_NAME,
-            valueInputOption='USER_ENTERED',
-            body={'values': values}
-        ).execute()
-        
-        logger.info(f"Запис успішний: {result}")
+        # Запис зберігається в локальному журналі, а в таблицю потрапляє пакетом у фоні
+        record_id = expense_cache.add(*values)
+        replicator.notify()
+        logger.info(f"Запис {record_id} збережено, очікує реплікації в таблицю {SPREADSHEET_ID}")
         
         # Зберігаємо інформацію про останню дію користувача (також з київським часом)
         kyiv_timestamp = utc_now + timedelta(hours=3)
@@ -1467,7 +1344,7 @@ async def process_and_save(text, user, update, context):
             'category': category,
             'amount': amount,
             'comment': comment,
-            'row_range': result.get('updates', {}).get('updatedRange', ''),
+            'record_id': record_id,
             'timestamp': kyiv_timestamp  # Київський час для timestamp теж
         })
         
@@ -1481,222 +1358,238 @@ async def process_and_save(text, user, update, context):
         if comment:
             success_message += f"\n💬 Коментар: {comment}"
         
+        if sheets_breaker.is_open:
+            success_message += "\n⏳ Google Sheets зараз недоступна: запис збережено й потрапить у таблицю після відновлення (/pending)"
+        else:
+            success_message += f"\n⏳ Синхронізується з таблицею (/pending)"
         success_message += f"\n\n💡 Якщо помилились, використайте /undo для скасування"
             
         await safe_send_message(update, context, success_message)
         
     except Exception as e:
-        logger.error(f"Детальна помилка при записі до Google Sheets: {e}")
+        logger.error(f"Детальна помилка при записі витрати: {e}")
         logger.error(f"Тип помилки: {type(e).__name__}")
         await safe_send_message(update, context, "❌ Виникла помилка при записі даних. Перевірте доступ до таблиці.")
-        # === ОРИГІНАЛЬНІ КОМАНДИ БОТА (НЕЗМІНЕНІ) ===
-
-async def stats_today(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Статистика за сьогодні"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "day")
-    message = generate_stats_message(filtered_expenses, "сьогодні")
-    await safe_send_message(update, context, message)
-
-async def stats_week(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Статистика за тиждень"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "week")
-    message = generate_stats_message(filtered_expenses, "поточний тиждень")
-    await safe_send_message(update, context, message)
-
-async def stats_month(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Статистика за місяць"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "month")
-    message = generate_stats_message(filtered_expenses, "поточний місяць")
-    await safe_send_message(update, context, message)
 
-async def stats_prev_month(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Статистика за попередній місяць"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "prev_month")
-    message = generate_stats_message(filtered_expenses, "попередній місяць")
-    await safe_send_message(update, context, message)
+# === ПАКЕТНИЙ ЗАПИС ===
 
-async def stats_year(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Статистика за рік"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "year")
-    message = generate_stats_message(filtered_expenses, "поточний рік")
-    await safe_send_message(update, context, message)
-
-async def my_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Особиста статистика користувача за місяць"""
-    user = update.message.from_user
+async def process_and_save_bulk(lines, user, update, context):
+    """Розбирає багаторядкове повідомлення та зберігає всі витрати одним пакетом"""
+    utc_now = datetime.datetime.utcnow()
+    kyiv_time = utc_now + timedelta(hours=3)  # Київський час
+    date_str = kyiv_time.strftime("%Y-%m-%d %H:%M:%S")
     user_name = user.username or user.first_name or "Unknown"
     
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "month", user_name)
-    message = generate_stats_message(filtered_expenses, "поточний місяць", user_name)
-    await safe_send_message(update, context, message)
-
-async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Стара функція статистики - тепер перенаправляє на stats_month"""
-    await stats_month(update, context)
-
-async def top_categories(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Топ категорій за місяць"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "month")
-    
-    if not filtered_expenses:
-        await safe_send_message(update, context, "Немає витрат за поточний місяць.")
+    results = []
+    items = []
+    for line, expense in parse_bulk_lines(lines[:BULK_MAX_LINES]):
+        if expense is None:
+            results.append((line, None))
+            continue
+        category, amount, comment = expense
+        values = [date_str, category, amount, user_name, comment]
+        results.append((line, values))
+        items.append(values)
+    
+    if not items:
+        await safe_send_message(update, context,
+            "❌ Жоден рядок не розпізнано. Кожен рядок у форматі:\n"
+            "Категорія Сума Коментар"
+        )
         return
     
-    categories = {}
-    for exp in filtered_expenses:
-        category = exp['category']
-        categories[category] = categories.get(category, 0) + exp['amount']
-    
-    total = sum(categories.values())
+    try:
+        # Одна транзакція в журналі, а в таблицю - один запит append
+        record_ids = expense_cache.add_many(items)
+        replicator.notify()
+        logger.info(f"Пакет із {len(record_ids)} записів збережено, очікує реплікації в таблицю {SPREADSHEET_ID}")
+    except Exception as e:
+        logger.error(f"Помилка пакетного запису: {e}")
+        await safe_send_message(update, context, "❌ Виникла помилка при записі даних. Перевірте доступ до таблиці.")
+        return
     
-    message = "🏆 Топ категорій за місяць:\n\n"
-    for i, (category, amount) in enumerate(sorted(categories.items(), key=lambda x: x[1], reverse=True), 1):
-        percentage = (amount / total) * 100
-        emoji = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
-        message += f"{emoji} {category}: {amount:.2f} грн ({percentage:.1f}%)\n"
+    total = sum(values[2] for values in items)
+    add_user_action(user.id, {
+        'action': 'bulk_add',
+        'date': date_str,
+        'record_ids': record_ids,
+        'count': len(record_ids),
+        'amount': total,
+        'timestamp': kyiv_time
+    })
+    
+    message = f"📋 Пакетний запис: додано {len(items)} з {len(results)}\n\n"
+    for i, (line, values) in enumerate(results, 1):
+        if values is None:
+            message += f"{i}. ❌ {line} - невірний формат\n"
+            continue
+        message += f"{i}. ✅ {values[1]}: {values[2]:.2f} грн"
+        if values[4]:
+            message += f" ({values[4]})"
+        message += "\n"
+    if len(lines) > BULK_MAX_LINES:
+        message += f"\n⚠️ Оброблено лише перші {BULK_MAX_LINES} рядків\n"
+    
+    message += f"\n💰 Разом: {total:.2f} грн\n"
+    message += "⏳ Синхронізується з таблицею (/pending)\n\n"
+    message += "💡 /undo скасує весь пакет"
     
     await safe_send_message(update, context, message)
 
-async def undo_last_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Скасовує останню дію користувача"""
-    user = update.message.from_user
+# === СКАСУВАННЯ ТА ІГНОРУВАННЯ ЗАПИСІВ ===
+
+async def locate_action_records(last_action, user_name):
+    """Знаходить записи останньої дії в локальному сховищі"""
+    await expense_cache.get_store()
+    
+    if 'record_ids' in last_action:
+        return [record_id for record_id in last_action['record_ids']
+                if expense_cache.has_record(record_id)]
     
+    record_id = last_action.get('record_id')
+    if record_id is not None and expense_cache.has_record(record_id):
+        return [record_id]
+    
+    # Номер рядка не був відомий при записі - шукаємо за вмістом
+    record_id = expense_cache.find_record(
+        last_action['date'], last_action['category'], last_action['amount'], user_name
+    )
+    return [] if record_id is None else [record_id]
+
+def describe_action(last_action):
+    """Короткий опис записів останньої дії для відповіді"""
+    if 'record_ids' in last_action:
+        return (f"📋 Пакет із {last_action['count']} записів\n"
+                f"💰 Сума: {last_action['amount']:.2f} грн")
+    return (f"📂 Категорія: {last_action['category']}\n"
+            f"💰 Сума: {last_action['amount']:.2f} грн")
+
+async def undo_user_action(user):
+    """Видаляє останній запис користувача (з таблиці його прибере реплікатор)"""
     if user.id not in user_last_actions:
-        await safe_send_message(update, context, "❌ Немає дій для скасування.")
-        return
+        return "❌ Немає дій для скасування."
     
     last_action = user_last_actions[user.id]
     
     if datetime.datetime.now() - last_action['timestamp'] > timedelta(minutes=10):
-        await safe_send_message(update, context, "❌ Час для скасування минув (максимум 10 хвилин).")
-        return
+        return "❌ Час для скасування минув (максимум 10 хвилин)."
     
     try:
-        result = sheet.values().get(
-            spreadsheetId=SPREADSHEET_ID,
-            range=RANGE_NAME
-        ).execute()
-        
-        values = result.get('values', [])
-        if not values:
-            await safe_send_message(update, context, "❌ Таблиця порожня.")
-            return
-        
         user_name = user.username or user.first_name or "Unknown"
-        row_to_delete = None
-        
-        for i, row in enumerate(values):
-            if len(row) >= 4:
-                if (row[0] == last_action['date'] and 
-                    row[1] == last_action['category'] and 
-                    float(row[2]) == last_action['amount'] and
-                    row[3] == user_name):
-                    row_to_delete = i + 1
-                    break
-        
-        if row_to_delete is None:
-            await safe_send_message(update, context, "❌ Запис не знайдено для скасування.")
-            return
+        record_ids = await locate_action_records(last_action, user_name)
+        if not record_ids:
+            return "❌ Запис не знайдено для скасування."
         
-        requests = [{
-            'deleteDimension': {
-                'range': {
-                    'sheetId': 0,
-                    'dimension': 'ROWS',
-                    'startIndex': row_to_delete - 1,
-                    'endIndex': row_to_delete
-                }
-            }
-        }]
-        
-        sheet.batchUpdate(
-            spreadsheetId=SPREADSHEET_ID,
-            body={'requests': requests}
-        ).execute()
+        for record_id in record_ids:
+            expense_cache.remove(record_id)
+        replicator.notify()
         
         del user_last_actions[user.id]
         
-        await safe_send_message(update, context,
-            f"✅ Запис скасовано:\n"
-            f"📂 Категорія: {last_action['category']}\n"
-            f"💰 Сума: {last_action['amount']:.2f} грн"
-        )
+        return f"✅ Запис скасовано:\n{describe_action(last_action)}"
         
     except Exception as e:
         logger.error(f"Помилка скасування: {e}")
-        await safe_send_message(update, context, "❌ Помилка при скасуванні запису.")
+        return "❌ Помилка при скасуванні запису."
 
-async def mark_as_ignored(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Позначає останній запис як ігнорований для статистики"""
-    user = update.message.from_user
-    
+async def ignore_user_action(user):
+    """Позначає останній запис користувача як ігнорований (у таблиці - через реплікатор)"""
     if user.id not in user_last_actions:
-        await safe_send_message(update, context, "❌ Немає дій для позначення.")
-        return
+        return "❌ Немає дій для позначення."
     
     last_action = user_last_actions[user.id]
     
     if datetime.datetime.now() - last_action['timestamp'] > timedelta(minutes=10):
-        await safe_send_message(update, context, "❌ Час для позначення минув (максимум 10 хвилин).")
-        return
+        return "❌ Час для позначення минув (максимум 10 хвилин)."
     
     try:
-        result = sheet.values().get(
-            spreadsheetId=SPREADSHEET_ID,
-            range=RANGE_NAME
-        ).execute()
-        
-        values = result.get('values', [])
-        if not values:
-            await safe_send_message(update, context, "❌ Таблиця порожня.")
-            return
-        
         user_name = user.username or user.first_name or "Unknown"
-        row_to_update = None
+        record_ids = await locate_action_records(last_action, user_name)
+        if not record_ids:
+            return "❌ Запис не знайдено для позначення."
         
-        for i, row in enumerate(values):
-            if len(row) >= 4:
-                if (row[0] == last_action['date'] and 
-                    row[1] == last_action['category'] and 
-                    float(row[2]) == last_action['amount'] and
-                    row[3] == user_name):
-                    row_to_update = i + 1
-                    break
-        
-        if row_to_update is None:
-            await safe_send_message(update, context, "❌ Запис не знайдено для позначення.")
-            return
-        
-        current_comment = last_action.get('comment', '')
-        new_comment = f"[IGNORED] {current_comment}".strip()
-        
-        range_to_update = f"'Аркуш1'!E{row_to_update}"
-        sheet.values().update(
-            spreadsheetId=SPREADSHEET_ID,
-            range=range_to_update,
-            valueInputOption='USER_ENTERED',
-            body={'values': [[new_comment]]}
-        ).execute()
+        for record_id in record_ids:
+            current_comment = expense_cache.comment_of(record_id)
+            if current_comment is not None:
+                expense_cache.set_comment(record_id, f"[IGNORED] {current_comment}".strip())
+        replicator.notify()
         
         del user_last_actions[user.id]
         
-        await safe_send_message(update, context,
-            f"🔕 Запис позначено як ігнорований:\n"
-            f"📂 Категорія: {last_action['category']}\n"
-            f"💰 Сума: {last_action['amount']:.2f} грн\n"
-            f"💡 Він не буде враховуватись у статистиці"
-        )
+        return (f"🔕 Запис позначено як ігнорований:\n"
+                f"{describe_action(last_action)}\n"
+                f"💡 Він не буде враховуватись у статистиці")
         
     except Exception as e:
         logger.error(f"Помилка позначення: {e}")
-        await safe_send_message(update, context, "❌ Помилка при позначенні запису.")
+        return "❌ Помилка при позначенні запису."
+
+# === ОРИГІНАЛЬНІ КОМАНДИ БОТА (НЕЗМІНЕНІ) ===
+
+async def stats_today(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Статистика за сьогодні"""
+    store = await get_expense_store()
+    summary = summarize_period(store, "day")
+    message = generate_stats_message(summary, "сьогодні")
+    await safe_send_message(update, context, message)
+
+async def stats_week(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Статистика за тиждень"""
+    store = await get_expense_store()
+    summary = summarize_period(store, "week")
+    message = generate_stats_message(summary, "поточний тиждень")
+    await safe_send_message(update, context, message)
+
+async def stats_month(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Статистика за місяць"""
+    store = await get_expense_store()
+    summary = summarize_period(store, "month")
+    message = generate_stats_message(summary, "поточний місяць")
+    await safe_send_message(update, context, message)
+
+async def stats_prev_month(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Статистика за попередній місяць"""
+    store = await get_expense_store()
+    summary = summarize_period(store, "prev_month")
+    message = generate_stats_message(summary, "попередній місяць")
+    await safe_send_message(update, context, message)
+
+async def stats_year(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Статистика за рік"""
+    store = await get_expense_store()
+    summary = summarize_period(store, "year")
+    message = generate_stats_message(summary, "поточний рік")
+    await safe_send_message(update, context, message)
+
+async def my_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Особиста статистика користувача за місяць"""
+    user = update.message.from_user
+    user_name = user.username or user.first_name or "Unknown"
+    
+    store = await get_expense_store()
+    summary = summarize_period(store, "month", user_name)
+    message = generate_stats_message(summary, "поточний місяць", user_name)
+    await safe_send_message(update, context, message)
+
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Стара функція статистики - тепер перенаправляє на stats_month"""
+    await stats_month(update, context)
+
+async def top_categories(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Топ категорій за місяць"""
+    store = await get_expense_store()
+    message = build_top_categories_message(store)
+    await safe_send_message(update, context, message)
+
+async def undo_last_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Скасовує останню дію користувача"""
+    message = await undo_user_action(update.message.from_user)
+    await safe_send_message(update, context, message)
+
+async def mark_as_ignored(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Позначає останній запис як ігнорований для статистики"""
+    message = await ignore_user_action(update.message.from_user)
+    await safe_send_message(update, context, message)
 
 async def show_recent_expenses(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показує останні 5 записів користувача"""
@@ -1704,47 +1597,16 @@ async def show_recent_expenses(update: Update, context: ContextTypes.DEFAULT_TYP
     user_name = user.username or user.first_name or "Unknown"
     
     try:
-        result = sheet.values().get(
-            spreadsheetId=SPREADSHEET_ID,
-            range=RANGE_NAME
-        ).execute()
-        
-        values = result.get('values', [])
-        if not values:
+        store = await expense_cache.get_store()
+        if not len(store):
             await safe_send_message(update, context, "❌ Немає записів.")
             return
         
-        user_expenses = []
-        for i, row in enumerate(values[1:], 2):
-            if len(row) >= 4 and row[3] == user_name:
-                try:
-                    date_obj = datetime.datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S")
-                    user_expenses.append({
-                        'row': i,
-                        'date': date_obj,
-                        'category': row[1],
-                        'amount': float(row[2]),
-                        'comment': row[4] if len(row) > 4 else "",
-                        'is_ignored': len(row) > 4 and '[IGNORED]' in row[4]
-                    })
-                except (ValueError, IndexError):
-                    continue
-        
-        if not user_expenses:
+        message = build_recent_message(store, user_name)
+        if message is None:
             await safe_send_message(update, context, "❌ У вас немає записів.")
             return
         
-        user_expenses.sort(key=lambda x: x['date'], reverse=True)
-        recent_expenses = user_expenses[:5]
-        
-        message = "📝 Ваші останні записи:\n\n"
-        for i, exp in enumerate(recent_expenses, 1):
-            ignored_mark = "🔕 " if exp['is_ignored'] else ""
-            message += f"{i}. {ignored_mark}{exp['category']}: {exp['amount']:.2f} грн"
-            if exp['comment'] and not exp['is_ignored']:
-                message += f" ({exp['comment']})"
-            message += f"\n   📅 {exp['date'].strftime('%d.%m %H:%M')}\n\n"
-        
         message += "💡 Використайте /undo для скасування останньої дії\n"
         message += "💡 Використайте /ignore для позначення як ігнорований"
         
@@ -1754,95 +1616,37 @@ async def show_recent_expenses(update: Update, context: ContextTypes.DEFAULT_TYP
         logger.error(f"Помилка отримання записів: {e}")
         await safe_send_message(update, context, "❌ Помилка при отриманні записів.")
 
-async def compare_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Порівняння витрат між користувачами за місяць"""
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, "month")
+async def show_pending_expenses(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показує записи користувача, які ще не потрапили в таблицю"""
+    user = update.message.from_user
+    user_name = user.username or user.first_name or "Unknown"
     
-    if not filtered_expenses:
-        await safe_send_message(update, context, "Немає витрат за поточний місяць.")
+    pending = replicator.pending_for(user_name)
+    if not pending:
+        await safe_send_message(update, context, "✅ Усі ваші записи збережено в таблиці.")
         return
     
-    users_stats = {}
-    total_amount = 0
-    
-    for exp in filtered_expenses:
-        user = exp['user']
-        if user not in users_stats:
-            users_stats[user] = {'total': 0, 'count': 0, 'categories': {}}
-        
-        users_stats[user]['total'] += exp['amount']
-        users_stats[user]['count'] += 1
-        total_amount += exp['amount']
-        
-        category = exp['category']
-        if category not in users_stats[user]['categories']:
-            users_stats[user]['categories'][category] = 0
-        users_stats[user]['categories'][category] += exp['amount']
-    
-    message = "👫 Порівняння витрат за місяць:\n\n"
-    message += f"💰 Загальний бюджет сім'ї: {total_amount:.2f} грн\n\n"
-    
-    sorted_users = sorted(users_stats.items(), key=lambda x: x[1]['total'], reverse=True)
-    
-    for i, (user, stats) in enumerate(sorted_users, 1):
-        percentage = (stats['total'] / total_amount) * 100
-        avg_expense = stats['total'] / stats['count']
-        
-        message += f"{i}. 👤 {user}:\n"
-        message += f"   💰 {stats['total']:.2f} грн ({percentage:.1f}%)\n"
-        message += f"   📝 {stats['count']} записів\n"
-        message += f"   📊 Середня витрата: {avg_expense:.2f} грн\n"
-        
-        top_categories = sorted(stats['categories'].items(), key=lambda x: x[1], reverse=True)[:3]
-        message += "   🏆 Топ категорії: "
-        message += ", ".join([f"{cat} ({amt:.0f}₴)" for cat, amt in top_categories])
-        message += "\n\n"
+    message = f"⏳ Очікують синхронізації з таблицею ({len(pending)}):\n\n"
+    for i, (date_str, category, amount, _, comment) in enumerate(pending, 1):
+        message += f"{i}. {category}: {amount:.2f} грн"
+        if comment:
+            message += f" ({comment})"
+        message += f"\n   📅 {date_str}\n"
+    if replicator.last_error:
+        message += "\n⚠️ Таблиця тимчасово недоступна, повторимо спробу автоматично"
     
     await safe_send_message(update, context, message)
 
+async def compare_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Порівняння витрат між користувачами за місяць"""
+    store = await get_expense_store()
+    message = build_compare_message(store)
+    await safe_send_message(update, context, message)
+
 async def family_budget(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Сімейний бюджет з детальною розбивкою"""
-    expenses = get_all_expenses()
-    
-    week_expenses = filter_expenses_by_period(expenses, "week")
-    week_total = sum(exp['amount'] for exp in week_expenses)
-    
-    month_expenses = filter_expenses_by_period(expenses, "month")
-    month_total = sum(exp['amount'] for exp in month_expenses)
-    
-    if not month_expenses:
-        await safe_send_message(update, context, "Немає витрат за поточний місяць.")
-        return
-    
-    users_month = {}
-    for exp in month_expenses:
-        user = exp['user']
-        users_month[user] = users_month.get(user, 0) + exp['amount']
-    
-    categories_month = {}
-    for exp in month_expenses:
-        category = exp['category']
-        categories_month[category] = categories_month.get(category, 0) + exp['amount']
-    
-    message = "💼 Сімейний бюджет:\n\n"
-    message += f"📅 За тиждень: {week_total:.2f} грн\n"
-    message += f"📅 За місяць: {month_total:.2f} грн\n"
-    
-    if week_total > 0:
-        projected_month = (week_total / 7) * 30
-        message += f"📈 Прогноз на місяць: {projected_month:.2f} грн\n"
-    
-    message += "\n👥 Розподіл по сім'ї:\n"
-    for user, amount in sorted(users_month.items(), key=lambda x: x[1], reverse=True):
-        percentage = (amount / month_total) * 100
-        message += f"• {user}: {amount:.2f} грн ({percentage:.1f}%)\n"
-    
-    message += "\n📂 Основні категорії:\n"
-    for category, amount in sorted(categories_month.items(), key=lambda x: x[1], reverse=True)[:5]:
-        percentage = (amount / month_total) * 100
-        message += f"• {category}: {amount:.2f} грн ({percentage:.1f}%)\n"
-    
+    store = await get_expense_store()
+    message = build_family_budget_message(store)
     await safe_send_message(update, context, message)
 
 async def who_spent_more(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1854,43 +1658,8 @@ async def who_spent_more(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if period_arg in ["today", "week", "month", "year"]:
             period = period_arg if period_arg != "today" else "day"
     
-    expenses = get_all_expenses()
-    filtered_expenses = filter_expenses_by_period(expenses, period)
-    
-    if not filtered_expenses:
-        period_names = {"day": "сьогодні", "week": "тиждень", "month": "місяць", "year": "рік"}
-        await safe_send_message(update, context, f"Немає витрат за {period_names.get(period, period)}.")
-        return
-    
-    users = {}
-    for exp in filtered_expenses:
-        user = exp['user']
-        users[user] = users.get(user, 0) + exp['amount']
-    
-    if len(users) < 2:
-        await safe_send_message(update, context, "Потрібно мінімум 2 користувачі для порівняння.")
-        return
-    
-    sorted_users = sorted(users.items(), key=lambda x: x[1], reverse=True)
-    total = sum(users.values())
-    
-    period_names = {"day": "сьогодні", "week": "цього тижня", "month": "цього місяця", "year": "цього року"}
-    period_name = period_names.get(period, period)
-    
-    message = f"🏆 Рейтинг витрат {period_name}:\n\n"
-    
-    for i, (user, amount) in enumerate(sorted_users, 1):
-        percentage = (amount / total) * 100
-        emoji = "🥇" if i == 1 else "🥈" if i == 2 else "🥉"
-        message += f"{emoji} {user}: {amount:.2f} грн ({percentage:.1f}%)\n"
-    
-    if len(sorted_users) >= 2:
-        difference = sorted_users[0][1] - sorted_users[1][1]
-        message += f"\n💸 Різниця: {difference:.2f} грн"
-        
-        if difference > 0:
-            message += f"\n💡 {sorted_users[0][0]} витратив більше на {difference:.2f} грн"
-    
+    store = await get_expense_store()
+    message = build_who_spent_more_message(store, period)
     await safe_send_message(update, context, message)
 
 async def set_family_budget(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1919,46 +1688,8 @@ async def set_family_budget(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def budget_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Статус виконання сімейного бюджету"""
-    global family_budget_amount
-    
-    if family_budget_amount == 0:
-        await safe_send_message(update, context,
-            "❌ Бюджет не встановлено.\n"
-            "Використайте /budget СУМА для встановлення бюджету."
-        )
-        return
-    
-    expenses = get_all_expenses()
-    month_expenses = filter_expenses_by_period(expenses, "month")
-    spent = sum(exp['amount'] for exp in month_expenses)
-    
-    remaining = family_budget_amount - spent
-    percentage = (spent / family_budget_amount) * 100
-    
-    message = f"💰 Статус сімейного бюджету:\n\n"
-    message += f"📊 Бюджет на місяць: {family_budget_amount:.2f} грн\n"
-    message += f"💸 Витрачено: {spent:.2f} грн ({percentage:.1f}%)\n"
-    
-    if remaining > 0:
-        message += f"✅ Залишилось: {remaining:.2f} грн\n"
-        
-        import calendar
-        now = datetime.datetime.now()
-        days_in_month = calendar.monthrange(now.year, now.month)[1]
-        days_passed = now.day
-        days_remaining = days_in_month - days_passed
-        
-        if days_remaining > 0:
-            daily_budget = remaining / days_remaining
-            message += f"📅 Можна витрачати {daily_budget:.2f} грн на день\n"
-    else:
-        message += f"⚠️ Перевищення бюджету: {abs(remaining):.2f} грн\n"
-    
-    progress_length = 10
-    filled_length = int(progress_length * percentage / 100)
-    bar = "█" * filled_length + "░" * (progress_length - filled_length)
-    message += f"\n📊 Прогрес: {bar} {percentage:.1f}%"
-    
+    store = await get_expense_store()
+    message = build_budget_status_message(store)
     await safe_send_message(update, context, message)
 
 # === ОБРОБКА ГОЛОСОВИХ ПОВІДОМЛЕНЬ ===
@@ -1967,77 +1698,181 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
     voice = update.message.voice
     
-    if FFMPEG_PATH is None:
+    # Без FFmpeg розпізнаємо лише OGG/Opus, якщо рушій приймає його напряму
+    if FFMPEG_PATH is None and not accepts_voice_directly(voice):
         await safe_send_message(update, context,
             "❌ Обробка голосових повідомлень недоступна.\n"
             "FFmpeg не встановлено. Використовуйте текстові повідомлення."
         )
         return
     
+    if speech_breaker.is_open:
+        await safe_send_message(update, context, voice_paused_message())
+        return
+    
     if voice.duration > MAX_VOICE_DURATION:
         await safe_send_message(update, context,
             f"❌ Голосове повідомлення занадто довге. Максимальна тривалість: {MAX_VOICE_DURATION} секунд."
         )
         return
     
+    if voice_scheduler.is_full():
+        await safe_send_message(update, context,
+            "⏳ Зараз обробляється забагато голосових повідомлень.\n"
+            "Спробуйте за хвилину або надішліть витрату текстом."
+        )
+        return
+    
+    processing_text = "🎤 Обробляю голосове повідомлення..."
+    queue_position = voice_scheduler.queue_position()
+    
     async def send_processing_message():
-        return await update.message.reply_text("🎤 Обробляю голосове повідомлення...")
+        if queue_position:
+            return await update.message.reply_text(f"{processing_text}\n⏳ Місце в черзі: {queue_position}")
+        return await update.message.reply_text(processing_text)
     
     processing_message = await safe_bot_operation(send_processing_message)
     
-    ogg_path = None
-    wav_path = None
-    
     try:
-        file = await context.bot.get_file(voice.file_id)
-        
-        with tempfile.NamedTemporaryFile(suffix=".ogg", delete=False) as tf_ogg:
-            await file.download_to_drive(custom_path=tf_ogg.name)
-            ogg_path = tf_ogg.name
-
-        wav_path = ogg_path.replace(".ogg", ".wav")
-        
-        try:
-            # Додаємо timeout для FFmpeg
-            result = subprocess.run([
-                FFMPEG_PATH, "-i", ogg_path, "-ar", "16000", "-ac", "1", wav_path, "-y"
-            ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, 
-               timeout=FFMPEG_TIMEOUT)
-        except subprocess.TimeoutExpired:
-            async def edit_message():
-                return await processing_message.edit_text("❌ Перевищено час обробки аудіо.")
-            await safe_bot_operation(edit_message)
-            logger.error("FFmpeg timeout")
-            return
-        except subprocess.CalledProcessError as e:
-            async def edit_message():
-                return await processing_message.edit_text("❌ Помилка конвертації аудіо.")
-            await safe_bot_operation(edit_message)
-            logger.error(f"ffmpeg error: {e}")
-            return
-
-        with open(wav_path, "rb") as audio_file:
-            content = audio_file.read()
+        async with voice_scheduler.slot():
+            if queue_position:
+                async def edit_message():
+                    return await processing_message.edit_text(processing_text)
+                await safe_bot_operation(edit_message)
+            
+            recognized_text = await recognize_voice(voice, context, processing_message)
+    except VoiceQueueFull:
+        async def edit_message():
+            return await processing_message.edit_text(
+                "⏳ Черга голосових повідомлень заповнена. Спробуйте за хвилину."
+            )
+        await safe_bot_operation(edit_message)
+        return
+    
+    if recognized_text is None:
+        return
+    
+    await safe_send_message(update, context, f"🎤 Розпізнано: \"{recognized_text}\"")
+    
+    await process_and_save(recognized_text, user, update, context)
 
-        audio = speech.RecognitionAudio(content=content)
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=16000,
-            language_code=SPEECH_LANGUAGE,
-            enable_automatic_punctuation=True,
-            enable_word_time_offsets=False
-        )
+def voice_paused_message():
+    return (
+        "⏸ Розпізнавання голосу тимчасово призупинено: сервіс не відповідає.\n"
+        f"Спробуйте за {max(1, round(speech_breaker.retry_in() / 60))} хв або надішліть витрату текстом."
+    )
 
-        response = speech_client.recognize(config=config, audio=audio)
+def accepts_voice_directly(voice):
+    """Чи може рушій розпізнати голосове без конвертації FFmpeg"""
+    return speech_recognizer.accepts_opus and is_ogg_opus(voice.mime_type)
+
+# Підказки для розпізнавання: перебудовуються лише при зміні набору категорій
+_recognition_hints = {'store': None, 'count': -1, 'categories': None, 'phrases': ()}
+
+def recognition_phrases():
+    """Слова, на які варто орієнтуватись при розпізнаванні: категорії та числівники"""
+    store = expense_cache.store
+    hints = _recognition_hints
+    # Категорії в сховищі лише додаються, тож достатньо стежити за їх кількістю
+    if hints['store'] is store and hints['count'] == len(store.categories):
+        return hints['phrases']
+    
+    categories = sorted({normalize_category(category) for category in store.categories if category})
+    hints['store'] = store
+    hints['count'] = len(store.categories)
+    if categories != hints['categories']:
+        hints['categories'] = categories
+        hints['phrases'] = tuple(categories + NUMBER_WORDS)
+        logger.info(f"Підказки розпізнавання оновлено: {len(categories)} категорій")
+    return hints['phrases']
+
+async def recognize_voice(voice, context, processing_message):
+    """Завантажує, за потреби конвертує та розпізнає голосове; повертає текст або None"""
+    phrases = recognition_phrases()
+    
+    try:
+        # Те саме голосове (наприклад, переслане) вже розпізнавали
+        result = transcript_cache.get(voice.file_unique_id)
+        from_cache = result is not None
+        if result is not None:
+            logger.info(f"Голосове {voice.file_unique_id} знайдено в кеші розпізнавання")
+        else:
+            file = await context.bot.get_file(voice.file_id)
+            digest = hashlib.sha256()
+            ogg_data = None
+            
+            # Голосові Telegram - це OGG/Opus 48 кГц, Speech-to-Text приймає їх без конвертації
+            needs_transcoding = not accepts_voice_directly(voice)
+            if not needs_transcoding:
+                try:
+                    if SPEECH_STREAMING and speech_recognizer.supports_streaming:
+                        # Аудіо йде на розпізнавання частинами ще під час завантаження
+                        with SPEECH_SECONDS.time(engine=SPEECH_ENGINE, mode='stream'):
+                            async with speech_breaker.guard():
+                                result = await speech_recognizer.recognize_stream(
+                                    digest_chunks(iter_download(file.file_path), digest),
+                                    ENCODING_OGG_OPUS, OPUS_SAMPLE_RATE, phrases
+                                )
+                    else:
+                        ogg_data = await file.download_as_bytearray()
+                        digest.update(ogg_data)
+                        result = transcript_cache.get(digest.hexdigest())
+                        from_cache = result is not None
+                        if result is None:
+                            with SPEECH_SECONDS.time(engine=SPEECH_ENGINE, mode='opus'):
+                                async with speech_breaker.guard():
+                                    result = await speech_recognizer.recognize(
+                                        ogg_data, ENCODING_OGG_OPUS, OPUS_SAMPLE_RATE, phrases
+                                    )
+                except UnsupportedAudioError as e:
+                    if FFMPEG_PATH is None:
+                        raise
+                    logger.warning(f"OGG_OPUS не прийнято, конвертую через FFmpeg: {e}")
+                    needs_transcoding = True
+            
+            if needs_transcoding:
+                if ogg_data is None:
+                    ogg_data = await file.download_as_bytearray()
+                    digest = hashlib.sha256(ogg_data)
+                    result = transcript_cache.get(digest.hexdigest())
+                    from_cache = result is not None
+                
+                if result is None:
+                    try:
+                        # FFmpeg працює через pipe, не блокуючи event loop
+                        with FFMPEG_SECONDS.time():
+                            content = await transcode_to_pcm(FFMPEG_PATH, ogg_data, timeout=FFMPEG_TIMEOUT)
+                    except AudioConversionTimeout:
+                        async def edit_message():
+                            return await processing_message.edit_text("❌ Перевищено час обробки аудіо.")
+                        await safe_bot_operation(edit_message)
+                        logger.error("FFmpeg timeout")
+                        return None
+                    except AudioConversionError as e:
+                        async def edit_message():
+                            return await processing_message.edit_text("❌ Помилка конвертації аудіо.")
+                        await safe_bot_operation(edit_message)
+                        logger.error(f"ffmpeg error: {e}")
+                        return None
+                    
+                    with SPEECH_SECONDS.time(engine=SPEECH_ENGINE, mode='pcm'):
+                        async with speech_breaker.guard():
+                            result = await speech_recognizer.recognize(
+                                content, ENCODING_LINEAR16, SPEECH_SAMPLE_RATE, phrases
+                            )
+            
+            if result is not None:
+                transcript_cache.put(result, voice.file_unique_id, digest.hexdigest())
+        
+        CACHE_REQUESTS_TOTAL.inc(cache='voice_transcripts', result='hit' if from_cache else 'miss')
         
-        if not response.results:
+        if result is None:
             async def edit_message():
                 return await processing_message.edit_text("❌ Не вдалося розпізнати голосове повідомлення. Спробуйте говорити чіткіше.")
             await safe_bot_operation(edit_message)
-            return
+            return None
         
-        recognized_text = response.results[0].alternatives[0].transcript
-        confidence = response.results[0].alternatives[0].confidence
+        recognized_text, confidence = result
         
         logger.info(f"Розпізнано: '{recognized_text}' (впевненість: {confidence:.2f})")
         
@@ -2045,43 +1880,28 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return await processing_message.delete()
         await safe_bot_operation(delete_message)
         
-        await safe_send_message(update, context, f"🎤 Розпізнано: \"{recognized_text}\"")
+        return recognized_text
         
-        await process_and_save(recognized_text, user, update, context)
+    except CircuitOpenError:
+        # Сервіс став недоступним, поки голосове чекало в черзі
+        async def edit_message():
+            return await processing_message.edit_text(voice_paused_message())
+        await safe_bot_operation(edit_message)
+        return None
         
     except Exception as e:
-        logger.error(f"Google Speech-to-Text error: {e}")
+        logger.error(f"Помилка розпізнавання мовлення ({SPEECH_ENGINE}): {e}")
         async def edit_message():
             return await processing_message.edit_text("❌ Помилка при розпізнаванні голосу. Спробуйте пізніше.")
         await safe_bot_operation(edit_message)
-    finally:
-        # Гарантоване видалення тимчасових файлів
-        for path in [ogg_path, wav_path]:
-            if path and os.path.exists(path):
-                try:
-                    os.unlink(path)
-                    logger.debug(f"Видалено тимчасовий файл: {path}")
-                except Exception as e:
-                    logger.warning(f"Не вдалося видалити файл {path}: {e}")
+        return None
 
 # === ДОПОМІЖНІ ФУНКЦІЇ ===
 
-async def test_sheets_access():
-    """Тестує доступ до Google Sheets"""
-    try:
-        result = sheet.values().get(
-            spreadsheetId=SPREADSHEET_ID,
-            range="A1:A1"
-        ).execute()
-        logger.info("✅ Доступ до Google Sheets працює")
-        return True
-    except Exception as e:
-        logger.error(f"❌ Помилка доступу до Google Sheets: {e}")
-        return False
-
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обробник помилок"""
     logger.error(f'Update {update} caused error {context.error}')
+    ERRORS_TOTAL.inc(source='handler', category=classify_error(context.error))
     
     if update and update.effective_message:
         try:
@@ -2107,6 +1927,7 @@ def add_handlers(app):
     app.add_handler(CommandHandler("undo", undo_last_action))
     app.add_handler(CommandHandler("ignore", mark_as_ignored))
     app.add_handler(CommandHandler("recent", show_recent_expenses))
+    app.add_handler(CommandHandler("pending", show_pending_expenses))
     
     # Команди для пар
     app.add_handler(CommandHandler("compare", compare_users))
@@ -2120,11 +1941,90 @@ def add_handlers(app):
     
     # Обробники повідомлень (включаючи кнопку "Меню")
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    # Голосове чекає в черзі VoiceScheduler, блокуючи лише свою розмову (PerChatUpdateProcessor)
     app.add_handler(MessageHandler(filters.VOICE, handle_voice))
     
+    # Вимірюємо тривалість кожного обробника (/metrics)
+    for handler in app.handlers[0]:
+        commands = getattr(handler, 'commands', None)
+        name = f"/{min(commands)}" if commands else handler.callback.__name__
+        handler.callback = HANDLER_SECONDS.wrap(handler.callback, handler=name)
+    
     # Додаємо обробник помилок
     app.add_error_handler(error_handler)
 
+# === СТАН ДЛЯ HEALTH CHECK ===
+
+def _seconds_since(moment, now):
+    return None if moment is None else round(now - moment, 1)
+
+def liveness_status():
+    """Процес живий і event loop відповідає"""
+    return {
+        "alive": True,
+        "uptime": round(time.perf_counter() - PROCESS_STARTED, 1)
+    }
+
+# Від цих перевірок залежить готовність; решта - довідкові поля.
+# Витрати пишуться в локальний журнал, тож недоступна таблиця бота не зупиняє.
+READY_CHECKS = ("telegram", "ledger", "expense_cache")
+
+
+def health_status():
+    """Готовність бота з внутрішнього стану, без звернень до зовнішніх API"""
+    now = time.monotonic()
+    
+    if USE_WEBHOOK:
+        receiving = application is not None and application.running and webhook_active
+    else:
+        receiving = (application is not None and application.running
+                     and application.updater is not None and application.updater.running)
+    
+    checks = {
+        "telegram": {
+            "ok": receiving and not telegram_breaker.is_open,
+            "mode": "webhook" if USE_WEBHOOK else "polling",
+            "circuit": telegram_breaker.status()
+        },
+        "ledger": {
+            "ok": ledger.is_available()
+        },
+        "sheets": {
+            "ok": sheets.available,
+            "last_success_ago": _seconds_since(sheets.last_success, now),
+            "last_failure_ago": _seconds_since(sheets.last_failure, now),
+            "last_error": None if sheets.available else sheets.last_error,
+            "queued_requests": sheets.scheduler.waiting(),
+            "circuit": sheets_breaker.status()
+        },
+        "replicator": {
+            "ok": replicator.last_error is None,
+            "pending_writes": len(replicator),
+            "last_error": replicator.last_error,
+            "synced_ago": _seconds_since(replicator.pulled_at, now)
+        },
+        "speech": {
+            "ok": not speech_breaker.is_open,
+            "engine": SPEECH_ENGINE,
+            "circuit": speech_breaker.status()
+        },
+        "voice_queue": {
+            "ok": not voice_scheduler.is_full(),
+            "active": voice_scheduler.active,
+            "waiting": voice_scheduler.waiting,
+            "capacity": voice_scheduler.max_concurrent + voice_scheduler.max_queue
+        },
+        "expense_cache": {
+            "ok": expense_cache.loaded_at is not None,
+            "records": len(expense_cache.store),
+            "loaded_ago": _seconds_since(expense_cache.loaded_at, now)
+        }
+    }
+    return {
+        "ready": all(checks[name]["ok"] for name in READY_CHECKS),
+        "checks": checks
+    }
+
 # === ПОКРАЩЕННЯ 1: Функція для безпечного polling ===
 
 # === ДОДАЙТЕ ЦІ ФУНКЦІЇ ПЕРЕД async def main(): ===
@@ -2202,35 +2102,45 @@ async def graceful_shutdown(app):
     logger.info("🛑 Початок graceful shutdown...")
     
     try:
-        # Зупиняємо updater
-        if hasattr(app, 'updater') and app.updater.running:
-            logger.info("🔄 Зупиняємо updater...")
-            await app.updater.stop()
-            logger.info("✅ Updater зупинено")
+        # Application міг не створитись, якщо запуск перервався раніше
+        if app is not None:
+            # Зупиняємо updater
+            if hasattr(app, 'updater') and app.updater.running:
+                logger.info("🔄 Зупиняємо updater...")
+                await app.updater.stop()
+                logger.info("✅ Updater зупинено")
+        
+            # Зупиняємо application
+            if hasattr(app, 'running') and app.running:
+                logger.info("🔄 Зупиняємо application...")
+                await app.stop()
+                logger.info("✅ Application зупинено")
+        
+            # Завершуємо application
+            logger.info("🔄 Завершуємо application...")
+            await app.shutdown()
+            logger.info("✅ Application завершено")
+        
+            # Очищуємо HTTPXRequest
+            if hasattr(app.bot, '_request') and app.bot._request:
+                logger.info("🔄 Очищуємо HTTPXRequest...")
+                try:
+                    # Перевіряємо що це дійсно HTTPXRequest об'єкт з методом shutdown
+                    if hasattr(app.bot._request, 'shutdown') and callable(getattr(app.bot._request, 'shutdown', None)):
+                        await app.bot._request.shutdown()
+                        logger.info("✅ HTTPXRequest очищено")
+                    else:
+                        logger.warning("⚠️ HTTPXRequest не має методу shutdown, пропускаємо")
+                except Exception as req_error:
+                    logger.error(f"❌ Помилка при очищенні HTTPXRequest: {req_error}")
         
-        # Зупиняємо application
-        if hasattr(app, 'running') and app.running:
-            logger.info("🔄 Зупиняємо application...")
-            await app.stop()
-            logger.info("✅ Application зупинено")
+        # Відправляємо незавершені зміни, зупиняємо пул потоків Google Sheets і закриваємо журнал
+        await replicator.stop()
+        sheets.shutdown()
+        ledger.close()
         
-        # Завершуємо application
-        logger.info("🔄 Завершуємо application...")
-        await app.shutdown()
-        logger.info("✅ Application завершено")
-        
-        # Очищуємо HTTPXRequest
-        if hasattr(app.bot, '_request') and app.bot._request:
-            logger.info("🔄 Очищуємо HTTPXRequest...")
-            try:
-                # Перевіряємо що це дійсно HTTPXRequest об'єкт з методом shutdown
-                if hasattr(app.bot._request, 'shutdown') and callable(getattr(app.bot._request, 'shutdown', None)):
-                    await app.bot._request.shutdown()
-                    logger.info("✅ HTTPXRequest очищено")
-                else:
-                    logger.warning("⚠️ HTTPXRequest не має методу shutdown, пропускаємо")
-            except Exception as req_error:
-                logger.error(f"❌ Помилка при очищенні HTTPXRequest: {req_error}")
+        # Закриваємо gRPC-канал Speech-to-Text
+        await speech_recognizer.close()
         
     except Exception as e:
         logger.error(f"❌ Помилка при graceful shutdown: {e}")
@@ -2247,8 +2157,69 @@ async def clear_webhook_and_pending_updates(bot):
     except Exception as e:
         logger.warning(f"⚠️ Помилка очищення webhook: {e}")
 
+async def start_webhook(app):
+    """Реєструє webhook: Telegram надсилатиме оновлення на aiohttp-сервер run.py"""
+    global webhook_active
+    webhook_url = f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}"
+    try:
+        await app.bot.set_webhook(
+            url=webhook_url,
+            secret_token=WEBHOOK_SECRET_TOKEN,
+            allowed_updates=Update.ALL_TYPES
+        )
+        logger.info(f"✅ Webhook встановлено: {webhook_url}")
+        webhook_active = True
+        return True
+    except Exception as e:
+        logger.error(f"❌ Не вдалося встановити webhook: {e}")
+        return False
+
+async def process_webhook_update(data):
+    """Передає оновлення з webhook у чергу Application; False якщо бот ще не готовий"""
+    if application is None or not application.running:
+        return False
+    update = Update.de_json(data, application.bot)
+    await application.update_queue.put(update)
+    return True
+
+async def initialize_application(app):
+    """Ініціалізує Application з повторними спробами та перевіряє результат"""
+    # ПРАВИЛЬНА ПОСЛІДОВНІСТЬ ІНІЦІАЛІЗАЦІЇ для python-telegram-bot 20.x з retry логікою
+    logger.info("🔄 Ініціалізація application...")
+    
+    # Retry логіка для ініціалізації
+    init_retry_count = 0
+    max_init_retries = 3
+    
+    while init_retry_count < max_init_retries:
+        try:
+            await app.initialize()
+            logger.info(f"✅ Application ініціалізовано успішно (спроба {init_retry_count + 1})")
+            break
+        except Exception as init_error:
+            init_retry_count += 1
+            logger.warning(f"⚠️ Помилка ініціалізації (спроба {init_retry_count}/{max_init_retries}): {init_error}")
+            
+            if init_retry_count >= max_init_retries:
+                logger.error("❌ Не вдалося ініціалізувати application після всіх спроб")
+                raise
+                
+            await asyncio.sleep(2)  # Пауза перед наступною спробою
+    
+    if not getattr(app, '_initialized', False):
+        raise RuntimeError(f"Application не ініціалізовано! app._initialized = {getattr(app, '_initialized', None)}")
+    
+    if not hasattr(app, 'updater') or not app.updater:
+        raise RuntimeError(f"Updater не створено! app.updater = {getattr(app, 'updater', None)}")
+    
+    if not hasattr(app.bot, '_request') or not app.bot._request:
+        raise RuntimeError(f"HTTP request не ініціалізовано! app.bot._request = {getattr(app.bot, '_request', None)}")
+    
+    logger.info("✅ Перевірка ініціалізації пройшла успішно")
+
 async def main():
     """Основна функція запуску бота з покращеною обробкою конфліктів"""
+    global application
     logger.info("🚀 Запуск FinDotBot з покращеною обробкою конфліктів...")
     
     # Налаштування обробників сигналів
@@ -2274,88 +2245,67 @@ async def main():
         logger.error(f"❌ Файл сервісного акаунту не знайдено: {SERVICE_ACCOUNT_FILE}")
         return
     
-    # Тестуємо доступ до Google Sheets
-    try:
-        await test_sheets_access()
-    except Exception as e:
-        logger.error(f"❌ Не вдалося протестувати доступ до Google Sheets: {e}")
+    async def load_expenses():
+        # Журнал читається локально, а клієнт Sheets готується паралельно з Telegram
+        with startup_timer.phase("Журнал витрат та Google Sheets"):
+            expense_cache.load()
+            try:
+                await sheets.warm_up()
+                if ledger.is_empty():
+                    # Перший запуск з новим журналом: переносимо в нього всю таблицю
+                    await replicator.pull_full()
+                logger.info("✅ Доступ до Google Sheets працює")
+            except Exception as e:
+                logger.error(f"❌ Не вдалося синхронізувати журнал з Google Sheets: {e}")
     
-    # Створення Application з покращеними налаштуваннями
-    app = await create_application()
+    async def prepare_application():
+        with startup_timer.phase("Telegram Application"):
+            app = await create_application()
+            await initialize_application(app)
+            return app
     
+    app = None
     try:
-        # ПРАВИЛЬНА ПОСЛІДОВНІСТЬ ІНІЦІАЛІЗАЦІЇ для python-telegram-bot 20.x з retry логікою
-        logger.info("🔄 Ініціалізація application...")
-        
-        # Retry логіка для ініціалізації
-        init_retry_count = 0
-        max_init_retries = 3
+        _, app = await asyncio.gather(load_expenses(), prepare_application())
+        application = app
         
-        while init_retry_count < max_init_retries:
-            try:
-                await app.initialize()
-                logger.info(f"✅ Application ініціалізовано успішно (спроба {init_retry_count + 1})")
-                break
-            except Exception as init_error:
-                init_retry_count += 1
-                logger.warning(f"⚠️ Помилка ініціалізації (спроба {init_retry_count}/{max_init_retries}): {init_error}")
-                
-                if init_retry_count >= max_init_retries:
-                    logger.error("❌ Не вдалося ініціалізувати application після всіх спроб")
-                    raise
-                    
-                await asyncio.sleep(2)  # Пауза перед наступною спробою
-        
-        # Перевірка ініціалізації з діагностикою
-        logger.info(f"🔍 Діагностика після ініціалізації:")
-        logger.info(f"  - app._initialized: {getattr(app, '_initialized', 'ВІДСУТНІЙ')}")
-        logger.info(f"  - app.updater: {getattr(app, 'updater', 'ВІДСУТНІЙ')}")
-        logger.info(f"  - hasattr(app, 'updater'): {hasattr(app, 'updater')}")
-        logger.info(f"  - app.bot._request: {getattr(app.bot, '_request', 'ВІДСУТНІЙ')}")
-        
-        if not getattr(app, '_initialized', False):
-            logger.error(f"❌ Application не ініціалізовано! app._initialized = {getattr(app, '_initialized', None)}")
-            return
-            
-        if not hasattr(app, 'updater') or not app.updater:
-            logger.error(f"❌ Updater не створено! app.updater = {getattr(app, 'updater', None)}")
-            logger.error(f"❌ Доступні атрибути app: {[attr for attr in dir(app) if not attr.startswith('_')]}")
-            return
-            
-        if not hasattr(app.bot, '_request') or not app.bot._request:
-            logger.error(f"❌ HTTP request не ініціалізовано! app.bot._request = {getattr(app.bot, '_request', None)}")
-            return
-            
-        logger.info("✅ Перевірка ініціалізації пройшла успішно")
+        # Фонова реплікація журналу в Google Sheets
+        replicator.start()
         
         # Додавання обробників команд ПІСЛЯ ініціалізації
         add_handlers(app)
         
-        await app.start()
-        
-        # Додаткова пауза для повної ініціалізації Application після start()
-        logger.info("⏳ Очікуємо повної ініціалізації Application...")
-        await asyncio.sleep(2)
+        with startup_timer.phase("Запуск Application"):
+            await app.start()
         
         logger.info("✅ FinDotBot ініціалізовано та готовий до роботи...")
         if FFMPEG_PATH:
             logger.info("🎤 Голосові повідомлення увімкнені")
+        elif speech_recognizer.accepts_opus:
+            logger.warning("⚠️ FFmpeg не знайдено: голосові розпізнаються лише напряму як OGG/Opus")
         else:
-            logger.warning("⚠️ Голосові повідомлення вимкнені (FFmpeg не знайдено)")
-        
-        # БАЗОВЕ ОЧИЩЕННЯ ПЕРЕД ЗАПУСКОМ
-        logger.info("🧹 Очищення webhook перед запуском...")
-        try:
-            await app.bot.delete_webhook(drop_pending_updates=True)
-            logger.info("✅ Webhook очищено")
-            await asyncio.sleep(5)
-        except Exception as e:
-            logger.warning(f"⚠️ Помилка очищення webhook: {e}")
+            logger.warning(f"⚠️ Голосові повідомлення вимкнені: рушій {SPEECH_ENGINE} потребує FFmpeg")
         
-        # БЕЗПЕЧНИЙ ЗАПУСК POLLING
-        polling_started = await safe_start_polling(app)
+        with startup_timer.phase("Отримання оновлень (webhook/polling)"):
+            if USE_WEBHOOK:
+                # Оновлення надходитимуть через aiohttp-сервер, getUpdates не потрібен
+                polling_started = await start_webhook(app)
+            else:
+                # БАЗОВЕ ОЧИЩЕННЯ ПЕРЕД ЗАПУСКОМ
+                logger.info("🧹 Очищення webhook перед запуском...")
+                try:
+                    await app.bot.delete_webhook(drop_pending_updates=True)
+                    logger.info("✅ Webhook очищено")
+                except Exception as e:
+                    logger.warning(f"⚠️ Помилка очищення webhook: {e}")
+                
+                # БЕЗПЕЧНИЙ ЗАПУСК POLLING
+                polling_started = await safe_start_polling(app)
         
         if polling_started:
+            startup_timer.mark_ready()
+            startup_timer.report()
+            
             # Простий головний цикл роботи
             logger.info("🎯 Бот працює стабільно та очікує повідомлення...")
             
@@ -2364,7 +2314,7 @@ async def main():
                     await asyncio.sleep(10)  # Перевірка кожні 10 секунд
                     
                     # Простий чекінг стану
-                    if hasattr(app, 'updater') and not app.updater.running:
+                    if not USE_WEBHOOK and hasattr(app, 'updater') and not app.updater.running:
                         logger.warning("⚠️ Updater зупинився, спробуємо перезапустити...")
                         await safe_start_polling(app)
                     
@@ -2372,7 +2322,7 @@ async def main():
                     logger.error(f"❌ Помилка у головному циклі: {e}")
                     await asyncio.sleep(30)  # Пауза після помилки
         else:
-            logger.error("❌ Не вдалося запустити polling")
+            logger.error("❌ Не вдалося запустити отримання оновлень")
             
     except KeyboardInterrupt:
         logger.info("🛑 Отримано сигнал переривання")
@@ -3,30 +3,62 @@ from aiohttp import web
 import asyncio
 import threading
 import logging
+import time
+
+from metrics import CONTENT_TYPE, registry
 
 logger = logging.getLogger(__name__)
 
 class HealthCheckServer:
-    def __init__(self, port=10000):
+    def __init__(self, port=10000, status_provider=None):
         self.port = port
+        # Функція, що повертає {"ready": ..., "checks": {...}} з пам'яті бота
+        self.status_provider = status_provider
+        self.started = time.monotonic()
         self.app = None
         self.runner = None
         self.site = None
+    
+    def _status(self):
+        if self.status_provider is None:
+            return {"ready": True, "checks": {}}
+        return self.status_provider()
         
     async def health_handler(self, request):
         """Health check endpoint"""
+        report = self._status()
         return web.json_response({
-            "status": "healthy",
+            "status": "healthy" if report["ready"] else "degraded",
             "service": "FinDotBot",
-            "timestamp": asyncio.get_event_loop().time()
+            "timestamp": asyncio.get_event_loop().time(),
+            "checks": report["checks"]
         })
     
+    async def live_handler(self, request):
+        """Liveness: сервер працює"""
+        return web.json_response({
+            "alive": True,
+            "uptime": round(time.monotonic() - self.started, 1)
+        })
+    
+    async def ready_handler(self, request):
+        """Readiness: 503, якщо якась перевірка не пройшла"""
+        report = self._status()
+        return web.json_response(report, status=200 if report["ready"] else 503)
+    
+    async def metrics_handler(self, request):
+        """Метрики у текстовому форматі Prometheus"""
+        return web.Response(body=registry.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+    
     async def start_server(self):
         """Запуск health check сервера"""
         try:
             self.app = web.Application()
             self.app.router.add_get('/health', self.health_handler)
             self.app.router.add_get('/', self.health_handler)  # Root також відповідає
+            self.app.router.add_get('/live', self.live_handler)
+            self.app.router.add_get('/ready', self.ready_handler)
+            self.app.router.add_get('/metrics', self.metrics_handler)
             
             self.runner = web.AppRunner(self.app)
             await self.runner.setup()
@@ -47,13 +79,13 @@ class HealthCheckServer:
             await self.runner.cleanup()
 
 # Функція для інтеграції з основним ботом
-def start_health_server_in_background(port=10000):
+def start_health_server_in_background(port=10000, status_provider=None):
     """Запуск health check сервера в окремому потоці"""
     def run_server():
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         
-        health_server = HealthCheckServer(port)
+        health_server = HealthCheckServer(port, status_provider)
         
         try:
             loop.run_until_complete(health_server.start_server())
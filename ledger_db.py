@@ -0,0 +1,278 @@
+# ledger_db.py - локальний журнал витрат у SQLite (основне сховище бота)
+import logging
+import os
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY,
+    ts INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    amount REAL NOT NULL,
+    user TEXT NOT NULL,
+    comment TEXT NOT NULL DEFAULT '',
+    sheet_row INTEGER,                  -- NULL: рядок ще не додано в таблицю
+    deleted INTEGER NOT NULL DEFAULT 0, -- видалено локально, рядок ще треба прибрати з таблиці
+    dirty INTEGER NOT NULL DEFAULT 0,   -- є зміни, не відправлені в таблицю
+    version INTEGER NOT NULL DEFAULT 0  -- зростає з кожною локальною зміною
+);
+CREATE INDEX IF NOT EXISTS idx_expenses_ts ON expenses (ts);
+CREATE INDEX IF NOT EXISTS idx_expenses_user_ts ON expenses (user, ts);
+CREATE INDEX IF NOT EXISTS idx_expenses_category_ts ON expenses (category, ts);
+CREATE INDEX IF NOT EXISTS idx_expenses_sheet_row ON expenses (sheet_row) WHERE sheet_row IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_expenses_dirty ON expenses (dirty) WHERE dirty = 1;
+"""
+
+COLUMNS = "id, ts, category, amount, user, comment, sheet_row"
+
+
+class ExpenseLedger:
+    """Журнал витрат у SQLite в режимі WAL.
+
+    Бот читає й пише витрати лише локально, а Google Sheets стає
+    реплікою: SheetsReplicator відправляє туди записи з dirty = 1
+    і повертає в журнал зміни, зроблені в таблиці вручну.
+
+    Запис, змінений під час відправки, лишається dirty: відправка
+    запам'ятовує version і знімає позначку, лише якщо версія не змінилась.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # У режимі WAL NORMAL не втрачає узгодженості, а fsync виконується лише на checkpoint
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def _transaction(self):
+        return _Transaction(self._conn)
+
+    # === ЛОКАЛЬНІ ЗМІНИ ===
+
+    def add(self, ts, category, amount, user, comment):
+        """Додає витрату, яка ще не потрапила в таблицю, повертає її id"""
+        return self.add_many([(ts, category, amount, user, comment)])[0]
+
+    def add_many(self, items):
+        """Додає кілька витрат [(ts, category, amount, user, comment), ...] однією транзакцією"""
+        with self._transaction():
+            return [
+                self._conn.execute(
+                    "INSERT INTO expenses (ts, category, amount, user, comment, dirty) VALUES (?, ?, ?, ?, ?, 1)",
+                    item
+                ).lastrowid
+                for item in items
+            ]
+
+    def set_comment(self, record_id, comment):
+        with self._transaction():
+            self._conn.execute(
+                "UPDATE expenses SET comment = ?, dirty = 1, version = version + 1 WHERE id = ? AND deleted = 0",
+                (comment, record_id)
+            )
+
+    def delete(self, record_id):
+        """Позначає витрату видаленою; рядок таблиці прибере реплікатор"""
+        with self._transaction():
+            self._conn.execute(
+                "UPDATE expenses SET deleted = 1, dirty = 1, version = version + 1 WHERE id = ?",
+                (record_id,)
+            )
+
+    # === ЧИТАННЯ ===
+
+    def records(self):
+        """Усі невидалені витрати в порядку часу"""
+        return self._conn.execute(
+            f"SELECT {COLUMNS} FROM expenses WHERE deleted = 0 ORDER BY ts, id"
+        ).fetchall()
+
+    def pending_for(self, user):
+        """Витрати користувача, яких ще немає в таблиці"""
+        return self._conn.execute(
+            f"SELECT {COLUMNS} FROM expenses "
+            "WHERE user = ? AND sheet_row IS NULL AND deleted = 0 ORDER BY ts, id",
+            (user,)
+        ).fetchall()
+
+    def unsent(self):
+        """Записи без рядка в таблиці, разом зі скасованими до відправки"""
+        return self._conn.execute(
+            f"SELECT {COLUMNS}, deleted, version FROM expenses WHERE sheet_row IS NULL ORDER BY ts, id"
+        ).fetchall()
+
+    def dirty_count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM expenses WHERE dirty = 1").fetchone()[0]
+
+    def is_available(self):
+        """Журнал відкритий і відповідає на запити (для /ready)"""
+        try:
+            self._conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def is_empty(self):
+        return self._conn.execute("SELECT 1 FROM expenses LIMIT 1").fetchone() is None
+
+    def last_sheet_row(self):
+        """Найбільший відомий номер рядка таблиці (0 якщо немає)"""
+        return self._conn.execute("SELECT COALESCE(MAX(sheet_row), 0) FROM expenses").fetchone()[0]
+
+    def sheet_rows_from(self, start_row):
+        """Номери рядків таблиці, починаючи з start_row, які вже є в журналі"""
+        return {row[0] for row in self._conn.execute(
+            "SELECT sheet_row FROM expenses WHERE sheet_row >= ?", (start_row,)
+        )}
+
+    def find(self, ts, category, amount, user):
+        """id найновішої невидаленої витрати з такими полями або None"""
+        row = self._conn.execute(
+            "SELECT id FROM expenses WHERE user = ? AND ts = ? AND category = ? AND amount = ? AND deleted = 0 "
+            "ORDER BY id DESC LIMIT 1",
+            (user, ts, category, amount)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    # === ВІДПРАВКА В ТАБЛИЦЮ ===
+
+    def outbox(self):
+        """Незавершені зміни: (нові записи, змінені рядки, видалені рядки, скасовані до відправки)"""
+        rows = self._conn.execute(
+            f"SELECT {COLUMNS}, deleted, version FROM expenses WHERE dirty = 1 ORDER BY ts, id"
+        ).fetchall()
+        inserts = [row for row in rows if row['sheet_row'] is None and not row['deleted']]
+        updates = [row for row in rows if row['sheet_row'] is not None and not row['deleted']]
+        deletes = sorted(
+            (row for row in rows if row['sheet_row'] is not None and row['deleted']),
+            key=lambda row: row['sheet_row'], reverse=True
+        )
+        discarded = [row['id'] for row in rows if row['sheet_row'] is None and row['deleted']]
+        return inserts, updates, deletes, discarded
+
+    def mark_inserted(self, sent, first_row):
+        """Прив'язує відправлені записи [(id, version), ...] до рядків з першого first_row"""
+        with self._transaction():
+            for offset, (record_id, version) in enumerate(sent):
+                self._conn.execute(
+                    "UPDATE expenses SET sheet_row = ?, dirty = CASE WHEN version = ? THEN 0 ELSE 1 END WHERE id = ?",
+                    (first_row + offset, version, record_id)
+                )
+
+    def mark_updated(self, sent):
+        with self._transaction():
+            self._conn.executemany(
+                "UPDATE expenses SET dirty = 0 WHERE id = ? AND version = ?",
+                sent
+            )
+
+    def mark_deleted(self, rows):
+        """Прибирає записи видалених рядків і зсуває номери наступних (rows - за спаданням)"""
+        with self._transaction():
+            for sheet_row in rows:
+                self._conn.execute("DELETE FROM expenses WHERE sheet_row = ? AND deleted = 1", (sheet_row,))
+                self._conn.execute("UPDATE expenses SET sheet_row = sheet_row - 1 WHERE sheet_row > ?", (sheet_row,))
+
+    def purge(self, record_ids):
+        """Остаточно видаляє записи, скасовані ще до відправки"""
+        with self._transaction():
+            self._conn.executemany("DELETE FROM expenses WHERE id = ? AND sheet_row IS NULL", [(i,) for i in record_ids])
+
+    # === ЗМІНИ З ТАБЛИЦІ ===
+
+    def add_from_sheet(self, expenses):
+        """Додає рядки, дописані в таблицю вручну, повертає їх id"""
+        with self._transaction():
+            return [self._insert_synced(expense) for expense in expenses]
+
+    def _insert_synced(self, expense):
+        return self._conn.execute(
+            "INSERT INTO expenses (ts, category, amount, user, comment, sheet_row) VALUES (?, ?, ?, ?, ?, ?)",
+            (expense['ts'], expense['category'], expense['amount'], expense['user'], expense['comment'], expense['row'])
+        ).lastrowid
+
+    def reconcile(self, expenses):
+        """Звіряє журнал з повним вмістом таблиці, повертає кількість змінених записів.
+
+        expenses - розібрані рядки таблиці з номером row. Запис шукається
+        спершу в тому самому рядку (за часом і сумою), а потім серед
+        рядків, що зсунулись після ручних видалень (за часом, сумою,
+        категорією та користувачем), тож зберігає id, а з ним і
+        посилання з /undo. Рядки без відповідника додаються, записи без
+        рядка видаляються. Локальні зміни, ще не відправлені (dirty),
+        таблиця не перетирає.
+        """
+        changed = 0
+        with self._transaction():
+            known = self._conn.execute(
+                "SELECT id, ts, category, amount, user, comment, sheet_row, dirty FROM expenses "
+                "WHERE sheet_row IS NOT NULL"
+            ).fetchall()
+            by_row = {record['sheet_row']: record for record in known}
+            by_content = {}
+            for record in known:
+                key = (record['ts'], record['amount'], record['category'], record['user'])
+                by_content.setdefault(key, []).append(record)
+            matched = set()
+
+            def claim(expense):
+                current = by_row.get(expense['row'])
+                if (current is not None and current['id'] not in matched and
+                        (current['ts'], current['amount']) == (expense['ts'], expense['amount'])):
+                    return current
+                key = (expense['ts'], expense['amount'], expense['category'], expense['user'])
+                for candidate in by_content.get(key, ()):
+                    if candidate['id'] not in matched:
+                        return candidate
+                return None
+
+            for expense in expenses:
+                current = claim(expense)
+                if current is None:
+                    self._insert_synced(expense)
+                    changed += 1
+                    continue
+
+                matched.add(current['id'])
+                fields = (expense['category'], expense['user'], expense['comment'])
+                if not current['dirty'] and (current['category'], current['user'], current['comment']) != fields:
+                    self._conn.execute(
+                        "UPDATE expenses SET category = ?, user = ?, comment = ?, sheet_row = ? WHERE id = ?",
+                        fields + (expense['row'], current['id'])
+                    )
+                    changed += 1
+                elif current['sheet_row'] != expense['row']:
+                    self._conn.execute("UPDATE expenses SET sheet_row = ? WHERE id = ?", (expense['row'], current['id']))
+                    changed += 1
+
+            # Записи, рядків яких у таблиці вже немає (видалені або невалідні)
+            for record in known:
+                if record['id'] not in matched:
+                    self._conn.execute("DELETE FROM expenses WHERE id = ?", (record['id'],))
+                    changed += 1
+        return changed
+
+
+class _Transaction:
+    """BEGIN/COMMIT з відкатом при помилці (з'єднання в режимі autocommit)"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __enter__(self):
+        self._conn.execute("BEGIN")
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
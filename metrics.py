@@ -0,0 +1,260 @@
+# metrics.py - метрики у текстовому форматі Prometheus для /metrics
+import functools
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Межі кошиків гістограм у секундах: від швидких відповідей Telegram до довгих голосових
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric:
+    """Спільна частина метрик: назва, опис та набір міток"""
+
+    type_name = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: очікуються мітки {self.labelnames}, отримано {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}"
+        ]
+
+    def samples(self):
+        return []
+
+
+class Counter(Metric):
+    """Лічильник, що лише зростає"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def items(self):
+        return list(self._values.items())
+
+    def samples(self):
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(Metric):
+    """Розподіл тривалостей за кошиками"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}  # мітки -> [лічильники кошиків, сума, кількість]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[0][i] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Вимірює тривалість блоку (і тоді, коли він завершився помилкою)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def wrap(self, callback, **labels):
+        """Обгортає асинхронну функцію, вимірюючи кожен її виклик"""
+        @functools.wraps(callback)
+        async def timed(*args, **kwargs):
+            with self.time(**labels):
+                return await callback(*args, **kwargs)
+        return timed
+
+    def samples(self):
+        lines = []
+        for key, (bucket_counts, total, count) in sorted(self._values.items()):
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {bucket_count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class GaugeFunction(Metric):
+    """Значення, яке обчислюється в момент запиту /metrics.
+
+    collect повертає {кортеж значень міток: число}.
+    """
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        super().__init__(name, documentation, labelnames)
+        self._collect = collect
+
+    def samples(self):
+        try:
+            values = self._collect()
+        except Exception as e:
+            logger.warning(f"Не вдалося обчислити метрику {self.name}: {e}")
+            return []
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Registry:
+    """Набір метрик, що віддаються на /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрику {metric.name} вже зареєстровано")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+def classify_error(error):
+    """Категорія помилки так само, як її розрізняє safe_bot_operation"""
+    error_msg = str(error).lower()
+    if "conflict" in error_msg or "terminated by other getupdates" in error_msg:
+        return 'conflict'
+    if "timeout" in error_msg or "timed out" in error_msg:
+        return 'timeout'
+    if any(keyword in error_msg for keyword in ["network", "connection", "unreachable", "failed to connect", "readerror", "readtimeout"]):
+        return 'network'
+    if "rate limit" in error_msg or "too many requests" in error_msg or "quota exceeded" in error_msg:
+        return 'rate_limit'
+    return 'other'
+
+
+registry = Registry()
+
+# === МЕТРИКИ БОТА ===
+
+TELEGRAM_REQUEST_SECONDS = registry.register(Histogram(
+    'findotbot_telegram_request_seconds',
+    'Тривалість запитів до Telegram Bot API (кожна спроба safe_bot_operation)',
+    ('operation',)
+))
+SHEETS_REQUEST_SECONDS = registry.register(Histogram(
+    'findotbot_sheets_request_seconds',
+    'Тривалість запитів до Google Sheets API',
+    ('method',)
+))
+FFMPEG_SECONDS = registry.register(Histogram(
+    'findotbot_ffmpeg_seconds',
+    'Тривалість конвертації голосового через FFmpeg'
+))
+SPEECH_SECONDS = registry.register(Histogram(
+    'findotbot_speech_seconds',
+    'Тривалість розпізнавання мовлення',
+    ('engine', 'mode')
+))
+HANDLER_SECONDS = registry.register(Histogram(
+    'findotbot_handler_seconds',
+    'Тривалість обробки оновлення за командою чи обробником',
+    ('handler',)
+))
+SHEETS_QUEUE_SECONDS = registry.register(Histogram(
+    'findotbot_sheets_queue_seconds',
+    'Очікування черги й квоти перед запитом до Google Sheets',
+    ('quota',)
+))
+ERRORS_TOTAL = registry.register(Counter(
+    'findotbot_errors_total',
+    'Помилки за джерелом і категорією (conflict, timeout, network, rate_limit, other)',
+    ('source', 'category')
+))
+CACHE_REQUESTS_TOTAL = registry.register(Counter(
+    'findotbot_cache_requests_total',
+    'Звернення до кешів: hit - з пам\'яті, miss - довелось завантажити чи обчислити',
+    ('cache', 'result')
+))
+CIRCUIT_REJECTED_TOTAL = registry.register(Counter(
+    'findotbot_circuit_rejected_total',
+    'Запити, відхилені відкритим запобіжником без звернення до сервісу',
+    ('dependency',)
+))
+
+SINGLE_FLIGHT_TOTAL = registry.register(Counter(
+    'findotbot_single_flight_total',
+    'Запити за ключем: leader - виконано, shared - приєднались до вже запущеного',
+    ('key', 'result')
+))
+
+
+def _cache_hit_ratios():
+    totals = {}
+    for (cache, result), count in CACHE_REQUESTS_TOTAL.items():
+        hits, total = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (count if result == 'hit' else 0), total + count)
+    return {(cache,): hits / total for cache, (hits, total) in totals.items() if total}
+
+
+registry.register(GaugeFunction(
+    'findotbot_cache_hit_ratio',
+    'Частка звернень до кешу, обслужених з пам\'яті',
+    ('cache',),
+    _cache_hit_ratios
+))
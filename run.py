@@ -4,12 +4,17 @@ import logging
 import sys
 import os
 import signal
+import hmac
 
 # Додаємо поточну директорію до шляху
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from finedot_bot import main
-from config import HEALTH_CHECK_PORT, LOG_LEVEL
+from startup_timing import startup_timer
+
+with startup_timer.phase("Імпорт модулів бота"):
+    from finedot_bot import main, process_webhook_update, health_status, liveness_status
+from config import HEALTH_CHECK_PORT, LOG_LEVEL, USE_WEBHOOK, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN
+from metrics import CONTENT_TYPE, registry
 from aiohttp import web
 
 # Налаштування логування
@@ -29,13 +34,45 @@ runner = None
 site = None
 
 async def health_handler(request):
-    """Health check endpoint"""
+    """Health check endpoint (для Render завжди 200, стан - у полі status)"""
+    report = health_status()
     return web.json_response({
-        "status": "healthy",
+        "status": "healthy" if report["ready"] else "degraded",
         "service": "FinDotBot",
-        "timestamp": asyncio.get_event_loop().time()
+        "timestamp": asyncio.get_event_loop().time(),
+        "checks": report["checks"]
     })
 
+async def live_handler(request):
+    """Liveness: процес працює, event loop відповідає"""
+    return web.json_response(liveness_status())
+
+async def ready_handler(request):
+    """Readiness: 503, поки бот не отримує оновлення, Sheets недоступні чи відкрито запобіжник"""
+    report = health_status()
+    return web.json_response(report, status=200 if report["ready"] else 503)
+
+async def metrics_handler(request):
+    """Метрики у текстовому форматі Prometheus"""
+    return web.Response(body=registry.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+async def telegram_webhook_handler(request):
+    """Приймає оновлення від Telegram (режим webhook)"""
+    secret = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not hmac.compare_digest(secret, WEBHOOK_SECRET_TOKEN):
+        logger.warning(f"Webhook: відхилено запит з невірним секретом від {request.remote}")
+        return web.Response(status=403)
+    
+    try:
+        data = await request.json()
+    except ValueError:
+        return web.Response(status=400)
+    
+    # 503 - Telegram повторить доставку, коли бот завершить запуск
+    if not await process_webhook_update(data):
+        return web.Response(status=503)
+    return web.Response()
+
 async def start_health_server():
     """Запуск health check сервера"""
     global app, runner, site
@@ -44,6 +81,11 @@ async def start_health_server():
         app = web.Application()
         app.router.add_get('/health', health_handler)
         app.router.add_get('/', health_handler)
+        app.router.add_get('/live', live_handler)
+        app.router.add_get('/ready', ready_handler)
+        app.router.add_get('/metrics', metrics_handler)
+        if USE_WEBHOOK:
+            app.router.add_post(WEBHOOK_PATH, telegram_webhook_handler)
         
         runner = web.AppRunner(app)
         await runner.setup()
@@ -52,6 +94,8 @@ async def start_health_server():
         await site.start()
         
         logger.info(f"Health check сервер запущено на порту {HEALTH_CHECK_PORT}")
+        if USE_WEBHOOK:
+            logger.info(f"Webhook Telegram приймається на {WEBHOOK_PATH}")
         
     except Exception as e:
         logger.error(f"Помилка запуску health check сервера: {e}")
@@ -70,21 +114,16 @@ async def stop_health_server():
         logger.error(f"Помилка зупинки health check сервера: {e}")
 
 async def run_bot():
-    """Основна функція запуску з послідовним стартом"""
+    """Основна функція запуску: health check сервер, потім бот"""
     try:
-        # Спочатку запускаємо бота
-        logger.info("Запуск FinDotBot...")
-        bot_task = asyncio.create_task(main())
-        
-        # Даємо боту час на ініціалізацію (збільшено з 2 до 5 секунд для стабільності Render)
-        await asyncio.sleep(5)
-        
-        # Потім запускаємо health check сервер
+        # Спочатку відкриваємо порт: Render бачить сервіс живим, поки бот ще запускається,
+        # а webhook-запити до готовності отримують 503 і повторюються Telegram
         logger.info(f"Запуск health check сервера на порту {HEALTH_CHECK_PORT}")
-        await start_health_server()
+        with startup_timer.phase("Health check сервер"):
+            await start_health_server()
         
-        # Чекаємо завершення бота
-        await bot_task
+        logger.info("Запуск FinDotBot...")
+        await main()
         
     except KeyboardInterrupt:
         logger.info("Отримано сигнал переривання, зупинка бота...")
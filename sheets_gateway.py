@@ -0,0 +1,236 @@
+# sheets_gateway.py - неблокуючий доступ до Google Sheets
+import asyncio
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httplib2
+import google_auth_httplib2
+from google.oauth2.service_account import Credentials
+from googleapiclient.discovery import build
+
+from circuit_breaker import CircuitBreaker
+from metrics import ERRORS_TOTAL, SHEETS_REQUEST_SECONDS, classify_error
+from sheets_scheduler import QUOTA_READ, QUOTA_WRITE, SheetsScheduler
+
+logger = logging.getLogger(__name__)
+
+SHEETS_SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
+
+def rate_limit_delay(error, attempt, max_delay):
+    """Пауза після відповіді 429 (None - це не перевищення квоти).
+
+    Google вказує Retry-After не завжди; тоді пауза зростає
+    експоненційно з невеликим випадковим зсувом.
+    """
+    resp = getattr(error, 'resp', None)
+    if getattr(resp, 'status', None) != 429:
+        return None
+    try:
+        delay = float(resp.get('retry-after'))
+    except (TypeError, ValueError):
+        delay = 2 ** attempt + random.uniform(0, 1)
+    return min(delay, max_delay)
+
+
+class SheetsGateway:
+    """Асинхронний шлюз до Google Sheets.
+
+    googleapiclient працює синхронно, тому кожен виклик .execute()
+    виконується в обмеженому пулі потоків, а event loop бота
+    лише очікує результат. httplib2 не є потокобезпечним, тому
+    кожен робочий потік має власне HTTP-з'єднання.
+
+    Облікові дані та discovery-клієнт створюються при першому запиті
+    (або заздалегідь у фоні через warm_up), а не при імпорті модуля.
+
+    Запити проходять через SheetsScheduler, який тримає їх у межах
+    хвилинних квот Google і пропускає записи поперед читань. На 429
+    запит повторюється після Retry-After (або зростаючої паузи).
+    Поки запобіжник breaker відкритий, запити одразу завершуються
+    CircuitOpenError замість очікування таймаутів.
+    """
+
+    def __init__(self, service_account_file, spreadsheet_id, max_workers=2, timeout=10,
+                 scheduler=None, breaker=None, rate_limit_retries=5, max_rate_limit_delay=60):
+        self.spreadsheet_id = spreadsheet_id
+        self.timeout = timeout
+        self.scheduler = scheduler or SheetsScheduler(concurrency=max_workers)
+        self.breaker = breaker or CircuitBreaker('sheets')
+        self.rate_limit_retries = rate_limit_retries
+        self.max_rate_limit_delay = max_rate_limit_delay
+        self._service_account_file = service_account_file
+        self._credentials = None
+        self._spreadsheets = None
+        self._build_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sheets')
+        self._local = threading.local()
+        # Стан останніх викликів (time.monotonic) для health check
+        self.last_success = None
+        self.last_failure = None
+        self.last_error = None
+
+    def _build(self):
+        with self._build_lock:
+            if self._spreadsheets is None:
+                self._credentials = Credentials.from_service_account_file(
+                    self._service_account_file,
+                    scopes=SHEETS_SCOPES
+                )
+                service = build('sheets', 'v4', credentials=self._credentials, cache_discovery=False)
+                self._spreadsheets = service.spreadsheets()
+                logger.info("Google Sheets API підключено успішно")
+        return self._spreadsheets
+
+    @property
+    def spreadsheets(self):
+        return self._spreadsheets or self._build()
+
+    async def warm_up(self):
+        """Створює клієнт у пулі потоків, не блокуючи event loop"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._build)
+
+    def _thread_http(self):
+        """Повертає HTTP-клієнт поточного робочого потоку"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(
+                self._credentials,
+                http=httplib2.Http(timeout=self.timeout)
+            )
+            self._local.http = http
+        return http
+
+    async def _execute(self, request, quota):
+        """Виконує підготовлений запит, якщо Google Sheets не вважається недоступним"""
+        async with self.breaker.guard():
+            return await self._execute_paced(request, quota)
+
+    async def _execute_paced(self, request, quota):
+        """Виконує запит у пулі потоків, дочекавшись своєї квоти"""
+        loop = asyncio.get_running_loop()
+        # methodId виду 'sheets.spreadsheets.values.append'
+        method = getattr(request, 'methodId', '').rsplit('.', 1)[-1] or 'unknown'
+        for attempt in itertools.count():
+            async with self.scheduler.slot(quota):
+                try:
+                    with SHEETS_REQUEST_SECONDS.time(method=method):
+                        result = await loop.run_in_executor(
+                            self._executor,
+                            lambda: request.execute(http=self._thread_http())
+                        )
+                except Exception as e:
+                    delay = rate_limit_delay(e, attempt, self.max_rate_limit_delay)
+                    ERRORS_TOTAL.inc(source='sheets', category='rate_limit' if delay is not None else classify_error(e))
+                    if delay is not None and attempt < self.rate_limit_retries:
+                        logger.warning(f"Квоту Google Sheets ({quota}) вичерпано, повтор {method} через {delay:.1f} с")
+                        # Решта запитів цього класу теж перечекають паузу
+                        self.scheduler.block(quota, delay)
+                        continue
+                    self.last_failure = time.monotonic()
+                    self.last_error = str(e)
+                    raise
+            self.last_success = time.monotonic()
+            return result
+
+    @property
+    def available(self):
+        """Чи був останній виклик Sheets успішним"""
+        if self.last_success is None:
+            return False
+        return self.last_failure is None or self.last_success >= self.last_failure
+
+    async def read(self, range_name):
+        """Читає значення з діапазону, повертає список рядків"""
+        request = self.spreadsheets.values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range=range_name
+        )
+        result = await self._execute(request, QUOTA_READ)
+        return result.get('values', [])
+
+    async def read_many(self, ranges):
+        """Читає кілька діапазонів одним запитом, повертає списки рядків у тому ж порядку"""
+        request = self.spreadsheets.values().batchGet(
+            spreadsheetId=self.spreadsheet_id,
+            ranges=ranges
+        )
+        result = await self._execute(request, QUOTA_READ)
+        return [value_range.get('values', []) for value_range in result.get('valueRanges', [])]
+
+    async def append(self, range_name, values):
+        """Додає рядки в кінець таблиці"""
+        request = self.spreadsheets.values().append(
+            spreadsheetId=self.spreadsheet_id,
+            range=range_name,
+            valueInputOption='USER_ENTERED',
+            body={'values': values}
+        )
+        return await self._execute(request, QUOTA_WRITE)
+
+    async def update(self, range_name, values):
+        """Оновлює значення в діапазоні"""
+        request = self.spreadsheets.values().update(
+            spreadsheetId=self.spreadsheet_id,
+            range=range_name,
+            valueInputOption='USER_ENTERED',
+            body={'values': values}
+        )
+        return await self._execute(request, QUOTA_WRITE)
+
+    async def update_many(self, updates):
+        """Оновлює кілька діапазонів одним запитом: [(range_name, values), ...]"""
+        request = self.spreadsheets.values().batchUpdate(
+            spreadsheetId=self.spreadsheet_id,
+            body={
+                'valueInputOption': 'USER_ENTERED',
+                'data': [{'range': range_name, 'values': values} for range_name, values in updates]
+            }
+        )
+        return await self._execute(request, QUOTA_WRITE)
+
+    async def delete_rows(self, start_index, end_index, sheet_id=0):
+        """Видаляє рядки [start_index, end_index) (індекси з нуля)"""
+        requests = [{
+            'deleteDimension': {
+                'range': {
+                    'sheetId': sheet_id,
+                    'dimension': 'ROWS',
+                    'startIndex': start_index,
+                    'endIndex': end_index
+                }
+            }
+        }]
+        request = self.spreadsheets.batchUpdate(
+            spreadsheetId=self.spreadsheet_id,
+            body={'requests': requests}
+        )
+        return await self._execute(request, QUOTA_WRITE)
+
+    async def delete_row_numbers(self, row_numbers, sheet_id=0):
+        """Видаляє кілька рядків (номери з одиниці) одним запитом"""
+        # Знизу вгору, щоб видалення не зсувало ще не видалені рядки
+        requests = [{
+            'deleteDimension': {
+                'range': {
+                    'sheetId': sheet_id,
+                    'dimension': 'ROWS',
+                    'startIndex': row_number - 1,
+                    'endIndex': row_number
+                }
+            }
+        } for row_number in sorted(set(row_numbers), reverse=True)]
+        request = self.spreadsheets.batchUpdate(
+            spreadsheetId=self.spreadsheet_id,
+            body={'requests': requests}
+        )
+        return await self._execute(request, QUOTA_WRITE)
+
+    def shutdown(self):
+        """Зупиняє пул потоків"""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,381 @@
+# sheets_replicator.py - фонова реплікація журналу витрат у Google Sheets
+import asyncio
+import datetime
+import logging
+import re
+import time
+
+from circuit_breaker import CircuitOpenError
+from expense_cache import DATE_FORMAT
+from expense_store import from_timestamp, to_timestamp
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+def split_range(range_name):
+    """Розбирає "'Аркуш1'!A:E" на префікс аркуша та крайні колонки"""
+    if '!' in range_name:
+        sheet_name, columns = range_name.rsplit('!', 1)
+        prefix = f"{sheet_name}!"
+    else:
+        prefix, columns = "", range_name
+    first_column, _, last_column = columns.partition(':')
+    first_column = re.sub(r'\d+', '', first_column) or 'A'
+    last_column = re.sub(r'\d+', '', last_column) or first_column
+    return prefix, first_column, last_column
+
+
+def parse_row_number(updated_range):
+    """Витягує номер першого рядка з updatedRange відповіді append"""
+    if not updated_range:
+        return None
+    match = re.search(r'![A-Z]+(\d+)', updated_range)
+    return int(match.group(1)) if match else None
+
+
+def parse_expense_row(row, row_number):
+    """Перетворює рядок таблиці на запис витрати або повертає None"""
+    if len(row) < 3:
+        return None
+    try:
+        return {
+            'row': row_number,
+            'ts': to_timestamp(datetime.datetime.strptime(row[0], DATE_FORMAT)),
+            'category': row[1],
+            'amount': float(row[2]),
+            'user': row[3] if len(row) > 3 else "Unknown",
+            'comment': row[4] if len(row) > 4 else ""
+        }
+    except (ValueError, IndexError) as e:
+        logger.warning(f"Пропускаю невалідний запис: {row}, помилка: {e}")
+        return None
+
+
+# Ключі одночасних читань таблиці для SingleFlight
+FULL_READ = 'sheets_full_read'
+TAIL_READ = 'sheets_tail_read'
+
+
+def expense_key(expense):
+    """Поля, за якими рядок таблиці впізнається як запис журналу"""
+    return (expense['ts'], expense['amount'], expense['user'], expense['category'])
+
+
+def was_not_sent(error):
+    """Чи відомо напевно, що запит не змінив таблицю (відмова квоти чи запобіжника)"""
+    if isinstance(error, CircuitOpenError):
+        return True
+    return getattr(getattr(error, 'resp', None), 'status', None) == 429
+
+
+def sheet_values(record):
+    """Значення рядка таблиці для запису журналу"""
+    return [
+        from_timestamp(record['ts']).strftime(DATE_FORMAT),
+        record['category'],
+        record['amount'],
+        record['user'],
+        record['comment']
+    ]
+
+
+class SheetsReplicator:
+    """Дзеркалить локальний журнал (ExpenseLedger) у Google Sheets.
+
+    Зміни бота накопичуються flush_interval секунд і відправляються
+    пакетом: змінені рядки одним batchUpdate, видалені одним
+    batchUpdate, нові одним append. Раз на refresh_interval секунд
+    дочитуються рядки, дописані в таблицю вручну, а раз на
+    full_refresh_interval таблиця звіряється повністю, щоб підхопити
+    ручні виправлення та видалення. При помилці все повторюється
+    зі зростаючою паузою - незавершені зміни лишаються в журналі.
+
+    _lock серіалізує все, що залежить від нумерації рядків таблиці.
+    """
+
+    def __init__(self, gateway, ledger, cache, range_name, flush_interval=2,
+                 refresh_interval=30, full_refresh_interval=600, max_retry_delay=300):
+        self._gateway = gateway
+        self._ledger = ledger
+        self._cache = cache
+        self._range_name = range_name
+        self._prefix, self._first_column, self._last_column = split_range(range_name)
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self.full_refresh_interval = full_refresh_interval
+        self.max_retry_delay = max_retry_delay
+
+        self.last_row = ledger.last_sheet_row()  # останній прочитаний рядок таблиці (включно із заголовком)
+        self.pulled_at = None
+        self.full_pulled_at = None
+        self.last_error = None
+        self._async_lock = None
+        self._wakeup_event = None
+        self._flights = SingleFlight()
+        self._task = None
+        self._retry_delay = 0
+        # append міг записати рядки, хоч відповіді й не було (таймаут, обрив, зупинка бота);
+        # після перезапуску це теж невідомо
+        self._append_unconfirmed = True
+
+    # Реплікатор створюється при імпорті, а Python 3.9 прив'язує примітиви asyncio
+    # до event loop у момент створення - тому вони створюються вже в робочому циклі
+    @property
+    def _lock(self):
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        return self._async_lock
+
+    @property
+    def _wakeup(self):
+        if self._wakeup_event is None:
+            self._wakeup_event = asyncio.Event()
+        return self._wakeup_event
+
+    def __len__(self):
+        """Кількість записів зі змінами, яких ще немає в таблиці"""
+        return self._ledger.dirty_count()
+
+    def notify(self):
+        """Повідомляє про локальні зміни, які треба відправити"""
+        self._wakeup.set()
+
+    def pending_for(self, user):
+        """Рядки користувача, які ще не потрапили в таблицю"""
+        return [sheet_values(record) for record in self._ledger.pending_for(user)]
+
+    def _row_range(self, row_number):
+        return f"{self._prefix}{self._first_column}{row_number}:{self._last_column}{row_number}"
+
+    # === ВІДПРАВКА ЛОКАЛЬНИХ ЗМІН ===
+
+    async def push(self):
+        """Відправляє всі незавершені зміни журналу, повертає кількість записів"""
+        async with self._lock:
+            if self._append_unconfirmed:
+                await self._adopt_appended()
+            inserts, updates, deletes, discarded = self._ledger.outbox()
+            # Скасовані ще до відправки - у таблицю не потрапляють
+            if discarded:
+                self._ledger.purge(discarded)
+
+            # Після ручного видалення чи вставки рядків у таблиці номери в журналі зсуваються:
+            # перш ніж писати поверх рядка чи видаляти його, перевіряємо, що там наш запис
+            if (updates or deletes) and not await self._rows_in_place(updates + deletes):
+                logger.warning("Рядки таблиці зсунулись після ручних змін, звіряю журнал перед записом")
+                await self._reconcile()
+                inserts, updates, deletes, discarded = self._ledger.outbox()
+                if discarded:
+                    self._ledger.purge(discarded)
+
+            # Оновлення - за поточними номерами рядків, тобто до видалень
+            if updates:
+                await self._gateway.update_many([
+                    (self._row_range(record['sheet_row']), [sheet_values(record)]) for record in updates
+                ])
+                self._ledger.mark_updated([(record['id'], record['version']) for record in updates])
+
+            if deletes:
+                rows = [record['sheet_row'] for record in deletes]
+                await self._gateway.delete_row_numbers(rows)
+                self._ledger.mark_deleted(rows)
+                self.last_row -= len(rows)
+
+            if inserts:
+                self._append_unconfirmed = True
+                try:
+                    result = await self._gateway.append(self._range_name, [sheet_values(record) for record in inserts])
+                except Exception as e:
+                    self._append_unconfirmed = not was_not_sent(e)
+                    raise
+                self._append_unconfirmed = False
+                first_row = parse_row_number(result.get('updates', {}).get('updatedRange', ''))
+                if first_row is None:
+                    # Таблиця не повідомила куди записано: припускаємо кінець і звіримо при наступній синхронізації
+                    logger.warning("Відповідь append без updatedRange, таблицю буде звірено повністю")
+                    first_row = self.last_row + 1
+                    self.full_pulled_at = None
+                self._ledger.mark_inserted([(record['id'], record['version']) for record in inserts], first_row)
+                self._cache.mark_synced([record['id'] for record in inserts])
+                # Якщо перед нашими рядками хтось дописав свої, їх підхопить pull_tail
+                if first_row == self.last_row + 1:
+                    self.last_row = first_row + len(inserts) - 1
+
+        sent = len(inserts) + len(updates) + len(deletes)
+        if sent:
+            logger.info(f"Реплікація: додано {len(inserts)}, оновлено {len(updates)}, видалено {len(deletes)} рядків")
+        return sent
+
+    async def _adopt_appended(self):
+        """Прив'язує записи, які невдалий append усе ж дописав у таблицю.
+
+        Інакше повторна відправка продублювала б рядки, а звірка
+        з таблицею імпортувала б дублікати як нові витрати.
+        """
+        unsent = list(self._ledger.unsent())
+        if unsent:
+            start_row = self.last_row + 1
+            tail_range = f"{self._prefix}{self._first_column}{start_row}:{self._last_column}"
+            values = await self._gateway.read(tail_range)
+
+            known_rows = self._ledger.sheet_rows_from(start_row)
+            adopted = []
+            for row_number, row in enumerate(values, start_row):
+                expense = None if row_number in known_rows else parse_expense_row(row, row_number)
+                if expense is None:
+                    continue
+                record = next((record for record in unsent if expense_key(record) == expense_key(expense)), None)
+                if record is not None:
+                    unsent.remove(record)
+                    # Скасований чи змінений після відправки запис лишається dirty
+                    in_sync = not record['deleted'] and record['comment'] == expense['comment']
+                    self._ledger.mark_inserted([(record['id'], record['version'] if in_sync else None)], row_number)
+                    adopted.append(record['id'])
+            if adopted:
+                # Скасовані тим часом записи тепер мають рядок і підуть на видалення
+                self._cache.mark_synced(adopted)
+                logger.warning(f"Реплікація: {len(adopted)} рядків уже були в таблиці після невдалого append")
+        self._append_unconfirmed = False
+
+    async def _rows_in_place(self, records):
+        """Чи стоять записи досі у своїх рядках таблиці (за часом, сумою та користувачем)"""
+        values = await self._gateway.read_many([self._row_range(record['sheet_row']) for record in records])
+        if len(values) != len(records):
+            return False
+        for record, rows in zip(records, values):
+            expense = parse_expense_row(rows[0], record['sheet_row']) if rows else None
+            if expense is None or (
+                    (expense['ts'], expense['amount'], expense['user']) !=
+                    (record['ts'], record['amount'], record['user'])):
+                return False
+        return True
+
+    # === ЗМІНИ, ЗРОБЛЕНІ В ТАБЛИЦІ ВРУЧНУ ===
+
+    async def pull_tail(self):
+        """Дочитує лише рядки, додані після останнього відомого"""
+        # Повне читання, що вже виконується, підхопить і нові рядки
+        if self._flights.in_flight(FULL_READ):
+            return await self._flights.run(FULL_READ, self._pull_full)
+        return await self._flights.run(TAIL_READ, self._pull_tail)
+
+    async def _pull_tail(self):
+        async with self._lock:
+            start_row = self.last_row + 1
+            tail_range = f"{self._prefix}{self._first_column}{start_row}:{self._last_column}"
+            values = await self._gateway.read(tail_range)
+
+            # Рядки, які бот відправив сам, уже є в журналі
+            known_rows = self._ledger.sheet_rows_from(start_row)
+            expenses = [expense for expense in (
+                parse_expense_row(row, row_number) for row_number, row in enumerate(values, start_row)
+                if row_number not in known_rows
+            ) if expense]
+            for record_id, expense in zip(self._ledger.add_from_sheet(expenses), expenses):
+                self._cache.add_synced(record_id, expense)
+            self.last_row += len(values)
+            self.pulled_at = time.monotonic()
+
+        if expenses:
+            logger.info(f"Реплікація: дочитано {len(expenses)} нових рядків таблиці")
+        return len(expenses)
+
+    async def pull_full(self):
+        """Звіряє журнал з усією таблицею, повертає кількість змінених записів.
+
+        Одночасні виклики (запуск, фонова синхронізація, оновлення на
+        вимогу) чекають одне читання таблиці замість кількох однакових.
+        """
+        return await self._flights.run(FULL_READ, self._pull_full)
+
+    async def _pull_full(self):
+        async with self._lock:
+            return await self._reconcile()
+
+    async def _reconcile(self):
+        """Читає всю таблицю та звіряє з нею журнал (викликається під _lock)"""
+        values = await self._gateway.read(self._range_name)
+        # Пропускаємо заголовок
+        expenses = [expense for expense in (
+            parse_expense_row(row, row_number) for row_number, row in enumerate(values[1:], 2)
+        ) if expense]
+        changed = self._ledger.reconcile(expenses)
+        self.last_row = len(values)
+        self.pulled_at = self.full_pulled_at = time.monotonic()
+        if changed:
+            self._cache.load()
+            logger.info(f"Реплікація: з таблиці застосовано {changed} змін")
+        return changed
+
+    def synced_ago(self):
+        """Скільки секунд тому журнал востаннє звірявся з таблицею (None - ще не звірявся)"""
+        if self.pulled_at is None:
+            return None
+        return time.monotonic() - self.pulled_at
+
+    def _full_pull_due(self):
+        return self.full_pulled_at is None or time.monotonic() - self.full_pulled_at > self.full_refresh_interval
+
+    async def refresh(self):
+        """Читає зміни з таблиці: повна звірка, якщо вона назріла, інакше лише нові рядки"""
+        if self._full_pull_due():
+            return await self.pull_full()
+        return await self.pull_tail()
+
+    async def sync(self):
+        """Один цикл: відправка локальних змін, потім читання змін з таблиці"""
+        await self.push()
+        synced_ago = self.synced_ago()
+        if self._full_pull_due():
+            await self.pull_full()
+        elif synced_ago is None or synced_ago > self.refresh_interval:
+            await self.pull_tail()
+
+    # === ФОНОВА СИНХРОНІЗАЦІЯ ===
+
+    async def _run(self):
+        # Перша синхронізація - одразу після старту, а не через refresh_interval
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.sync()
+                self._retry_delay = 0
+                self.last_error = None
+            except CircuitOpenError as e:
+                # Таблиця недоступна: зміни чекають у журналі до пробного запиту запобіжника
+                self.last_error = str(e)
+                logger.info(f"Google Sheets недоступна, {len(self)} змін чекають у журналі")
+                await asyncio.sleep(max(e.retry_in, self.flush_interval))
+                self._wakeup.set()
+            except Exception as e:
+                self.last_error = str(e)
+                self._retry_delay = min(max(self._retry_delay * 2, self.flush_interval), self.max_retry_delay)
+                logger.warning(f"Реплікація не вдалася ({len(self)} змін очікують), повтор через {self._retry_delay} с: {e}")
+                await asyncio.sleep(self._retry_delay)
+                self._wakeup.set()
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.refresh_interval)
+                # Чекаємо інші зміни, щоб відправити їх одним запитом
+                await asyncio.sleep(self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Зупиняє фонову синхронізацію та намагається відправити залишок"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.push()
+        except Exception as e:
+            logger.error(f"Не вдалося відправити {len(self)} змін перед зупинкою (лишились у журналі): {e}")
@@ -0,0 +1,147 @@
+# sheets_scheduler.py - розподіл квот Google Sheets між запитами бота
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from metrics import SHEETS_QUEUE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Класи квот Google Sheets API (окремі ліміти на читання і запис за хвилину)
+QUOTA_READ = 'read'
+QUOTA_WRITE = 'write'
+
+# Менше значення - вища черговість: записи витрат, /undo та /ignore йдуть поперед читань
+QUOTA_PRIORITY = {QUOTA_WRITE: 0, QUOTA_READ: 1}
+
+
+class TokenBucket:
+    """Відро токенів: rate токенів за секунду, не більше capacity в запасі.
+
+    Після відповіді 429 відро «заморожується» до blocked_until,
+    щоб усі запити цього класу перечекали Retry-After разом.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """Через скільки секунд з'явиться токен (0 - вже є)"""
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def block(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class SheetsScheduler:
+    """Черга запитів до Google Sheets з урахуванням квот.
+
+    Кожен запит чекає токен свого класу квоти і вільний робочий потік.
+    Серед тих, хто чекає, першим іде запит з вищим пріоритетом класу
+    (запис перед читанням), а в межах класу - той, хто прийшов раніше.
+    Так пачка переглядів статистики не забирає квоту й потоки в запису
+    нової витрати.
+    """
+
+    def __init__(self, reads_per_minute=60, writes_per_minute=60, burst=10, concurrency=2):
+        self.concurrency = concurrency
+        self._buckets = {
+            QUOTA_READ: TokenBucket(reads_per_minute / 60, min(burst, reads_per_minute)),
+            QUOTA_WRITE: TokenBucket(writes_per_minute / 60, min(burst, writes_per_minute)),
+        }
+        self._waiting = []  # [(пріоритет, порядковий номер, клас квоти), ...]
+        self._wakeups = set()  # future тих, хто чекає зміни черги
+        self._counter = itertools.count()
+        self._active = 0
+
+    def waiting(self, quota=None):
+        """Кількість запитів у черзі (усього або для класу квоти)"""
+        return sum(1 for entry in self._waiting if quota is None or entry[2] == quota)
+
+    def block(self, quota, seconds):
+        """Призупиняє клас квоти (після 429 від Google)"""
+        self._buckets[quota].block(seconds)
+
+    def _notify(self):
+        """Будить усіх, хто чекає: черга чи зайняті слоти змінились"""
+        for wakeup in self._wakeups:
+            if not wakeup.done():
+                wakeup.set_result(None)
+
+    async def _wait_change(self, timeout):
+        """Чекає змін у черзі не довше timeout секунд (None - без обмеження).
+
+        Не asyncio.wait_for: до Python 3.12 він губить скасування, що
+        збіглося з пробудженням, і скасований запит лишався б у черзі.
+        """
+        loop = asyncio.get_running_loop()
+        wakeup = loop.create_future()
+        self._wakeups.add(wakeup)
+        timer = None
+        if timeout is not None:
+            timer = loop.call_later(timeout, lambda: wakeup.done() or wakeup.set_result(None))
+        try:
+            await wakeup
+        finally:
+            self._wakeups.discard(wakeup)
+            if timer is not None:
+                timer.cancel()
+
+    def _grant_delay(self, entry):
+        """0 - запит можна виконувати; інакше скільки чекати (None - до звільнення черги)"""
+        if self._active >= self.concurrency:
+            return None
+        bucket = self._buckets[entry[2]]
+        for other in self._waiting:
+            if other >= entry:
+                continue
+            # Попереду запит того самого класу або готовий запит вищого пріоритету
+            if other[2] == entry[2] or self._buckets[other[2]].delay() == 0:
+                return None
+        return bucket.delay()
+
+    @asynccontextmanager
+    async def slot(self, quota):
+        """Чекає своєї черги та токена квоти на час одного запиту"""
+        entry = (QUOTA_PRIORITY[quota], next(self._counter), quota)
+        started = time.monotonic()
+        # Усе в одному потоці event loop: між await стан черги ніхто не змінює
+        self._waiting.append(entry)
+        try:
+            while True:
+                delay = self._grant_delay(entry)
+                if delay == 0:
+                    break
+                await self._wait_change(delay)
+            self._buckets[quota].take()
+            self._active += 1
+        finally:
+            self._waiting.remove(entry)
+            self._notify()
+        SHEETS_QUEUE_SECONDS.observe(time.monotonic() - started, quota=quota)
+
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._notify()
@@ -0,0 +1,43 @@
+# single_flight.py - об'єднання одночасних однакових запитів в один
+import asyncio
+import logging
+
+from metrics import SINGLE_FLIGHT_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Виконує не більше одного запиту на ключ одночасно.
+
+    Хто прийшов, поки запит з тим самим ключем ще виконується, не
+    запускає новий, а чекає на вже запущений і отримує той самий
+    результат (або ту саму помилку). Скасування одного з тих, хто
+    чекає, не перериває запит для інших.
+    """
+
+    def __init__(self):
+        self._inflight = {}  # ключ -> asyncio.Task
+
+    def in_flight(self, key):
+        return key in self._inflight
+
+    async def run(self, key, factory):
+        """Повертає результат factory() - нового або вже запущеного виклику"""
+        task = self._inflight.get(key)
+        if task is not None:
+            SINGLE_FLIGHT_TOTAL.inc(key=key, result='shared')
+            return await asyncio.shield(task)
+
+        SINGLE_FLIGHT_TOTAL.inc(key=key, result='leader')
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Помилку вже отримали ті, хто чекав; якщо всіх скасовано - не лишаємо її «неотриманою»
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Запит {key} завершився помилкою: {task.exception()}")
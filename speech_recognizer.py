@@ -0,0 +1,352 @@
+# speech_recognizer.py - неблокуюче розпізнавання мовлення (Google або локальний Vosk)
+import asyncio
+import json
+import logging
+import re
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from google.api_core.exceptions import InvalidArgument
+from google.cloud import speech
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 16 * 1024  # обмеження Speech-to-Text на один потоковий запит - 25 КБ
+MAX_SPEECH_PHRASES = 5000  # обмеження Speech-to-Text на кількість фраз-підказок
+
+# Формати аудіо, які передає бот
+ENCODING_OGG_OPUS = 'ogg_opus'
+ENCODING_LINEAR16 = 'linear16'
+
+# Числівники, якими локальна модель записує суми
+UKRAINIAN_NUMBERS = {
+    'нуль': 0, 'один': 1, 'одна': 1, 'одне': 1, 'два': 2, 'дві': 2, 'три': 3,
+    'чотири': 4, "п'ять": 5, 'шість': 6, 'сім': 7, 'вісім': 8, "дев'ять": 9,
+    'десять': 10, 'одинадцять': 11, 'дванадцять': 12, 'тринадцять': 13,
+    'чотирнадцять': 14, "п'ятнадцять": 15, 'шістнадцять': 16, 'сімнадцять': 17,
+    'вісімнадцять': 18, "дев'ятнадцять": 19, 'двадцять': 20, 'тридцять': 30,
+    'сорок': 40, "п'ятдесят": 50, 'шістдесят': 60, 'сімдесят': 70,
+    'вісімдесят': 80, "дев'яносто": 90, 'сто': 100, 'двісті': 200,
+    'триста': 300, 'чотириста': 400, "п'ятсот": 500, 'шістсот': 600,
+    'сімсот': 700, 'вісімсот': 800, "дев'ятсот": 900
+}
+THOUSAND_WORDS = ('тисяча', 'тисячі', 'тисяч')
+NUMBER_WORDS = list(UKRAINIAN_NUMBERS) + list(THOUSAND_WORDS)
+
+
+APOSTROPHES = re.compile(r"[’‘ʼ`′]")
+TRAILING_PUNCTUATION = ".,!?;:"
+
+
+def number_slot(value):
+    """Розряд числівника: 3 - сотні, 2 - десятки, 1 - одиниці, 0 - «-надцять» і нуль"""
+    if value >= 100:
+        return 3
+    if value >= 20:
+        return 2
+    if 1 <= value <= 9:
+        return 1
+    return 0
+
+
+def numbers_to_digits(text):
+    """Замінює числівники цифрами: «кава сорок п'ять» -> «кава 45».
+
+    Слово продовжує число, лише якщо займає молодший розряд («сто сорок
+    п'ять», «дві тисячі триста»). Числівники, просто названі поспіль
+    («два три»), лишаються окремими числами.
+    """
+    result = []
+    thousands = group = None  # None - розряд тисяч / поточна група ще порожні
+    slot = 4  # наймолодший зайнятий розряд групи; 4 - вільні всі
+
+    def flush():
+        nonlocal thousands, group, slot
+        if thousands is not None or group is not None:
+            result.append(str((thousands or 0) * 1000 + (group or 0)))
+        thousands = group = None
+        slot = 4
+
+    for word in APOSTROPHES.sub("'", text).split():
+        core = word.rstrip(TRAILING_PUNCTUATION)
+        lowered = core.lower()
+
+        if lowered in THOUSAND_WORDS:
+            if group == 0:
+                flush()
+            elif thousands is not None:
+                # «тисяча три тисячі» - це вже друге число
+                result.append(str(thousands * 1000))
+            thousands, group, slot = group or 1, None, 4
+        elif lowered in UKRAINIAN_NUMBERS:
+            value = UKRAINIAN_NUMBERS[lowered]
+            new_slot = number_slot(value)
+            # «-надцять» займає і десятки, і одиниці; нуль - лише окреме число
+            fits = new_slot < slot and not (new_slot == 0 and slot < 3)
+            if not fits or (value == 0 and (group is not None or thousands is not None)):
+                flush()
+            group = (group or 0) + value
+            slot = new_slot
+        else:
+            flush()
+            result.append(word)
+            continue
+
+        if core != word:
+            # Кома чи крапка після числівника завершує число
+            flush()
+            result[-1] += word[len(core):]
+
+    flush()
+    return " ".join(result)
+
+
+class UnsupportedAudioError(Exception):
+    """Рушій не прийняв аудіо в цьому форматі (потрібна конвертація)"""
+
+
+class SpeechRecognizer(ABC):
+    """Спільний інтерфейс рушіїв розпізнавання.
+
+    accepts_opus - чи приймає рушій OGG/Opus без конвертації,
+    supports_streaming - чи має рушій також
+    recognize_stream(chunks, encoding, sample_rate, phrases) для
+    розпізнавання під час завантаження (лише тоді його можна викликати).
+    """
+
+    accepts_opus = False
+    supports_streaming = False
+
+    @abstractmethod
+    async def recognize(self, content, encoding, sample_rate, phrases=None):
+        """Розпізнає аудіо цілком, повертає (текст, впевненість) або None"""
+
+    async def close(self):
+        pass
+
+
+class TranscriptCache:
+    """LRU-кеш результатів розпізнавання.
+
+    Один результат зберігається під кількома ключами: file_unique_id
+    Telegram (пересилання того самого голосового) та sha256 вмісту
+    (той самий звук, завантажений повторно).
+    """
+
+    def __init__(self, max_size=200):
+        self.max_size = max_size
+        self._items = OrderedDict()  # ключ -> (текст, впевненість)
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        if not key:
+            return None
+        result = self._items.get(key)
+        if result is not None:
+            self._items.move_to_end(key)
+        return result
+
+    def put(self, result, *keys):
+        for key in keys:
+            if not key:
+                continue
+            self._items[key] = result
+            self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+class GoogleSpeechRecognizer(SpeechRecognizer):
+    """Розпізнавання через Google Speech-to-Text на асинхронному gRPC-клієнті.
+
+    Клієнт створюється при першому запиті (всередині event loop бота),
+    тож запуск не чекає на підключення до Speech API, а виклики
+    recognize не блокують обробку інших оновлень.
+    """
+
+    accepts_opus = True
+    supports_streaming = True
+
+    _ENCODINGS = {
+        ENCODING_OGG_OPUS: speech.RecognitionConfig.AudioEncoding.OGG_OPUS,
+        ENCODING_LINEAR16: speech.RecognitionConfig.AudioEncoding.LINEAR16
+    }
+
+    def __init__(self, service_account_file, language_code, hint_boost=10.0):
+        self._service_account_file = service_account_file
+        self.language_code = language_code
+        self.hint_boost = hint_boost
+        self._client = None
+        # Підказки перебудовуються лише коли бот передає новий набір фраз
+        self._hints_source = None
+        self._speech_contexts = []
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = speech.SpeechAsyncClient.from_service_account_file(self._service_account_file)
+            logger.info("Google Speech-to-Text API підключено успішно")
+        return self._client
+
+    def speech_contexts(self, phrases):
+        """Фрази-підказки (категорії, числівники) у форматі Speech-to-Text"""
+        if not phrases:
+            return []
+        if phrases is not self._hints_source:
+            self._speech_contexts = [speech.SpeechContext(
+                phrases=list(phrases)[:MAX_SPEECH_PHRASES],
+                boost=self.hint_boost
+            )]
+            self._hints_source = phrases
+        return self._speech_contexts
+
+    def build_config(self, encoding, sample_rate, phrases=None):
+        """Налаштування розпізнавання для заданого формату аудіо"""
+        return speech.RecognitionConfig(
+            encoding=self._ENCODINGS[encoding],
+            sample_rate_hertz=sample_rate,
+            language_code=self.language_code,
+            enable_automatic_punctuation=True,
+            enable_word_time_offsets=False,
+            speech_contexts=self.speech_contexts(phrases)
+        )
+
+    async def recognize(self, content, encoding, sample_rate, phrases=None):
+        """Розпізнає аудіо цілком, повертає (текст, впевненість) або None"""
+        try:
+            response = await self.client.recognize(
+                config=self.build_config(encoding, sample_rate, phrases),
+                audio=speech.RecognitionAudio(content=bytes(content))
+            )
+        except InvalidArgument as e:
+            raise UnsupportedAudioError(str(e)) from e
+        if not response.results:
+            return None
+        alternative = response.results[0].alternatives[0]
+        # Підказки-числівники можуть дати суму словами
+        return numbers_to_digits(alternative.transcript), alternative.confidence
+
+    async def recognize_stream(self, chunks, encoding, sample_rate, phrases=None):
+        """Потокове розпізнавання: аудіо подається частинами, поки ще завантажується.
+
+        chunks - асинхронний ітератор байтів; повертає (текст, впевненість) або None.
+        """
+        streaming_config = speech.StreamingRecognitionConfig(
+            config=self.build_config(encoding, sample_rate, phrases),
+            single_utterance=False,
+            interim_results=False
+        )
+
+        async def requests():
+            yield speech.StreamingRecognizeRequest(streaming_config=streaming_config)
+            async for chunk in chunks:
+                for start in range(0, len(chunk), STREAM_CHUNK_SIZE):
+                    yield speech.StreamingRecognizeRequest(audio_content=chunk[start:start + STREAM_CHUNK_SIZE])
+
+        transcripts = []
+        confidence = None
+        try:
+            stream = await self.client.streaming_recognize(requests=requests())
+            async for response in stream:
+                for result in response.results:
+                    if not result.is_final or not result.alternatives:
+                        continue
+                    alternative = result.alternatives[0]
+                    transcripts.append(alternative.transcript.strip())
+                    if confidence is None:
+                        confidence = alternative.confidence
+        except InvalidArgument as e:
+            raise UnsupportedAudioError(str(e)) from e
+
+        if not transcripts:
+            return None
+        return numbers_to_digits(" ".join(transcripts)), confidence or 0.0
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.transport.close()
+            self._client = None
+
+
+class VoskSpeechRecognizer(SpeechRecognizer):
+    """Локальне розпізнавання моделлю Vosk на CPU, без мережі.
+
+    Приймає лише 16-бітний PCM (моно), тож бот спершу конвертує
+    голосове через FFmpeg. Модель завантажується при першому запиті,
+    а розпізнавання виконується в окремому потоці. Якщо передано
+    phrases (категорії та числівники), розпізнавання обмежується
+    граматикою з цих слів, а решта слів відкидається як [unk].
+    """
+
+    def __init__(self, model_path, use_grammar=True):
+        self.model_path = model_path
+        self.use_grammar = use_grammar
+        self._vosk = None
+        self._model = None
+        self._grammar_source = None
+        self._grammar = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vosk')
+
+    def _load_model(self):
+        if self._model is None:
+            try:
+                import vosk
+            except ImportError as e:
+                raise RuntimeError("Для SPEECH_ENGINE=vosk встановіть пакет vosk") from e
+            vosk.SetLogLevel(-1)
+            self._vosk = vosk
+            self._model = vosk.Model(self.model_path)
+            logger.info(f"Модель Vosk завантажено: {self.model_path}")
+        return self._model
+
+    def _grammar_for(self, phrases):
+        if phrases is not self._grammar_source:
+            # Словник моделі в нижньому регістрі
+            words = sorted({phrase.lower() for phrase in phrases})
+            self._grammar = json.dumps(words + ['[unk]'], ensure_ascii=False)
+            self._grammar_source = phrases
+        return self._grammar
+
+    def _recognize_sync(self, content, sample_rate, phrases):
+        model = self._load_model()
+        if self.use_grammar and phrases:
+            recognizer = self._vosk.KaldiRecognizer(model, sample_rate, self._grammar_for(phrases))
+        else:
+            recognizer = self._vosk.KaldiRecognizer(model, sample_rate)
+        recognizer.SetWords(True)
+
+        content = bytes(content)
+        for start in range(0, len(content), STREAM_CHUNK_SIZE):
+            recognizer.AcceptWaveform(content[start:start + STREAM_CHUNK_SIZE])
+        result = json.loads(recognizer.FinalResult())
+
+        words = [word for word in result.get('result', []) if word.get('word') != '[unk]']
+        text = " ".join(word['word'] for word in words).strip()
+        if not text:
+            return None
+        confidence = sum(word.get('conf', 0.0) for word in words) / len(words)
+        return numbers_to_digits(text), confidence
+
+    async def recognize(self, content, encoding, sample_rate, phrases=None):
+        if encoding != ENCODING_LINEAR16:
+            raise UnsupportedAudioError(f"Vosk приймає лише PCM, отримано {encoding}")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._recognize_sync, content, sample_rate, phrases
+        )
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def create_recognizer(engine, service_account_file=None, language_code='uk-UA',
+                      vosk_model_path=None, vosk_use_grammar=True, hint_boost=10.0):
+    """Створює рушій розпізнавання за назвою з конфігурації"""
+    if engine == 'google':
+        return GoogleSpeechRecognizer(service_account_file, language_code, hint_boost=hint_boost)
+    if engine == 'vosk':
+        return VoskSpeechRecognizer(vosk_model_path, use_grammar=vosk_use_grammar)
+    raise ValueError(f"Невідомий рушій розпізнавання: {engine}")
@@ -0,0 +1,47 @@
+# startup_timing.py - вимірювання етапів холодного старту
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PROCESS_STARTED = time.perf_counter()
+
+
+class StartupTimer:
+    """Засікає тривалість етапів запуску.
+
+    Етапи можуть виконуватись паралельно, тому для кожного зберігається
+    і зсув від старту процесу, і власна тривалість.
+    """
+
+    def __init__(self, started=PROCESS_STARTED):
+        self.started = started
+        self.phases = []  # (назва, зсув від старту, тривалість, успіх)
+        self.ready_at = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            self.phases.append((name, start - self.started, time.perf_counter() - start, succeeded))
+
+    def mark_ready(self):
+        self.ready_at = time.perf_counter() - self.started
+
+    def report(self):
+        lines = ["⏱️ Звіт про запуск:"]
+        for name, offset, duration, succeeded in sorted(self.phases, key=lambda phase: phase[1]):
+            status = "✅" if succeeded else "❌"
+            lines.append(f"  {status} {name}: {duration:.2f} с (початок на {offset:.2f} с)")
+        if self.ready_at is not None:
+            lines.append(f"  🎯 Готовий до роботи через {self.ready_at:.2f} с від старту процесу")
+        logger.info("\n".join(lines))
+
+
+# Спільний таймер для run.py та finedot_bot.py
+startup_timer = StartupTimer()
@@ -0,0 +1,159 @@
+# Запобіжник зовнішніх сервісів: переходи станів і класифікація збоїв
+import asyncio
+import unittest
+from unittest import mock
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, is_outage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class HttpError(Exception):
+    """Як googleapiclient.errors.HttpError: статус у resp.status"""
+
+    def __init__(self, status):
+        super().__init__(f"<HttpError {status}>")
+        self.resp = type('Response', (), {'status': status})()
+
+
+class ApiError(Exception):
+    """Як винятки google.api_core: статус у code"""
+
+    def __init__(self, code):
+        super().__init__(f"{code} error")
+        self.code = code
+
+
+class IsOutageTest(unittest.TestCase):
+
+    def test_classification(self):
+        cases = [
+            (asyncio.TimeoutError(), True),
+            (TimeoutError(), True),
+            (ConnectionResetError(), True),
+            (HttpError(429), True),
+            (HttpError(503), True),
+            (HttpError(400), False),
+            (HttpError(404), False),
+            (ApiError(500), True),
+            (ApiError(400), False),
+            (Exception("Timed out"), True),
+            (Exception("Network is unreachable"), True),
+            (Exception("Too Many Requests: retry after 5"), True),
+            (Exception("Bad Request: message is not modified"), False),
+            (ValueError("bad amount"), False),
+        ]
+        for error, expected in cases:
+            with self.subTest(error=repr(error)):
+                self.assertIs(is_outage(error), expected)
+
+
+class CircuitBreakerTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('circuit_breaker.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=30)
+
+    async def call(self, error=None):
+        async with self.breaker.guard():
+            if error is not None:
+                raise error
+
+    async def fail(self, times=1):
+        for _ in range(times):
+            with self.assertRaises(TimeoutError):
+                await self.call(TimeoutError())
+
+    async def test_opens_after_threshold_consecutive_failures(self):
+        await self.fail(2)
+        self.assertEqual(self.breaker.state, CLOSED)
+        await self.fail()
+        self.assertEqual(self.breaker.state, OPEN)
+
+        with self.assertRaises(CircuitOpenError) as raised:
+            await self.call()
+        self.assertEqual(raised.exception.retry_in, 30)
+
+    async def test_success_resets_failure_count(self):
+        await self.fail(2)
+        await self.call()
+        await self.fail(2)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    async def test_request_errors_do_not_count_as_failures(self):
+        for _ in range(5):
+            with self.assertRaises(HttpError):
+                await self.call(HttpError(400))
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.failures, 0)
+
+    async def test_half_open_probe_success_closes(self):
+        await self.fail(3)
+        self.clock.now += 30
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertEqual(self.breaker.retry_in(), 0)
+
+        await self.call()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.status()['failures'], 0)
+        self.assertIsNone(self.breaker.last_error)
+
+    async def test_failed_probe_reopens(self):
+        await self.fail(3)
+        self.clock.now += 30
+        await self.fail()
+
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.retry_in(), 30)
+        self.assertEqual(self.breaker.last_error, "TimeoutError")
+
+    async def test_only_one_probe_at_a_time(self):
+        await self.fail(3)
+        self.clock.now += 30
+        release = asyncio.Event()
+
+        async def probe():
+            async with self.breaker.guard():
+                await release.wait()
+
+        probing = asyncio.ensure_future(probe())
+        await asyncio.sleep(0)
+        with self.assertRaises(CircuitOpenError):
+            await self.call()
+
+        release.set()
+        await probing
+        self.assertEqual(self.breaker.state, CLOSED)
+        await self.call()
+
+    async def test_cancelled_probe_allows_next_probe(self):
+        await self.fail(3)
+        self.clock.now += 30
+
+        async def probe():
+            async with self.breaker.guard():
+                await asyncio.Event().wait()
+
+        probing = asyncio.ensure_future(probe())
+        await asyncio.sleep(0)
+        probing.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await probing
+
+        # Скасування - не збій сервісу: наступний запит знову пробний
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        await self.call()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+# Об'єкти, які бот створює при імпорті, ще до запуску event loop.
+# Python 3.9 (образ Docker) прив'язує Lock/Event/Semaphore до циклу
+# в момент створення, тому вони мають з'являтися лише при першому використанні.
+import asyncio
+import importlib.util
+import os
+import tempfile
+import unittest
+
+from expense_cache import ExpenseCache
+from ledger_db import ExpenseLedger
+from sheets_replicator import SheetsReplicator
+
+
+class SheetsReplicatorLoopTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ledger = ExpenseLedger(os.path.join(self.tmp.name, 'expenses.db'))
+
+    def tearDown(self):
+        self.ledger.close()
+        self.tmp.cleanup()
+
+    def test_lock_and_wakeup_created_inside_running_loop(self):
+        replicator = SheetsReplicator(None, self.ledger, ExpenseCache(self.ledger), "'Аркуш1'!A:E")
+        self.assertIsNone(replicator._async_lock)
+        self.assertIsNone(replicator._wakeup_event)
+
+        async def main():
+            woken = asyncio.ensure_future(replicator._wakeup.wait())
+            async with replicator._lock:
+                contender = asyncio.ensure_future(replicator._lock.acquire())
+                await asyncio.sleep(0)
+                replicator.notify()
+            await asyncio.wait_for(asyncio.gather(woken, contender), 1)
+            replicator._lock.release()
+
+        asyncio.run(main())
+
+
+@unittest.skipUnless(importlib.util.find_spec('aiohttp'), "потрібен aiohttp з requirements.txt")
+class VoiceSchedulerLoopTest(unittest.TestCase):
+
+    def test_semaphore_created_inside_running_loop(self):
+        from voice_processing import VoiceScheduler
+
+        scheduler = VoiceScheduler(max_concurrent=1, max_queue=2)
+        self.assertIsNone(scheduler._async_semaphore)
+
+        async def main():
+            finished = []
+
+            async def job(number):
+                async with scheduler.slot():
+                    await asyncio.sleep(0.01)
+                    finished.append(number)
+
+            await asyncio.gather(job(1), job(2), job(3))
+            return finished
+
+        self.assertEqual(asyncio.run(main()), [1, 2, 3])
+        self.assertEqual((scheduler.active, scheduler.waiting), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
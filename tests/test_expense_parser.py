@@ -0,0 +1,63 @@
+# Розбір текстових витрат і пакетного запису
+import unittest
+
+from expense_parser import bulk_expense_lines, parse_bulk_lines, parse_expense_text, split_bulk_lines
+
+
+class ParseExpenseTextTest(unittest.TestCase):
+
+    def test_examples(self):
+        cases = [
+            ("Кава 50", ("Кава", 50.0, "")),
+            ("продукти 250,50 АТБ", ("Продукти", 250.5, "АТБ")),
+            ("Обіди на роботі 120", ("Обіди на Роботі", 120.0, "")),
+            ("дуже довга назва категорії 10 кінець", ("Дуже Довга Назва", 10.0, "категорії кінець")),
+            ("50 кава", (None, None, None)),
+            ("Кава 0", (None, None, None)),
+            ("просто текст", (None, None, None)),
+        ]
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(parse_expense_text(text), expected)
+
+
+class BulkLinesTest(unittest.TestCase):
+
+    def test_list_markers_are_stripped(self):
+        text = "- Кава 50\n• Таксі 120\n* Хліб 30\n1. Сир 80\n2) Молоко 40\n  3.  Яйця 60"
+        self.assertEqual(split_bulk_lines(text), [
+            "Кава 50", "Таксі 120", "Хліб 30", "Сир 80", "Молоко 40", "Яйця 60"
+        ])
+
+    def test_amount_is_not_mistaken_for_list_number(self):
+        # "2 кави" - не маркер списку (немає крапки чи дужки)
+        self.assertEqual(split_bulk_lines("2 кави 100\n10.5 Таксі"), ["2 кави 100", "10.5 Таксі"])
+
+    def test_blank_lines_are_skipped(self):
+        self.assertEqual(split_bulk_lines("Кава 50\n\n   \nТаксі 120\n"), ["Кава 50", "Таксі 120"])
+
+    def test_single_expense_with_comment_line_is_not_bulk(self):
+        self.assertIsNone(bulk_expense_lines("Кава 50\nз колегами після зустрічі"))
+        self.assertIsNone(bulk_expense_lines("Кава 50"))
+
+    def test_numbered_lines_without_amounts_are_not_bulk(self):
+        self.assertIsNone(bulk_expense_lines("1. Кава\n2. Таксі 120"))
+
+    def test_two_expenses_make_a_bulk_entry(self):
+        self.assertEqual(
+            bulk_expense_lines("1. Кава 50\nзабув коментар\n2. Таксі 120"),
+            ["Кава 50", "забув коментар", "Таксі 120"]
+        )
+
+    def test_mixed_valid_and_invalid_lines(self):
+        lines = bulk_expense_lines("- Кава 50 лате\n- щось незрозуміле\n- Таксі 0\n- Хліб 30")
+        self.assertEqual(parse_bulk_lines(lines), [
+            ("Кава 50 лате", ("Кава", 50.0, "лате")),
+            ("щось незрозуміле", None),
+            ("Таксі 0", None),
+            ("Хліб 30", ("Хліб", 30.0, "")),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+# Пошук записів колонкового сховища за ідентифікатором
+import unittest
+
+from expense_store import ExpenseStore
+
+
+class PositionOfIdTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = ExpenseStore()
+        self.first = self.store.append(100, "Їжа", 10.0, "a", "", False)
+        self.second = self.store.append(300, "Кава", 20.0, "b", "", False)
+        # Запис з минулого стає між ними, а ще один - у ту саму секунду
+        self.older = self.store.append(200, "Авто", 30.0, "a", "", True)
+        self.same_second = self.store.append(200, "Таксі", 40.0, "b", "", True)
+
+    def test_finds_records_inserted_out_of_order(self):
+        positions = [self.store.position_of_id(record_id)
+                     for record_id in (self.first, self.older, self.same_second, self.second)]
+        self.assertEqual(positions, [0, 1, 2, 3])
+        self.assertIsNone(self.store.position_of_id(999))
+
+    def test_positions_follow_removal(self):
+        self.store.remove(self.store.position_of_id(self.older))
+
+        self.assertIsNone(self.store.position_of_id(self.older))
+        self.assertEqual(self.store.record(self.store.position_of_id(self.same_second))['category'], "Таксі")
+        self.assertEqual(self.store.position_of_id(self.second), 2)
+
+    def test_pending_flag_in_record(self):
+        self.assertTrue(self.store.record(self.store.position_of_id(self.older))['is_pending'])
+        self.assertFalse(self.store.record(self.store.position_of_id(self.first))['is_pending'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+# Перетворення числівників з розпізнаного мовлення на цифри
+import importlib.util
+import unittest
+
+HAS_SPEECH = all(importlib.util.find_spec(name) for name in ('google', 'google.cloud', 'google.cloud.speech'))
+
+
+@unittest.skipUnless(HAS_SPEECH, "потрібен google-cloud-speech з requirements.txt")
+class NumbersToDigitsTest(unittest.TestCase):
+
+    def test_examples(self):
+        from speech_recognizer import numbers_to_digits
+
+        cases = [
+            ("кава сорок п'ять", "кава 45"),
+            ("продукти триста сорок п'ять", "продукти 345"),
+            ("таксі сто дванадцять", "таксі 112"),
+            ("оренда тисяча", "оренда 1000"),
+            ("оренда тисяча двісті", "оренда 1200"),
+            ("ремонт дві тисячі триста", "ремонт 2300"),
+            ("ноутбук двадцять п'ять тисяч сімсот сорок", "ноутбук 25740"),
+            ("кава п’ять", "кава 5"),
+            ("кава пʼять", "кава 5"),
+            ("кава п`ять", "кава 5"),
+            ("Кава Сорок П'ять", "Кава 45"),
+            ("два три", "2 3"),
+            ("сорок п'ять десять", "45 10"),
+            ("двадцять тридцять", "20 30"),
+            ("сто двісті", "100 200"),
+            ("дванадцять три", "12 3"),
+            ("тисяча тисяча", "1000 1000"),
+            ("тисяча три тисячі", "1000 3000"),
+            ("нуль п'ять", "0 5"),
+            ("кава сорок, таксі сто", "кава 40, таксі 100"),
+            ("просто текст", "просто текст"),
+        ]
+        for text, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(numbers_to_digits(text), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
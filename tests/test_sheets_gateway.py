@@ -0,0 +1,89 @@
+# Повтори запитів Google Sheets після відповіді 429
+import asyncio
+import importlib.util
+import unittest
+
+from circuit_breaker import CircuitBreaker
+from sheets_scheduler import QUOTA_READ, QUOTA_WRITE, SheetsScheduler
+
+HAS_GOOGLE = all(importlib.util.find_spec(name) for name in ('httplib2', 'google_auth_httplib2', 'googleapiclient'))
+
+
+class Response(dict):
+    """Відповідь httplib2: статус і заголовки"""
+
+    def __init__(self, status, **headers):
+        super().__init__(headers)
+        self.status = status
+
+
+class HttpError(Exception):
+    def __init__(self, status, **headers):
+        super().__init__(f"<HttpError {status}>")
+        self.resp = Response(status, **headers)
+
+
+class FakeRequest:
+    """Підготовлений запит googleapiclient: спершу кидає помилки з errors, потім повертає result"""
+
+    methodId = 'sheets.spreadsheets.values.append'
+
+    def __init__(self, errors=(), result=None):
+        self.errors = list(errors)
+        self.result = result
+        self.calls = 0
+
+    def execute(self, http=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+
+@unittest.skipUnless(HAS_GOOGLE, "потрібні бібліотеки Google API з requirements.txt")
+class RateLimitRetryTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        from sheets_gateway import SheetsGateway
+        self.scheduler = SheetsScheduler(reads_per_minute=6000, writes_per_minute=6000)
+        self.gateway = SheetsGateway(
+            'unused.json', 'sheet-id', scheduler=self.scheduler,
+            breaker=CircuitBreaker('test'), rate_limit_retries=2, max_rate_limit_delay=0.05
+        )
+        self.gateway._thread_http = lambda: None
+
+    def tearDown(self):
+        self.gateway._executor.shutdown(wait=False)
+
+    async def test_retry_after_blocks_quota_class_and_retries(self):
+        request = FakeRequest([HttpError(429, **{'retry-after': '0.05'})], result={'ok': True})
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        self.assertEqual(await self.gateway._execute(request, QUOTA_WRITE), {'ok': True})
+
+        self.assertEqual(request.calls, 2)
+        self.assertGreaterEqual(loop.time() - started, 0.04)
+        self.assertGreater(self.scheduler._buckets[QUOTA_WRITE].blocked_until, 0)
+        self.assertEqual(self.scheduler._buckets[QUOTA_READ].blocked_until, 0)
+        self.assertTrue(self.gateway.available)
+
+    async def test_gives_up_after_rate_limit_retries(self):
+        request = FakeRequest([HttpError(429, **{'retry-after': '0'}) for _ in range(3)])
+
+        with self.assertRaises(HttpError):
+            await self.gateway._execute(request, QUOTA_READ)
+        self.assertEqual(request.calls, 3)
+        self.assertFalse(self.gateway.available)
+
+    async def test_other_errors_are_not_retried(self):
+        request = FakeRequest([HttpError(400)])
+
+        with self.assertRaises(HttpError):
+            await self.gateway._execute(request, QUOTA_WRITE)
+        self.assertEqual(request.calls, 1)
+        self.assertEqual(self.scheduler._buckets[QUOTA_WRITE].blocked_until, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+# Тести реплікації журналу витрат у Google Sheets з ручними змінами таблиці
+import asyncio
+import os
+import re
+import tempfile
+import unittest
+
+from expense_cache import ExpenseCache
+from ledger_db import ExpenseLedger
+from sheets_replicator import SheetsReplicator
+
+HEADER = ["Дата", "Категорія", "Сума", "Користувач", "Коментар"]
+RANGE_NAME = "'Аркуш1'!A:E"
+
+
+class FakeSheet:
+    """Таблиця в пам'яті з тими самими методами, що й SheetsGateway"""
+
+    def __init__(self, rows=()):
+        self.rows = [list(HEADER)] + [list(row) for row in rows]
+
+    @staticmethod
+    def _first_row(range_name):
+        match = re.search(r'![A-Z]+(\d+)', range_name)
+        return int(match.group(1)) if match else 1
+
+    async def read(self, range_name):
+        return [list(row) for row in self.rows[self._first_row(range_name) - 1:]]
+
+    async def read_many(self, ranges):
+        result = []
+        for range_name in ranges:
+            row_number = self._first_row(range_name)
+            result.append([list(self.rows[row_number - 1])] if row_number <= len(self.rows) else [])
+        return result
+
+    async def append(self, range_name, values):
+        start = len(self.rows) + 1
+        self.rows.extend([str(value) for value in row] for row in values)
+        return {'updates': {'updatedRange': f"'Аркуш1'!A{start}:E{len(self.rows)}"}}
+
+    async def update_many(self, updates):
+        for range_name, values in updates:
+            self.rows[self._first_row(range_name) - 1] = [str(value) for value in values[0]]
+        return {}
+
+    async def delete_row_numbers(self, row_numbers, sheet_id=0):
+        for row_number in sorted(set(row_numbers), reverse=True):
+            del self.rows[row_number - 1]
+        return {}
+
+    def data(self):
+        """Рядки без заголовка: (категорія, сума, користувач, коментар)"""
+        return [(row[1], float(row[2]), row[3], row[4]) for row in self.rows[1:]]
+
+
+class ReplicatorTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ledger = ExpenseLedger(os.path.join(self.tmp.name, 'expenses.db'))
+        self.cache = ExpenseCache(self.ledger)
+        self.cache.load()
+        self.sheet = FakeSheet()
+        self.replicator = SheetsReplicator(self.sheet, self.ledger, self.cache, RANGE_NAME)
+
+    def tearDown(self):
+        self.ledger.close()
+        self.tmp.cleanup()
+
+    async def add(self, category, amount, user, minute):
+        record_id = self.cache.add(f"2024-05-01 10:{minute:02d}:00", category, amount, user, "")
+        await self.replicator.push()
+        return record_id
+
+    def ledger_data(self):
+        return sorted(
+            (row['sheet_row'], row['category'], row['amount'], row['user'])
+            for row in self.ledger.records()
+        )
+
+
+class PushTest(ReplicatorTestCase):
+
+    async def test_push_appends_pending_records_in_one_request(self):
+        self.cache.add_many([
+            ("2024-05-01 10:00:00", "Їжа", 100, "a", ""),
+            ("2024-05-01 10:01:00", "Кава", 50, "b", "латте"),
+        ])
+        self.assertEqual(await self.replicator.push(), 2)
+
+        self.assertEqual(self.sheet.data(), [("Їжа", 100.0, "a", ""), ("Кава", 50.0, "b", "латте")])
+        self.assertEqual(self.ledger.dirty_count(), 0)
+        self.assertEqual(self.ledger_data(), [(2, "Їжа", 100.0, "a"), (3, "Кава", 50.0, "b")])
+
+    async def test_undo_before_push_never_reaches_sheet(self):
+        record_id = self.cache.add("2024-05-01 10:00:00", "Їжа", 100, "a", "")
+        self.cache.remove(record_id)
+
+        self.assertEqual(await self.replicator.push(), 0)
+        self.assertEqual(self.sheet.data(), [])
+        self.assertEqual(self.ledger.records(), [])
+
+    async def test_undo_after_manual_delete_above_removes_own_row(self):
+        await self.add("Їжа", 100, "a", 0)
+        mine = await self.add("Кава", 50, "a", 1)
+        # Хтось вручну видалив перший рядок і дописав свій
+        del self.sheet.rows[1]
+        self.sheet.rows.append(["2024-05-01 10:02:00", "Авто", "999", "b", ""])
+
+        self.cache.remove(mine)
+        await self.replicator.push()
+
+        self.assertEqual(self.sheet.data(), [("Авто", 999.0, "b", "")])
+        await self.replicator.pull_full()
+        self.assertEqual(self.ledger_data(), [(2, "Авто", 999.0, "b")])
+
+    async def test_ignore_after_manual_delete_above_updates_own_row(self):
+        await self.add("Їжа", 100, "a", 0)
+        await self.add("Кава", 50, "b", 1)
+        mine = await self.add("Таксі", 200, "a", 2)
+        del self.sheet.rows[1]
+
+        self.cache.set_comment(mine, "[IGNORED] тест")
+        await self.replicator.push()
+
+        self.assertEqual(self.sheet.data(), [("Кава", 50.0, "b", ""), ("Таксі", 200.0, "a", "[IGNORED] тест")])
+        self.assertEqual(self.ledger.dirty_count(), 0)
+
+    async def test_undo_after_manual_insert_above_removes_own_row(self):
+        mine = await self.add("Їжа", 100, "a", 0)
+        self.sheet.rows.insert(1, ["2024-04-30 09:00:00", "Авто", "999", "b", ""])
+
+        self.cache.remove(mine)
+        await self.replicator.push()
+
+        self.assertEqual(self.sheet.data(), [("Авто", 999.0, "b", "")])
+        self.assertIsNone(self.cache.comment_of(mine))
+
+
+class FailingAppendTest(ReplicatorTestCase):
+    """append, що впав уже після того, як Google дописав рядки"""
+
+    def fail_next_append(self, error, written=True):
+        append = self.sheet.append
+
+        async def failing_append(range_name, values):
+            self.sheet.append = append
+            if written:
+                await append(range_name, values)
+            raise error
+        self.sheet.append = failing_append
+
+    async def test_rows_written_before_timeout_are_not_appended_again(self):
+        await self.add("Їжа", 100, "a", 0)
+        self.cache.add_many([
+            ("2024-05-01 10:01:00", "Кава", 50, "b", ""),
+            ("2024-05-01 10:02:00", "Таксі", 200, "a", ""),
+        ])
+        self.fail_next_append(TimeoutError())
+        with self.assertRaises(TimeoutError):
+            await self.replicator.push()
+
+        await self.replicator.push()
+        await self.replicator.pull_full()
+
+        self.assertEqual(self.sheet.data(), [("Їжа", 100.0, "a", ""), ("Кава", 50.0, "b", ""), ("Таксі", 200.0, "a", "")])
+        self.assertEqual(self.ledger.dirty_count(), 0)
+        self.assertEqual(len(self.cache.store), 3)
+
+    async def test_undo_after_failed_append_removes_written_row(self):
+        mine = self.cache.add("2024-05-01 10:00:00", "Їжа", 100, "a", "")
+        self.fail_next_append(ConnectionResetError())
+        with self.assertRaises(ConnectionResetError):
+            await self.replicator.push()
+
+        self.cache.remove(mine)
+        await self.replicator.push()
+
+        self.assertEqual(self.sheet.data(), [])
+        self.assertEqual(self.ledger.records(), [])
+
+    async def test_rate_limited_append_is_resent(self):
+        error = Exception("429")
+        error.resp = type('Resp', (), {'status': 429})()
+        await self.add("Їжа", 100, "a", 0)
+        self.cache.add("2024-05-01 10:01:00", "Кава", 50, "b", "")
+        self.fail_next_append(error, written=False)
+        with self.assertRaises(Exception):
+            await self.replicator.push()
+
+        await self.replicator.push()
+        self.assertEqual(self.sheet.data(), [("Їжа", 100.0, "a", ""), ("Кава", 50.0, "b", "")])
+        self.assertEqual(self.ledger.dirty_count(), 0)
+
+
+class ReconcileTest(ReplicatorTestCase):
+
+    async def test_reconcile_keeps_ids_after_manual_delete(self):
+        await self.add("Їжа", 100, "a", 0)
+        second = await self.add("Кава", 50, "b", 1)
+        third = await self.add("Таксі", 200, "a", 2)
+        del self.sheet.rows[1]
+
+        await self.replicator.pull_full()
+
+        self.assertEqual(self.ledger_data(), [(2, "Кава", 50.0, "b"), (3, "Таксі", 200.0, "a")])
+        self.assertIsNotNone(self.cache.comment_of(second))
+        self.assertIsNotNone(self.cache.comment_of(third))
+        self.assertEqual(len(self.cache.store), 2)
+
+    async def test_reconcile_applies_manual_insert_and_edit(self):
+        await self.add("Їжа", 100, "a", 0)
+        self.sheet.rows.insert(1, ["2024-04-30 09:00:00", "Авто", "999", "b", ""])
+        self.sheet.rows[2][4] = "виправлено"
+
+        await self.replicator.pull_full()
+
+        self.assertEqual(self.ledger_data(), [(2, "Авто", 999.0, "b"), (3, "Їжа", 100.0, "a")])
+        self.assertEqual(sorted(self.cache.store.comments), ["", "виправлено"])
+
+    async def test_reconcile_keeps_unsent_local_changes(self):
+        mine = await self.add("Їжа", 100, "a", 0)
+        self.cache.set_comment(mine, "[IGNORED]")
+        self.sheet.rows[1][4] = "ручний коментар"
+
+        await self.replicator.pull_full()
+        self.assertEqual(self.cache.comment_of(mine), "[IGNORED]")
+
+        await self.replicator.push()
+        self.assertEqual(self.sheet.data(), [("Їжа", 100.0, "a", "[IGNORED]")])
+
+    async def test_pull_tail_picks_up_manual_rows(self):
+        await self.add("Їжа", 100, "a", 0)
+        self.sheet.rows.append(["2024-05-01 11:00:00", "Авто", "999", "b", ""])
+
+        self.assertEqual(await self.replicator.pull_tail(), 1)
+        self.assertEqual(await self.replicator.pull_tail(), 0)
+        self.assertEqual(self.ledger_data(), [(2, "Їжа", 100.0, "a"), (3, "Авто", 999.0, "b")])
+
+
+class BackgroundSyncTest(ReplicatorTestCase):
+
+    async def test_start_syncs_without_waiting_for_refresh_interval(self):
+        self.sheet.rows.append(["2024-05-01 11:00:00", "Авто", "999", "b", ""])
+        self.replicator.refresh_interval = 3600
+        self.replicator.start()
+        try:
+            await asyncio.sleep(0.1)
+            self.assertIsNotNone(self.replicator.pulled_at)
+            self.assertEqual(self.ledger_data(), [(2, "Авто", 999.0, "b")])
+        finally:
+            await self.replicator.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
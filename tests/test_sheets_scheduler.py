@@ -0,0 +1,131 @@
+# Квоти Google Sheets: відра токенів і черговість запитів
+import asyncio
+import unittest
+from unittest import mock
+
+from sheets_scheduler import QUOTA_READ, QUOTA_WRITE, SheetsScheduler, TokenBucket
+
+
+class FakeClock:
+    """Замість time.monotonic: час рухається лише вручну"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('sheets_scheduler.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.bucket = TokenBucket(rate=1, capacity=2)
+
+    def test_burst_then_wait_for_refill(self):
+        for _ in range(2):
+            self.assertEqual(self.bucket.delay(), 0)
+            self.bucket.take()
+        self.assertAlmostEqual(self.bucket.delay(), 1.0)
+
+        self.clock.now += 0.5
+        self.assertAlmostEqual(self.bucket.delay(), 0.5)
+        self.clock.now += 0.5
+        self.assertEqual(self.bucket.delay(), 0)
+
+    def test_refill_is_capped_by_capacity(self):
+        self.clock.now += 60
+        self.assertEqual(self.bucket.delay(), 0)
+        self.assertEqual(self.bucket.tokens, 2)
+
+    def test_block_holds_bucket_until_retry_after(self):
+        self.bucket.block(5)
+        self.assertAlmostEqual(self.bucket.delay(), 5.0)
+
+        self.clock.now += 5
+        self.assertEqual(self.bucket.delay(), 0)
+        self.assertEqual(self.bucket.tokens, 2)
+
+    def test_shorter_block_does_not_shorten_pause(self):
+        self.bucket.block(5)
+        self.bucket.block(1)
+        self.assertAlmostEqual(self.bucket.delay(), 5.0)
+
+
+class SheetsSchedulerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def run_queued(self, scheduler, quotas):
+        """Займає єдиний слот, ставить у чергу запити і повертає порядок їх виконання"""
+        order = []
+        release = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot(QUOTA_WRITE):
+                await release.wait()
+
+        async def request(name, quota):
+            async with scheduler.slot(quota):
+                order.append(name)
+
+        holding = asyncio.ensure_future(holder())
+        await asyncio.sleep(0)
+        tasks = []
+        for name, quota in quotas:
+            tasks.append(asyncio.ensure_future(request(name, quota)))
+            await asyncio.sleep(0)
+        self.assertEqual(scheduler.waiting(), len(quotas))
+
+        release.set()
+        await asyncio.wait_for(asyncio.gather(holding, *tasks), 1)
+        return order
+
+    async def test_writes_go_before_queued_reads(self):
+        scheduler = SheetsScheduler(reads_per_minute=600, writes_per_minute=600, concurrency=1)
+        order = await self.run_queued(scheduler, [
+            ("read1", QUOTA_READ), ("read2", QUOTA_READ), ("write", QUOTA_WRITE)
+        ])
+        self.assertEqual(order, ["write", "read1", "read2"])
+
+    async def test_same_class_keeps_arrival_order(self):
+        scheduler = SheetsScheduler(reads_per_minute=600, writes_per_minute=600, concurrency=1)
+        order = await self.run_queued(scheduler, [
+            ("write1", QUOTA_WRITE), ("write2", QUOTA_WRITE), ("write3", QUOTA_WRITE)
+        ])
+        self.assertEqual(order, ["write1", "write2", "write3"])
+
+    async def test_blocked_writes_do_not_hold_back_reads(self):
+        scheduler = SheetsScheduler(reads_per_minute=600, writes_per_minute=600, concurrency=2)
+        scheduler.block(QUOTA_WRITE, 60)
+        order = []
+
+        async def request(name, quota):
+            async with scheduler.slot(quota):
+                order.append(name)
+
+        write = asyncio.ensure_future(request("write", QUOTA_WRITE))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(request("read", QUOTA_READ), 1)
+
+        self.assertEqual(order, ["read"])
+        self.assertEqual(scheduler.waiting(QUOTA_WRITE), 1)
+        write.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await write
+        self.assertEqual(scheduler.waiting(), 0)
+
+    async def test_request_waits_for_token(self):
+        scheduler = SheetsScheduler(reads_per_minute=600, burst=1, concurrency=2)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(2):
+            async with scheduler.slot(QUOTA_READ):
+                pass
+        # 600 за хвилину - новий токен через 0,1 с
+        self.assertGreaterEqual(loop.time() - started, 0.09)
+
+
+if __name__ == '__main__':
+    unittest.main()
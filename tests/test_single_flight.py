@@ -0,0 +1,74 @@
+# Об'єднання одночасних однакових запитів
+import asyncio
+import unittest
+
+from single_flight import SingleFlight
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.flights = SingleFlight()
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def fetch(self, result="дані", error=None):
+        self.calls += 1
+        await self.release.wait()
+        if error is not None:
+            raise error
+        return result
+
+    def start(self, key='sheet', **kwargs):
+        return asyncio.ensure_future(self.flights.run(key, lambda: self.fetch(**kwargs)))
+
+    async def test_concurrent_callers_share_one_call(self):
+        callers = [self.start() for _ in range(5)]
+        await asyncio.sleep(0)
+        self.assertTrue(self.flights.in_flight('sheet'))
+
+        self.release.set()
+        self.assertEqual(await asyncio.gather(*callers), ["дані"] * 5)
+        self.assertEqual(self.calls, 1)
+        self.assertFalse(self.flights.in_flight('sheet'))
+
+    async def test_different_keys_run_separately(self):
+        callers = [self.start('full'), self.start('tail')]
+        self.release.set()
+        await asyncio.gather(*callers)
+        self.assertEqual(self.calls, 2)
+
+    async def test_error_reaches_every_waiter(self):
+        error = RuntimeError("таблиця недоступна")
+        callers = [self.start(error=error) for _ in range(3)]
+        await asyncio.sleep(0)
+        self.release.set()
+
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        self.assertEqual(results, [error] * 3)
+        self.assertEqual(self.calls, 1)
+        self.assertFalse(self.flights.in_flight('sheet'))
+
+    async def test_cancelled_waiter_does_not_cancel_shared_call(self):
+        leader = self.start()
+        follower = self.start()
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await leader
+        self.assertTrue(self.flights.in_flight('sheet'))
+
+        self.release.set()
+        self.assertEqual(await follower, "дані")
+        self.assertEqual(self.calls, 1)
+
+    async def test_new_call_after_previous_finished(self):
+        self.release.set()
+        await self.start()
+        await self.start()
+        self.assertEqual(self.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# Порядок обробки оновлень: черга розмови перед спільними слотами
+import asyncio
+import importlib.util
+import unittest
+from types import SimpleNamespace
+
+
+def make_update(chat_id, user_id):
+    return SimpleNamespace(
+        effective_chat=SimpleNamespace(id=chat_id),
+        effective_user=SimpleNamespace(id=user_id)
+    )
+
+
+@unittest.skipUnless(importlib.util.find_spec('telegram'), "потрібен python-telegram-bot з requirements.txt")
+class PerChatUpdateProcessorTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        from update_processing import PerChatUpdateProcessor
+        self.processor = PerChatUpdateProcessor(2)
+        self.log = []
+
+    async def handler(self, name, gate=None):
+        self.log.append(f"{name}+")
+        if gate is not None:
+            await gate.wait()
+        else:
+            await asyncio.sleep(0.01)
+        self.log.append(f"{name}-")
+
+    def process(self, update, name, gate=None):
+        return asyncio.ensure_future(self.processor.process_update(update, self.handler(name, gate)))
+
+    async def test_same_user_processed_in_order(self):
+        gate = asyncio.Event()
+        first = self.process(make_update(1, 10), "a", gate)
+        second = self.process(make_update(1, 10), "b")
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.log, ["a+"])
+
+        gate.set()
+        await asyncio.gather(first, second)
+        self.assertEqual(self.log, ["a+", "a-", "b+", "b-"])
+        self.assertEqual(self.processor._locks, {})
+
+    async def test_other_user_in_same_chat_not_blocked(self):
+        gate = asyncio.Event()
+        first = self.process(make_update(1, 10), "a", gate)
+        try:
+            await asyncio.wait_for(self.process(make_update(1, 20), "b"), 1)
+            self.assertEqual(self.log, ["a+", "b+", "b-"])
+        finally:
+            gate.set()
+            await first
+
+    async def test_queued_updates_do_not_take_global_slots(self):
+        gate = asyncio.Event()
+        # Два оновлення одного користувача: друге чекає в черзі, а не в спільному слоті
+        busy = [self.process(make_update(1, 10), f"a{n}", gate) for n in range(2)]
+        await asyncio.sleep(0.01)
+        try:
+            await asyncio.wait_for(self.process(make_update(2, 20), "b"), 1)
+            self.assertIn("b-", self.log)
+        finally:
+            gate.set()
+            await asyncio.gather(*busy)
+
+
+if __name__ == '__main__':
+    unittest.main()
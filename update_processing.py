@@ -0,0 +1,64 @@
+# update_processing.py - паралельна обробка оновлень зі збереженням порядку в чаті
+import asyncio
+import logging
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Обробляє оновлення різних користувачів паралельно, а одного - по черзі.
+
+    Повільне голосове чи статистика одного члена сім'ї не затримують
+    інших, а в межах розмови порядок зберігається (наприклад, /undo
+    завжди виконується після запису, який він скасовує). Ключ черги -
+    пара (чат, користувач), бо стан /undo (user_last_actions) ведеться
+    для кожного користувача окремо.
+
+    Спершу оновлення чекає своєї черги і лише потім займає один із
+    max_concurrent_updates спільних слотів, тож оновлення, що стоять
+    за повільним у тому самому чаті, не забирають слоти в інших.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self._locks = {}  # (чат, користувач) -> [lock, кількість оновлень, що його використовують]
+
+    @staticmethod
+    def _ordering_key(update):
+        chat = getattr(update, 'effective_chat', None)
+        user = getattr(update, 'effective_user', None)
+        if chat is None and user is None:
+            return None
+        return (getattr(chat, 'id', None), getattr(user, 'id', None))
+
+    async def process_update(self, update, coroutine):
+        key = self._ordering_key(update)
+        if key is None:
+            async with self._semaphore:
+                await self.do_process_update(update, coroutine)
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._semaphore:
+                    await self.do_process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            # Прибираємо блокування неактивних розмов, щоб словник не ріс
+            if entry[1] == 0:
+                del self._locks[key]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,127 @@
+# voice_processing.py - черга та конвертація голосових повідомлень
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+SPEECH_SAMPLE_RATE = 16000
+OPUS_SAMPLE_RATE = 48000  # частота голосових повідомлень Telegram
+
+
+class AudioConversionError(Exception):
+    """FFmpeg не зміг сконвертувати аудіо"""
+
+
+class AudioConversionTimeout(AudioConversionError):
+    """FFmpeg не вклався у відведений час"""
+
+
+class VoiceQueueFull(Exception):
+    """Черга голосових повідомлень переповнена"""
+
+
+class VoiceScheduler:
+    """Обмежує кількість одночасних обробок голосових повідомлень.
+
+    Не більше max_concurrent задач (FFmpeg + розпізнавання) виконуються
+    одночасно, ще до max_queue чекають своєї черги; решта одразу
+    отримують відмову, щоб не вичерпати пам'ять невеликого інстансу.
+    """
+
+    def __init__(self, max_concurrent=2, max_queue=5):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._async_semaphore = None
+        self.active = 0
+        self.waiting = 0
+
+    @property
+    def _semaphore(self):
+        # Створюється вже в робочому event loop (Python 3.9 прив'язує його при створенні)
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._async_semaphore
+
+    def queue_position(self):
+        """Місце в черзі для нової задачі (0 - почнеться одразу)"""
+        return max(0, self.active + self.waiting - self.max_concurrent + 1)
+
+    def is_full(self):
+        return self.active >= self.max_concurrent and self.waiting >= self.max_queue
+
+    @asynccontextmanager
+    async def slot(self):
+        """Чекає вільного місця для обробки; VoiceQueueFull якщо черга заповнена"""
+        if self.is_full():
+            raise VoiceQueueFull()
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+
+def is_ogg_opus(mime_type):
+    """Чи можна відправити аудіо в Speech-to-Text без конвертації"""
+    return mime_type in (None, "audio/ogg", "audio/opus")
+
+
+async def iter_download(url, chunk_size=16 * 1024, timeout=30):
+    """Завантажує файл частинами, віддаючи їх одразу після отримання"""
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(chunk_size):
+                yield chunk
+
+
+async def digest_chunks(chunks, digest):
+    """Пропускає частини аудіо далі, паралельно рахуючи їх хеш"""
+    async for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+async def transcode_to_pcm(ffmpeg_path, audio_bytes, sample_rate=SPEECH_SAMPLE_RATE, timeout=30):
+    """Перетворює OGG/Opus у сирий 16-бітний PCM (моно) через pipe FFmpeg.
+
+    Вхід подається в stdin, результат читається з stdout, тож на диск
+    нічого не пишеться, а event loop обслуговує інші оновлення, поки
+    триває конвертація.
+    """
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg_path,
+        "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "s16le", "-acodec", "pcm_s16le",
+        "-ar", str(sample_rate), "-ac", "1",
+        "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(bytes(audio_bytes)), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise AudioConversionTimeout(f"FFmpeg перевищив {timeout} с")
+
+    if process.returncode != 0:
+        raise AudioConversionError(
+            f"FFmpeg завершився з кодом {process.returncode}: {stderr.decode(errors='replace').strip()}"
+        )
+    if not stdout:
+        raise AudioConversionError("FFmpeg повернув порожній результат")
+    return stdout